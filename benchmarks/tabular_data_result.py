@@ -0,0 +1,66 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Measures semantic layer kernels of TabularDataResult on charts with growing number of group by values.
+
+    python -m benchmarks.tabular_data_result > bench_output.txt
+"""
+import timeit
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytz
+from pandas import DataFrame
+
+from queryengine.core import constants
+from queryengine.core.tabular_data_result import TabularDataResult
+
+DAYS = 90
+GROUP_COUNTS = [10, 100, 500, 2000]
+REPEAT = 5
+
+
+def _result(groups: int) -> TabularDataResult:
+    rng = np.random.default_rng(0)
+    days = [datetime(2023, 1, 1, tzinfo=pytz.UTC) + timedelta(days=i) for i in range(DAYS)]
+    values = rng.random(DAYS * groups)
+    # every group starts and ends with some zero days, like charts of new or churned values do
+    day_idx = np.tile(np.arange(DAYS), groups)
+    first_day = np.repeat(rng.integers(0, DAYS // 3, groups), DAYS)
+    last_day = np.repeat(rng.integers(2 * DAYS // 3, DAYS, groups), DAYS)
+    values[(day_idx < first_day) | (day_idx > last_day)] = 0
+    return TabularDataResult(DataFrame({
+        constants.X_AXIS_COLUMN_ALIAS: np.tile(days, groups),
+        'group_by_1': np.repeat([f'value_{i}' for i in range(groups)], DAYS),
+        constants.DATA_COLUMN_ALIAS: values,
+    }).sort_values(constants.X_AXIS_COLUMN_ALIAS, kind='stable').reset_index(drop=True))
+
+
+def _seconds(statement) -> float:
+    return min(timeit.repeat(statement, number=1, repeat=REPEAT))
+
+
+def main():
+    print(f'{"groups":>8} {"rows":>8} {"trim_zeros":>12} {"filter_by_group_by_values":>26}')
+    for groups in GROUP_COUNTS:
+        result = _result(groups)
+        top_values = [(f'value_{i}',) for i in range(0, groups, 2)]
+        trim_zeros = _seconds(lambda: result.trim_zeros())
+        filter_by_group_by_values = _seconds(lambda: result.filter_by_group_by_values(top_values))
+        print(f'{groups:>8} {len(result.df):>8} {trim_zeros:>11.4f}s {filter_by_group_by_values:>25.4f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Dict
+
+from fastapi import APIRouter, Depends
+
+from queryengine import dependencies
+from queryengine.core.bigquery.admission import AdmissionScheduler
+from queryengine.logging.router import LoggingRoute
+
+router = APIRouter(route_class=LoggingRoute)
+
+
+# async, so stats are read on the event loop which updates them
+@router.get("/api/v1/admission/stats")
+async def admission_stats(
+        admission_scheduler: AdmissionScheduler = Depends(dependencies.admission_scheduler)) -> Dict[str, object]:
+    return admission_scheduler.stats()
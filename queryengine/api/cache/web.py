@@ -0,0 +1,32 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Dict
+
+from fastapi import APIRouter, Depends
+
+from queryengine import dependencies
+from queryengine.api.chart.response_cache import ChartResponseCache
+from queryengine.core.bigquery.result_cache import ResultCache
+from queryengine.logging.router import LoggingRoute
+
+router = APIRouter(route_class=LoggingRoute)
+
+
+@router.get("/api/v1/cache/stats")
+def cache_stats(result_cache: ResultCache = Depends(dependencies.result_cache),
+                chart_response_cache: ChartResponseCache = Depends(dependencies.chart_response_cache)
+                ) -> Dict[str, int]:
+    return result_cache.stats() | {f'chart_response_{stat}': value
+                                   for stat, value in chart_response_cache.stats().items()}
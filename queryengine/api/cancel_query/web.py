@@ -15,19 +15,19 @@
 from fastapi import Depends, APIRouter
 
 from queryengine import dependencies
-from queryengine.core.bigquery.queryexecutor import CancellableBigQueryExecutor
+from queryengine.core.bigquery.queryexecutor import BigQueryExecutor
 from queryengine.logging.router import LoggingRoute
 
 router = APIRouter(route_class=LoggingRoute)
 
 
 @router.post("/api/v1/cancel-by-request-id/{request_id}")
-def cancel_by_request_id(request_id: str,
-                         bigquery_executor: CancellableBigQueryExecutor = Depends(dependencies.bigquery_executor)):
+async def cancel_by_request_id(request_id: str,
+                               bigquery_executor: BigQueryExecutor = Depends(dependencies.bigquery_executor)):
     bigquery_executor.cancel_by_request_id(request_id)
 
 
 @router.post("/api/v1/cancel-by-page-id/{page_id}")
-def cancel_by_page_id(page_id: str,
-                      bigquery_executor: CancellableBigQueryExecutor = Depends(dependencies.bigquery_executor)):
+async def cancel_by_page_id(page_id: str,
+                            bigquery_executor: BigQueryExecutor = Depends(dependencies.bigquery_executor)):
     bigquery_executor.cancel_by_page_id(page_id)
@@ -16,6 +16,7 @@ from dataclasses import dataclass
 from typing import List, Dict
 
 from queryengine.core.app.app import App
+from queryengine.core.bigquery.admission import QueryPriority
 from queryengine.core.datasource.datasource import DataSource, ColumnReference
 from queryengine.core.dateinterval import DatetimeInterval
 from queryengine.core.kpi.kpi import Kpi, Unit, WarehouseMetric
@@ -42,6 +43,7 @@ class WarehouseChartQuery:
     column_filters: List[ColumnFilter]
     column_group_bys: List[ColumnReference]
     x_axis_column: ColumnReference
+    priority: QueryPriority = QueryPriority.interactive
 
 class ChartQuery:
     def __init__(self, app: App, page_id: str, request_id: str,
@@ -51,7 +53,8 @@ class ChartQuery:
                  column_filters: List[ColumnFilter] = None, column_group_bys: List[ColumnReference] = None,
                  sort_by_datasource: DataSource | None = None,
                  sort_by_kpi: Kpi | None = None,
-                 group_by_limit=None
+                 group_by_limit=None,
+                 priority: QueryPriority = QueryPriority.interactive
                  ):
         self.app = app
         self.page_id = page_id
@@ -67,6 +70,7 @@ class ChartQuery:
         self.sort_by_datasource = sort_by_datasource
         self.sort_by_kpi = sort_by_kpi
         self.group_by_limit = group_by_limit
+        self.priority = priority
 
         self.date_interval = self.datasource.clamp_date_interval(self.requested_date_interval)
         self.compare_interval = self.datasource.clamp_date_interval(
@@ -92,7 +96,8 @@ class ChartQuery:
             time_grain=self.time_grain,
             column_filters=list(self.column_filters),
             column_group_bys=list(self.column_group_bys),
-            x_axis_column=self.x_axis_column
+            x_axis_column=self.x_axis_column,
+            priority=self.priority
         )
 
     def to_compare_warehouse_query(self):
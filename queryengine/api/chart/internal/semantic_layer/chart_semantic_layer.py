@@ -0,0 +1,90 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+from opentelemetry import trace
+
+from queryengine.api.chart.internal.domain import ChartQuery, ChartQueryResult
+from queryengine.api.chart.internal.semantic_layer.kpi_chart_result import KpiChartQueryResult
+from queryengine.api.chart.internal.semantic_layer.semantic_layer_graph import SemanticLayerGraph
+from queryengine.api.chart.internal.x_axis_specifics.x_axis_specifics import WarehouseComparedResults
+from queryengine.core import constants
+from queryengine.core.tabular_data_result import TabularDataResult, TabularDataResults
+from queryengine.core.warehouse import TooManyGroupByValuesException
+
+
+def empty_result(query: ChartQuery) -> ChartQueryResult:
+    return ChartQueryResult(
+        chart_data=None,
+        chart_total=None,
+        chart_total_overall=None,
+        compare_period_chart_data=None,
+        compare_period_chart_total=None,
+        compare_period_chart_total_overall=None,
+        unit=query.kpi.unit
+    )
+
+
+def build_results(query: ChartQuery, results: TabularDataResults, sort_by_results: TabularDataResults | None,
+                  graph: SemanticLayerGraph | None = None) -> KpiChartQueryResult | None:
+    """
+    Result of main period, None when group by is used but there's no data.
+    """
+    #check distinct values in group by columns
+    tracer = trace.get_tracer("query_engine")
+    distinct_group_by_values = results.group_by_columns_distinct_values_count()
+    max_rows = results.get_max_rows()
+    if distinct_group_by_values > constants.BIGQUERY_MAX_DISTINCT_GROUP_BY_VALUES and \
+        max_rows > constants.BIGQUERY_MAX_ROWS / 2:
+        with tracer.start_as_current_span("group_by_columns_distinct_value") as span:
+            span.set_attribute("distinct_group_by_values", distinct_group_by_values)
+            span.set_attribute("rows_count", max_rows)
+            raise TooManyGroupByValuesException()
+
+    graph = graph or SemanticLayerGraph(query)
+    if len(results.group_by_columns()) > 0 and len(graph.group_by_codes(results)) == 0:
+        # special case where we use group by but got no data so we can't easily generate identity values with 0
+        return None
+    with tracer.start_as_current_span("semantic_layer_build_results") as span:
+        return KpiChartQueryResult.build_from_result(query, results, sort_by_results, graph)
+
+
+def build_compare_results(query: ChartQuery, compare_results: TabularDataResults | None,
+                          result: TabularDataResult | None,
+                          graph: SemanticLayerGraph | None = None) -> KpiChartQueryResult:
+    tracer = trace.get_tracer("query_engine")
+    with tracer.start_as_current_span("semantic_layer_build_compare_results") as span:
+        return KpiChartQueryResult.build_from_compare_result(query, compare_results, result, graph)
+
+
+def chart_result(query: ChartQuery, kpi_result: KpiChartQueryResult,
+                 compared_kpi_result: KpiChartQueryResult) -> ChartQueryResult:
+    return ChartQueryResult(
+        chart_data=kpi_result.result,
+        chart_total=kpi_result.total,
+        chart_total_overall=kpi_result.single_total,
+        compare_period_chart_data=compared_kpi_result.result,
+        compare_period_chart_total=compared_kpi_result.total,
+        compare_period_chart_total_overall=compared_kpi_result.single_total,
+        unit=query.kpi.unit
+    )
+
+
+def apply_semantic_layer(query: ChartQuery, warehouse_compared_results: WarehouseComparedResults) -> ChartQueryResult:
+    graph = SemanticLayerGraph(query)
+    kpi_result = build_results(query, warehouse_compared_results.results, warehouse_compared_results.sort_by_results,
+                               graph)
+    if kpi_result is None:
+        return empty_result(query)
+    compared_kpi_result = build_compare_results(query, warehouse_compared_results.compare_results, kpi_result.result,
+                                                graph)
+    return chart_result(query, kpi_result, compared_kpi_result)
@@ -13,50 +13,191 @@
 # limitations under the License.
 
 import ast
-from typing import Dict
+import operator
+from functools import lru_cache
+from typing import Callable, Dict, List
+
+import numpy as np
+from pandas import Index, Series
 
 from queryengine.core import constants
-from queryengine.core.tabular_data_result import TabularDataResult
+from queryengine.core.tabular_data_result import IdentityTable, SparseTabularDataResult, TabularDataResult, \
+    safe_division
+
+# functions usable in formulas, called with value arrays aligned to rows of identity table or with numbers
+builtin_functions: Dict[str, Callable] = {}
+
+
+def builtin_function(name: str):
+    def register(func: Callable) -> Callable:
+        builtin_functions[name.lower()] = func
+        return func
+    return register
+
 
-builtin_functions = {}
+_operators = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
 
 
-def evaluate(formula: str, identity: TabularDataResult, values: Dict[str, object]) -> TabularDataResult:
-    def _evaluate_node(node):
+class FormulaPlan:
+    """
+    Formula compiled into nested functions evaluated over values of all its metrics aligned to rows of identity
+    table, so it takes a single vectorized pass without intermediate results. Constant parts are folded on
+    compilation. Values which can't be aligned row by row are evaluated as results.
+    """
+    def __init__(self, formula: str):
+        self.formula = formula
+        self.metrics: List[str] = []
+        self.functions: List[str] = []
+        body = ast.parse(formula, mode='eval').body
+        # formulas of a single metric only merge its values into identity table
+        self._single_metric = body.id.lower() if isinstance(body, ast.Name) else None
+        self._root = self._compile(body)
+
+    def _compile(self, node):
         if isinstance(node, ast.Name):
-            return values[node.id.lower()]
+            name = node.id.lower()
+            if name not in self.metrics:
+                self.metrics.append(name)
+            return lambda values, divide: values[name]
         elif isinstance(node, ast.Constant) and type(node.value) in [int, float]:
             return node.value
         elif isinstance(node, ast.Call):
-            func = builtin_functions[node.func.id.lower()]
-            args = [_evaluate_node(arg) for arg in node.args]
-            return func(*args)
+            func_name = node.func.id.lower()
+            if func_name not in self.functions:
+                self.functions.append(func_name)
+            args = [self._compile(arg) for arg in node.args]
+            # looked up on evaluation, so functions can be registered after formulas are compiled
+            return lambda values, divide: builtin_functions[func_name](*[self._run(arg, values, divide)
+                                                                         for arg in args])
         elif isinstance(node, ast.BinOp):
-            if isinstance(node.op, ast.Add):
-                return _evaluate_node(node.left) + _evaluate_node(node.right)
-            elif isinstance(node.op, ast.Sub):
-                return _evaluate_node(node.left) - _evaluate_node(node.right)
-            elif isinstance(node.op, ast.Mult):
-                return _evaluate_node(node.left) * _evaluate_node(node.right)
-            elif isinstance(node.op, ast.Div):
-                return _evaluate_node(node.left) / _evaluate_node(node.right)
-            else:
+            if type(node.op) not in _operators:
                 raise ValueError(f'Not supported operator {node.op}')
+            left = self._compile(node.left)
+            right = self._compile(node.right)
+            op = _operators[type(node.op)]
+            if not callable(left) and not callable(right):
+                return op(left, right)
+            if isinstance(node.op, ast.Div):
+                return lambda values, divide: divide(self._run(left, values, divide),
+                                                     self._run(right, values, divide))
+            return lambda values, divide: op(self._run(left, values, divide), self._run(right, values, divide))
         else:
             raise ValueError(f"Unsupported AST node type: {type(node)}")
 
-    if identity.df.empty:
-        return identity
-
-    expr_ast = ast.parse(formula, mode='eval')
-    expr_ast = ast.fix_missing_locations(expr_ast)
-    expr_ast = ast.copy_location(expr_ast, expr_ast)
-    expr_ast = ast.fix_missing_locations(expr_ast)
-    result = _evaluate_node(expr_ast.body)
-    if type(result) in [int, float]:
-        identity.df[constants.DATA_COLUMN_ALIAS] = identity.df[constants.DATA_COLUMN_ALIAS].apply(lambda x: result)
-        return identity
-    elif isinstance(result, TabularDataResult):
-        return identity.merge_values(result)
-    else:
-        raise Exception(f'Not supported result type {type(result)}')
+    @staticmethod
+    def _run(node, values, divide):
+        return node(values, divide) if callable(node) else node
+
+    @staticmethod
+    def _divide(num, denom):
+        if isinstance(num, (int, float)) and isinstance(denom, (int, float)):
+            return num / denom
+        return safe_division(num, denom)
+
+    def evaluate(self, identity: TabularDataResult | IdentityTable,
+                 values: Dict[str, object]) -> TabularDataResult | SparseTabularDataResult:
+        if isinstance(identity, IdentityTable):
+            return self._evaluate_identity_table(identity, values)
+        if identity.df.empty:
+            return identity
+        if self._single_metric and isinstance(values[self._single_metric], TabularDataResult):
+            return identity.merge_values(values[self._single_metric])
+
+        aligned = {}
+        matched = np.ones(len(identity.df), dtype=bool)
+        columns = identity.df.columns.tolist()
+        for name in self.metrics:
+            value = values[name]
+            if not isinstance(value, TabularDataResult):
+                aligned[name] = value
+                continue
+            alignment = identity.aligned_values(value)
+            if alignment is None:
+                return self._evaluate_results(identity, values)
+            aligned[name], value_matched = alignment
+            matched &= value_matched
+            if columns == identity.df.columns.tolist() and not value.df.empty:
+                columns = value.df.columns.tolist()
+
+        result = self._run(self._root, aligned, self._divide)
+        if type(result) in [int, float]:
+            return TabularDataResult(identity.df.assign(**{constants.DATA_COLUMN_ALIAS: result}))
+        result = Series(result, copy=False)
+        if not matched.all():
+            # rows missing in any of metrics keep values of identity table
+            result = result.where(matched)
+        df = identity.df[columns].reset_index(drop=True)
+        df[constants.DATA_COLUMN_ALIAS] = result.fillna(
+            identity.df[constants.DATA_COLUMN_ALIAS].reset_index(drop=True))
+        return TabularDataResult(df)
+
+    def _evaluate_identity_table(self, identity: IdentityTable,
+                                 values: Dict[str, object]) -> TabularDataResult | SparseTabularDataResult:
+        """
+        Evaluates the formula only in rows where all metrics have values, other rows are zeros of identity table.
+        """
+        if identity.empty:
+            return identity.to_result()
+        if self._single_metric and isinstance(values[self._single_metric], TabularDataResult):
+            return identity.merge_values(values[self._single_metric])
+
+        positions = {}
+        metric_values = {}
+        columns = identity.columns()
+        for name in self.metrics:
+            value = values[name]
+            if not isinstance(value, TabularDataResult):
+                continue
+            value_positions = identity.positions(value)
+            if value_positions is None:
+                return self.evaluate(identity.to_result(), values)
+            inside = value_positions >= 0
+            positions[name] = value_positions[inside]
+            # metrics without rows don't match any row, like missing values
+            metric_values[name] = value.df[constants.DATA_COLUMN_ALIAS].array[inside] if not value.df.empty \
+                else np.zeros(0)
+            if columns == identity.columns() and not value.df.empty:
+                columns = value.df.columns.tolist()
+        if not positions:
+            return self.evaluate(identity.to_result(), values)
+
+        matched = np.sort(next(iter(positions.values())))
+        for value_positions in positions.values():
+            matched = np.intersect1d(matched, value_positions, assume_unique=True)
+        aligned = {name: value for name, value in values.items() if not isinstance(value, TabularDataResult)}
+        for name, value_positions in positions.items():
+            aligned[name] = metric_values[name].take(Index(value_positions).get_indexer(matched))
+
+        result = self._run(self._root, aligned, self._divide)
+        if type(result) in [int, float]:
+            return TabularDataResult(identity.to_result().df.assign(**{constants.DATA_COLUMN_ALIAS: result}))
+        # missing values keep zeros of identity table, as they do when evaluated over materialized rows
+        return SparseTabularDataResult(identity, matched, Series(result, copy=False).fillna(0).array, columns)
+
+    def _evaluate_results(self, identity: TabularDataResult, values: Dict[str, object]) -> TabularDataResult:
+        if self.functions:
+            # functions work on aligned value arrays, which rows with same keys can't be turned into
+            raise ValueError(f'Functions {", ".join(self.functions)} of formula {self.formula} need metrics '
+                             f'with a single row per x axis and group by values')
+        result = self._run(self._root, values, operator.truediv)
+        if type(result) in [int, float]:
+            return TabularDataResult(identity.df.assign(**{constants.DATA_COLUMN_ALIAS: result}))
+        elif isinstance(result, TabularDataResult):
+            return identity.merge_values(result)
+        else:
+            raise Exception(f'Not supported result type {type(result)}')
+
+
+@lru_cache(maxsize=1024)
+def compile_formula(formula: str) -> FormulaPlan:
+    return FormulaPlan(formula)
+
+
+def evaluate(formula: str, identity: TabularDataResult | IdentityTable,
+             values: Dict[str, object]) -> TabularDataResult | SparseTabularDataResult:
+    return compile_formula(formula).evaluate(identity, values)
@@ -0,0 +1,208 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+from typing import Dict, List, Tuple
+
+import pyarrow
+from pandas import DataFrame
+
+from queryengine.api.chart.internal.domain import ChartQuery, ChartQueryResult
+from queryengine.api.chart.internal.semantic_layer.chart_semantic_layer import build_compare_results, build_results, \
+    chart_result, empty_result
+from queryengine.api.chart.internal.semantic_layer.kpi_chart_result import KpiChartQueryResult
+from queryengine.api.chart.internal.x_axis_specifics.x_axis_specifics import WarehouseComparedResults
+from queryengine.core.tabular_data_result import TabularDataResult, TabularDataResults
+
+
+def _write_table(sink, table: pyarrow.Table):
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _write_block(df: DataFrame) -> Tuple[str, int]:
+    table = pyarrow.Table.from_pandas(df)
+    size_sink = pyarrow.MockOutputStream()
+    _write_table(size_sink, table)
+    block = shared_memory.SharedMemory(create=True, size=size_sink.size())
+    try:
+        _write_table(pyarrow.FixedSizeBufferWriter(pyarrow.py_buffer(block.buf)), table)
+    except BaseException:
+        block.close()
+        block.unlink()
+        raise
+    block.close()
+    return block.name, size_sink.size()
+
+
+def _read_block(name: str, size: int) -> DataFrame:
+    block = shared_memory.SharedMemory(name=name)
+    df = pyarrow.ipc.open_stream(pyarrow.py_buffer(block.buf)[:size]).read_all().to_pandas()
+    try:
+        block.close()
+    except BufferError:
+        # some columns, like categories, are converted without copying and can't outlive the block
+        df = df.copy()
+        block.close()
+    return df
+
+
+class SharedTabularDataResults:
+    """
+    Tabular data results written into shared memory blocks as arrow IPC streams. Processes pass them around by names
+    of blocks, so data frames are neither pickled nor sent through pipes, and arrow data is read in place. Blocks
+    live until they are unlinked, by the process which passes results to workers and gets them back.
+    """
+    def __init__(self, blocks: Dict[str, Tuple[str, int]]):
+        # result id -> name and size of block
+        self.blocks = blocks
+
+    @staticmethod
+    def write(results: TabularDataResults) -> 'SharedTabularDataResults':
+        shared_results = SharedTabularDataResults({})
+        try:
+            for result_id, result in results.results_map.items():
+                shared_results.blocks[result_id] = _write_block(result.df)
+        except BaseException:
+            shared_results.unlink()
+            raise
+        return shared_results
+
+    def read(self) -> TabularDataResults:
+        return TabularDataResults({result_id: TabularDataResult(_read_block(name, size))
+                                   for result_id, (name, size) in self.blocks.items()})
+
+    def unlink(self):
+        for name, _ in self.blocks.values():
+            try:
+                shared_memory.SharedMemory(name=name).unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _write_kpi_result(kpi_result: KpiChartQueryResult) -> SharedTabularDataResults:
+    return SharedTabularDataResults.write(TabularDataResults({
+        name: result for name, result in
+        (('result', kpi_result.result), ('total', kpi_result.total), ('single_total', kpi_result.single_total))
+        if result is not None
+    }))
+
+
+def _read_kpi_result(shared_kpi_result: SharedTabularDataResults) -> KpiChartQueryResult:
+    results_map = shared_kpi_result.read().results_map
+    return KpiChartQueryResult(results_map.get('result'), results_map.get('total'), results_map.get('single_total'))
+
+
+def _build_results(query: ChartQuery, results: SharedTabularDataResults,
+                   sort_by_results: SharedTabularDataResults | None) -> SharedTabularDataResults | None:
+    kpi_result = build_results(query, results.read(), sort_by_results.read() if sort_by_results else None)
+    return _write_kpi_result(kpi_result) if kpi_result is not None else None
+
+
+def _build_compare_results(query: ChartQuery, compare_results: SharedTabularDataResults,
+                           kpi_result: SharedTabularDataResults | None) -> SharedTabularDataResults:
+    result = kpi_result.read().results_map.get('result') if kpi_result else None
+    return _write_kpi_result(build_compare_results(query, compare_results.read(), result))
+
+
+def _rows(results: TabularDataResults | None) -> int:
+    if results is None:
+        return 0
+    return sum(len(result.df) for result in results.results_map.values())
+
+
+def _raise_exceptions(values: List) -> List:
+    for value in values:
+        if isinstance(value, BaseException):
+            raise value
+    return values
+
+
+def _unlink_result(future: Future):
+    if not future.cancelled() and future.exception() is None and future.result() is not None:
+        future.result().unlink()
+
+
+class SemanticLayerPool:
+    """
+    Applies semantic layer of large charts in worker processes, so pandas work of one chart doesn't hold the GIL of
+    the process serving all other requests. Warehouse results are passed to workers and chart results back through
+    shared memory. Without group by, main and compare period don't depend on each other and are built in parallel.
+    Charts with fewer rows than min_rows are cheaper to build than to pass around, so they stay in the process.
+    """
+    def __init__(self, processes: int, min_rows: int):
+        self.min_rows = min_rows
+        # forked workers would inherit locks of threads serving other requests
+        self._executor = ProcessPoolExecutor(max_workers=processes, mp_context=get_context('spawn'))
+
+    def shutdown(self):
+        self._executor.shutdown()
+
+    def offloads(self, warehouse_compared_results: WarehouseComparedResults) -> bool:
+        return _rows(warehouse_compared_results.results) + _rows(warehouse_compared_results.sort_by_results) + \
+            _rows(warehouse_compared_results.compare_results) >= self.min_rows
+
+    async def _submit(self, shared: List[SharedTabularDataResults], fn, *args) -> SharedTabularDataResults | None:
+        future = self._executor.submit(fn, *args)
+        try:
+            shared_result = await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # worker keeps running, its result is dropped once it's done
+            future.add_done_callback(_unlink_result)
+            raise
+        if shared_result is not None:
+            shared.append(shared_result)
+        return shared_result
+
+    async def apply(self, query: ChartQuery, warehouse_compared_results: WarehouseComparedResults) -> ChartQueryResult:
+        shared: List[SharedTabularDataResults] = []
+        try:
+            results, sort_by_results, compare_results = [
+                await asyncio.to_thread(self._write, shared, results) for results in (
+                    warehouse_compared_results.results,
+                    warehouse_compared_results.sort_by_results,
+                    warehouse_compared_results.compare_results)]
+
+            shared_compared_kpi_result = None
+            if compare_results is not None and not warehouse_compared_results.results.group_by_columns():
+                # both are awaited even if one fails, so results of the other are unlinked too
+                shared_kpi_result, shared_compared_kpi_result = _raise_exceptions(await asyncio.gather(
+                    self._submit(shared, _build_results, query, results, sort_by_results),
+                    self._submit(shared, _build_compare_results, query, compare_results, None),
+                    return_exceptions=True))
+            else:
+                shared_kpi_result = await self._submit(shared, _build_results, query, results, sort_by_results)
+            if shared_kpi_result is None:
+                return empty_result(query)
+            if compare_results is not None and shared_compared_kpi_result is None:
+                shared_compared_kpi_result = await self._submit(
+                    shared, _build_compare_results, query, compare_results, shared_kpi_result)
+
+            kpi_result = await asyncio.to_thread(_read_kpi_result, shared_kpi_result)
+            compared_kpi_result = await asyncio.to_thread(_read_kpi_result, shared_compared_kpi_result) \
+                if shared_compared_kpi_result is not None else KpiChartQueryResult(None, None, None)
+            return chart_result(query, kpi_result, compared_kpi_result)
+        finally:
+            for shared_results in shared:
+                shared_results.unlink()
+
+    @staticmethod
+    def _write(shared: List[SharedTabularDataResults],
+               results: TabularDataResults | None) -> SharedTabularDataResults | None:
+        if results is None:
+            return None
+        shared_results = SharedTabularDataResults.write(results)
+        shared.append(shared_results)
+        return shared_results
@@ -12,9 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Callable, Dict, List, Tuple
+from typing import Callable, Dict, List, Set, Tuple
 
-from queryengine.core.tabular_data_result import TabularDataResult
+from pandas import Series
+
+from queryengine.core.tabular_data_result import GroupByKeys, TabularDataResult, TabularDataResults
 
 rollup_functions = {
     'sum': lambda group_by: group_by.sum(),
@@ -39,7 +41,7 @@ class RollupDataResult:
             .map_x_axis(x_axis_mapper) \
             .group_by_x_axis(rollup_functions[self.x_axis_rollup_function_name.lower()])
 
-    def filter(self, filter: Callable[[object], bool]) -> 'RollupDataResult':
+    def filter(self, filter: Callable[[Series], Series]) -> 'RollupDataResult':
         return RollupDataResult(
             self.warehouse_result.filter(filter),
             self.x_axis_rollup_function_name,
@@ -65,28 +67,26 @@ class RollupDataResults:
     def add(self, id: str, rollup_results: 'RollupDataResult'):
         self._results_map[id] = rollup_results
 
-    def trim_zeros(self):
+    def _map(self, fn: Callable[['RollupDataResult'], 'RollupDataResult']) -> 'RollupDataResults':
+        rollup_results = RollupDataResults()
         for id, result in self._results_map.items():
-            self._results_map[id] = result.trim_zeros()
-        return self
+            rollup_results.add(id, fn(result))
+        return rollup_results
 
-    def group_by_values(self):
-        group_by_values = set()
-        for id, result in self._results_map.items():
-            group_by_values = group_by_values.union(result.warehouse_result.group_by_values())
-        return group_by_values
+    def trim_zeros(self) -> 'RollupDataResults':
+        return self._map(lambda result: result.trim_zeros())
+
+    def group_by_values(self, group_by_keys: GroupByKeys | None = None) -> Set[Tuple]:
+        return TabularDataResults({id: result.warehouse_result for id, result in self._results_map.items()}) \
+            .group_by_values(group_by_keys)
 
     def rollup(self,
                x_axis_mapper: Callable[[object], object] = lambda x: x,
                group_by_columns_mapper: Callable[[object], object] = lambda x: x) -> Dict[str, TabularDataResult]:
         return {id: result.rollup(x_axis_mapper, group_by_columns_mapper) for id, result in self._results_map.items()}
 
-    def filter(self, filter: Callable[[object], bool]) -> 'RollupDataResults':
-        for result_id in self._results_map.keys():
-            self._results_map[result_id] = self._results_map[result_id].filter(filter)
-        return self
+    def filter(self, filter: Callable[[Series], Series]) -> 'RollupDataResults':
+        return self._map(lambda result: result.filter(filter))
 
     def filter_by_group_by_values(self, group_by_values: List[Tuple]) -> 'RollupDataResults':
-        for result_id in self._results_map.keys():
-            self._results_map[result_id] = self._results_map[result_id].filter_by_group_by_values(group_by_values)
-        return self
+        return self._map(lambda result: result.filter_by_group_by_values(group_by_values))
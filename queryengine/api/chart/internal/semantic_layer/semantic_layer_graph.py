@@ -0,0 +1,94 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Callable, Dict, Hashable, TypeVar
+
+import numpy as np
+
+from queryengine.api.chart.internal.domain import ChartQuery
+from queryengine.api.chart.internal.semantic_layer.rollup_data_result import RollupDataResult, RollupDataResults
+from queryengine.api.chart.internal.x_axis_specifics.x_axis_specifics import get_x_axis_specifics
+from queryengine.core.dateinterval import DatetimeInterval
+from queryengine.core.kpi.kpi import Kpi
+from queryengine.core.tabular_data_result import GroupByKeys, IdentityTable, SparseTabularDataResult, \
+    TabularDataResults, TabularDataResult
+
+T = TypeVar('T')
+
+
+class SemanticLayerGraph:
+    """
+    Semantic layer of a single request as a graph of identity table, rollup and formula nodes. Nodes are computed
+    lazily and memoized, so ranking of group by values, final results and compare results share the nodes they
+    have in common. Nodes are shared, so they must not be modified in place.
+    """
+    def __init__(self, query: ChartQuery):
+        self.query = query
+        self.x_axis_specifics = get_x_axis_specifics(query.x_axis_column.column_id)
+        # group by values of all results of the request are encoded by the same dictionary
+        self.group_by_keys = GroupByKeys()
+        self._nodes: Dict[Hashable, object] = {}
+        # nodes are keyed by identity of results, which are kept alive so their ids aren't reused
+        self._results: Dict[int, TabularDataResults] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _node(self, key: Hashable, compute: Callable[[], T]) -> T:
+        if key in self._nodes:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self._nodes[key] = compute()
+        return self._nodes[key]
+
+    def _results_key(self, results: TabularDataResults) -> int:
+        self._results[id(results)] = results
+        return id(results)
+
+    def group_by_codes(self, results: TabularDataResults) -> np.ndarray:
+        return self._node(('group_by_codes', self._results_key(results)),
+                          lambda: results.group_by_codes(self.group_by_keys))
+
+    def identity(self, date_interval: DatetimeInterval, results: TabularDataResults) -> IdentityTable:
+        group_by_columns = results.group_by_columns()
+        group_by_codes = self.group_by_codes(results)
+        # identity depends only on the axes, so results with same group by values share it
+        key = ('identity', date_interval.date_from, date_interval.date_to, tuple(group_by_columns),
+               group_by_codes.tobytes())
+        return self._node(key, lambda: self.x_axis_specifics.get_identity_result(
+            date_interval, self.query.time_grain, group_by_columns,
+            self.group_by_keys.decode(self.group_by_keys.sort(group_by_codes))))
+
+    def rollups(self, kpi: Kpi, date_interval: DatetimeInterval, results: TabularDataResults) -> RollupDataResults:
+        key = ('rollups', id(kpi), date_interval.date_from, date_interval.date_to, self._results_key(results))
+        return self._node(key, lambda: self._build_rollups(kpi, self.identity(date_interval, results), results))
+
+    def result(self, kpi: Kpi, date_interval: DatetimeInterval,
+               results: TabularDataResults) -> TabularDataResult | SparseTabularDataResult:
+        key = ('result', id(kpi), date_interval.date_from, date_interval.date_to, self._results_key(results))
+        return self._node(key, lambda: self.x_axis_specifics.get_semantic_layer_result(
+            self.query, kpi, self.identity(date_interval, results), self.rollups(kpi, date_interval, results)))
+
+    def _build_rollups(self, kpi: Kpi, identity_table_result: IdentityTable,
+                       results: TabularDataResults) -> RollupDataResults:
+        rollup_table_results = RollupDataResults()
+        for id, warehouse_result in results.results_map.items():
+            if warehouse_result.df.empty:
+                warehouse_result = identity_table_result.to_result()
+            rollup_table_results.add(id, RollupDataResult(
+                warehouse_result=warehouse_result,
+                x_axis_rollup_function_name=kpi.x_axis[self.query.x_axis_column.column_id].rollup_x_axis,
+                y_axis_rollup_function_name=kpi.x_axis[self.query.x_axis_column.column_id].rollup_y_axis,
+            ))
+        return rollup_table_results
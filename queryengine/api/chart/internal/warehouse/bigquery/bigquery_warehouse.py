@@ -12,37 +12,46 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+from typing import Dict
+
 from opentelemetry import trace
 
 from queryengine.api.chart.internal.domain import WarehouseChartQuery
-from queryengine.api.chart.internal.warehouse.bigquery.query_builder import query_builder
+from queryengine.api.chart.internal.warehouse.bigquery.query_builder import query_planner
+from queryengine.api.chart.internal.warehouse.bigquery.query_builder.query_planner import PlannedMetric
 from queryengine.api.chart.internal.warehouse.warehouse import Warehouse
-from queryengine.core.bigquery.queryexecutor import BigQueryExecutor
-from queryengine.core.tabular_data_result import TabularDataResults
+from queryengine.core.bigquery.queryexecutor import BigQueryExecutor, BigQueryFutureResult
+from queryengine.core.tabular_data_result import TabularDataResult
 from queryengine.core.warehouse import FutureResult
 
 
-class BigQueryFutureResult(FutureResult):
-    def __init__(self, futures):
-        self._futures = futures
-
-    def get(self) -> TabularDataResults:
-        query_results = TabularDataResults()
-        for symbol_id, query, future in self._futures:
-            query_result = future.result()
-            query_results.add(symbol_id, query_result)
-        return query_results
+async def _metric_result(planned_metric: PlannedMetric, future: asyncio.Future) -> TabularDataResult:
+    return planned_metric.scan.metric_result(planned_metric.scan_metric_id, await future, planned_metric.period)
 
 
 class BigQueryWarehouse(Warehouse):
     def __init__(self, big_query_executor: BigQueryExecutor):
         self.big_query_executor = big_query_executor
 
-    def submit_query(self, query: WarehouseChartQuery) -> FutureResult:
+    async def submit_query(self, query: WarehouseChartQuery) -> FutureResult:
+        return (await self.submit_queries({'query': query}))['query']
+
+    async def submit_queries(self, queries: Dict[str, WarehouseChartQuery]) -> Dict[str, FutureResult]:
         tracer = trace.get_tracer("query_engine")
-        with tracer.start_as_current_span("build_sql"):
-            bigquery_query_map = query_builder.build(query)
-            futures = []
-            for symbol_id, query in bigquery_query_map.items():
-                futures.append((symbol_id, query, self.big_query_executor.execute(query)))
-            return BigQueryFutureResult(futures)
+        with tracer.start_as_current_span("build_sql") as span:
+            planned_metrics = query_planner.plan(queries)
+            scans = {id(planned_metric.scan): planned_metric.scan for planned_metric in planned_metrics}
+            span.set_attribute("scans", len(scans))
+
+        with tracer.start_as_current_span("submit"):
+            scan_futures = {}
+            futures = {name: [] for name in queries}
+            for planned_metric in planned_metrics:
+                scan = planned_metric.scan
+                if id(scan) not in scan_futures:
+                    scan_futures[id(scan)] = self.big_query_executor.submit(scan.query)
+                futures[planned_metric.query_name].append((
+                    planned_metric.metric_id, scan.query,
+                    asyncio.ensure_future(_metric_result(planned_metric, scan_futures[id(scan)]))))
+            return {name: BigQueryFutureResult(query_futures) for name, query_futures in futures.items()}
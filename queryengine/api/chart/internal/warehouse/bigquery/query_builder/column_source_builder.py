@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import List
+
 from queryengine.api.chart.internal.warehouse.bigquery.query_builder import common
 from queryengine.core.bigquery.column_source import TableColumnSource
 from queryengine.core.user_history_definition.column_sources.column_sources import ColumnSource, QueryUserHistoryColumnSource
@@ -21,12 +23,14 @@ from queryengine.core.bigquery.sql.sql_builder import SelectStatement, UnionStat
 from queryengine.core.bigquery.sql.table_like import Cte
 from queryengine.core.datasource.datasource import DataType, DataSource
 from queryengine.core.datasource.datasources import EventDataSource, UserHistoryDataSource
+from queryengine.core.dateinterval import DatetimeInterval
 
 
 def build(app_id: str, table_name: str, datasource: DataSource,
-          user_history_definition, sql_builder: QueryBuilder, select_statement: SelectStatement) -> ColumnSource:
+          user_history_definition, sql_builder: QueryBuilder, select_statement: SelectStatement,
+          date_intervals: List[DatetimeInterval] | None = None) -> ColumnSource:
     if isinstance(datasource, EventDataSource):
-        table = _build_events_table(app_id, datasource, sql_builder)
+        table = _build_events_table(app_id, datasource, sql_builder, date_intervals)
         return TableColumnSource(table)
     elif isinstance(datasource, UserHistoryDataSource):
         table = common.build_table(app_id, datasource.schema, table_name)
@@ -36,28 +40,40 @@ def build(app_id: str, table_name: str, datasource: DataSource,
         return TableColumnSource(table)
 
 
-def _build_events_table(app_id, datasource, sql_builder) -> Cte:
+def _build_events_table(app_id, datasource, sql_builder,
+                        date_intervals: List[DatetimeInterval] | None = None) -> Cte:
+    """
+    Events are read from raw schema up to its data availability and from realtime load schema after it. If date
+    intervals are known, schema which can't contain any of their days is left out.
+    """
     raw_table = common.build_table(app_id, datasource.schema, datasource.table_name)
     load_table = common.build_table(app_id, datasource.realtime_schema, datasource.table_name)
 
+    raw_date_to = datasource.raw_data_availability.date_to.date() if datasource.raw_data_availability else None
+    reads_raw = raw_date_to is not None \
+        and (date_intervals is None or any(i.date_from.date() <= raw_date_to for i in date_intervals))
+    reads_load = raw_date_to is None \
+        or date_intervals is None or any(i.date_to.date() > raw_date_to for i in date_intervals)
+
     after_raw_filter = BooleanExpression.from_filter(
         load_table.column(constants.DATE_PARTITION_COLUMN_NAME),
         '>',
-        [str(datasource.raw_data_availability.date_to.date())], DataType.date
-    ) if datasource.raw_data_availability else BooleanExpression.as_('TRUE')
-    cte = Cte(
-        cte_name='base',
-        select=UnionStatement([
+        [str(raw_date_to)], DataType.date
+    ) if raw_date_to else BooleanExpression.as_('TRUE')
+    select_statements = []
+    if reads_raw:
+        select_statements.append(
             SelectStatement() \
                 .select_star() \
                 .from_(raw_table) \
-                .where(
-                BooleanExpression.from_date(
+                .where(BooleanExpression.from_date(
                     raw_table.column(constants.DATE_PARTITION_COLUMN_NAME),
                     datasource.raw_data_availability
-                ) if datasource.raw_data_availability else BooleanExpression.as_('FALSE')
-            ),
-            #  TODO hash gdpr columns
+                ))
+        )
+    if reads_load:
+        #  TODO hash gdpr columns
+        select_statements.append(
             SelectStatement() \
                 .select_star() \
                 .from_(load_table) \
@@ -67,8 +83,8 @@ def _build_events_table(app_id, datasource, sql_builder) -> Cte:
                     'boolean_is_not',
                     ['TRUE'], DataType.boolean
                 ))
-
             )
-        ]))
+        )
+    cte = Cte(cte_name='base', select=UnionStatement(select_statements))
     sql_builder.with_cte(cte)
     return cte
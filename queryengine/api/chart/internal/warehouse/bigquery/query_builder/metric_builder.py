@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import re
 from typing import List
 
 from queryengine.core.user_history_definition.column_sources.column_sources import ColumnSource
@@ -23,24 +24,68 @@ from queryengine.core.dateinterval import DatetimeInterval
 from queryengine.core.kpi.kpi import WarehouseMetric
 
 
-def build_select_expression(metric: WarehouseMetric, column_source: ColumnSource,
-                            date_intervals: List[DatetimeInterval], datasource: DataSource) -> Expression:
-    column_names = DotsFormatter().get_format_strings(metric.select_expression)
+_AGGREGATE_PATTERN = re.compile(r'^\s*(SUM|AVG|MIN|MAX|COUNT)\s*\((\s*DISTINCT\s+)?(.*)\)\s*$', re.IGNORECASE | re.DOTALL)
+
+
+def _is_single_argument(argument: str) -> bool:
+    # rejects expressions like SUM(a) / SUM(b), where the pattern matches "a) / SUM(b" as argument
+    depth = 0
+    for char in argument:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth < 0:
+                return False
+    return depth == 0
+
+
+def conditional_select_template(metric: WarehouseMetric) -> str | None:
+    """
+    Rewrites select expression consisting of a single aggregate call, so that it aggregates only rows matching
+    metric where expression. Returns None if select expression can't be rewritten.
+    """
+    match = _AGGREGATE_PATTERN.match(metric.select_expression)
+    if not match or not _is_single_argument(match.group(3)):
+        return None
+    function, distinct, argument = match.groups()
+    if argument.strip() == '*':
+        return None if distinct else row_count_template(metric)
+    distinct = 'DISTINCT ' if distinct else ''
+    return f'{function.upper()}({distinct}IF({metric.where_expression}, {argument}, NULL))'
+
+
+def row_count_template(metric: WarehouseMetric) -> str:
+    return f'COUNTIF({metric.where_expression})'
+
+
+def _build_expression(template: str, column_source: ColumnSource,
+                      date_intervals: List[DatetimeInterval], datasource: DataSource) -> Expression:
+    column_names = DotsFormatter().get_format_strings(template)
     columns = {c.id: column_source.get_and_load_column(c.id, date_intervals).to_sql()
                for c in datasource.columns_by_id.values() if c.id in column_names}
-    return Expression(
-        metric.select_expression,
-        template_dict=TemplateDict(columns)
-    ).as_alias(constants.DATA_COLUMN_ALIAS)
+    return Expression(template, template_dict=TemplateDict(columns))
+
+
+def build_select_expression(metric: WarehouseMetric, column_source: ColumnSource,
+                            date_intervals: List[DatetimeInterval], datasource: DataSource,
+                            alias: str = constants.DATA_COLUMN_ALIAS) -> Expression:
+    return _build_expression(metric.select_expression, column_source, date_intervals, datasource).as_alias(alias)
+
+
+def build_conditional_select_expression(metric: WarehouseMetric, column_source: ColumnSource,
+                                        date_intervals: List[DatetimeInterval], datasource: DataSource,
+                                        alias: str) -> Expression:
+    return _build_expression(conditional_select_template(metric), column_source, date_intervals, datasource) \
+        .as_alias(alias)
+
+
+def build_row_count_expression(metric: WarehouseMetric, column_source: ColumnSource,
+                               date_intervals: List[DatetimeInterval], datasource: DataSource,
+                               alias: str) -> Expression:
+    return _build_expression(row_count_template(metric), column_source, date_intervals, datasource).as_alias(alias)
 
 
 def build_boolean_expression(metric: WarehouseMetric, column_source: ColumnSource,
                              date_intervals: List[DatetimeInterval], datasource: DataSource) -> BooleanExpression:
-    column_names = DotsFormatter().get_format_strings(metric.where_expression)
-    columns = {c.id: column_source.get_and_load_column(c.id, date_intervals).to_sql()
-               for c in datasource.columns_by_id.values() if c.id in column_names}
-
-    return BooleanExpression(Expression(
-        expression=metric.where_expression,
-        template_dict=TemplateDict(columns),
-    ))
+    return BooleanExpression(_build_expression(metric.where_expression, column_source, date_intervals, datasource))
@@ -12,74 +12,224 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Dict
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
 
-from queryengine.api.chart.internal.domain import WarehouseChartQuery
+from queryengine.api.chart.internal.domain import WarehouseChartQuery, ColumnFilter
 from queryengine.api.chart.internal.warehouse.bigquery.query_builder import column_source_builder, metric_builder
 from queryengine.api.chart.internal.warehouse.bigquery.query_builder import x_axis_expression_builder, filter_builder, \
     group_by_builder
 from queryengine.core import constants
 from queryengine.core.bigquery.queryexecutor import BigQueryQuery
 from queryengine.core.bigquery.sql.boolean_expression import BooleanExpression, BooleanExpressionParenthesis
+from queryengine.core.bigquery.sql.expression import Expression
 from queryengine.core.bigquery.sql.sql_builder import QueryBuilder, SelectStatement
 from queryengine.core.datasource.datasources import UserHistoryDataSource
+from queryengine.core.dateinterval import DatetimeInterval
+from queryengine.core.kpi.kpi import WarehouseMetric
+from queryengine.core.tabular_data_result import TabularDataResult
+from queryengine.core.user_history_definition.column_sources.column_sources import ColumnSource
 
 
-def build(query: WarehouseChartQuery) -> Dict[str, BigQueryQuery]:
-    symbol_to_query_map = {}
+def _data_watermark(query: WarehouseChartQuery) -> str | None:
+    datasources = {query.datasource} \
+        | {column_filter.column_ref.datasource for column_filter in query.column_filters} \
+        | {group_by.datasource for group_by in query.column_group_bys}
+    watermarks = []
+    for datasource in sorted(datasources, key=lambda d: d.id):
+        watermark = datasource.data_watermark()
+        if watermark is None:
+            return None
+        watermarks.append(f'{datasource.id}={watermark}')
+    return ','.join(watermarks)
+
+
+@dataclass
+class Period:
+    """
+    Rows of a scan belonging to a single warehouse query, when scan merges several queries.
+    """
+    name: str
+    date_intervals: List[DatetimeInterval]
+    # filters which are not shared by all queries merged into the scan
+    column_filters: List[ColumnFilter]
+
+
+class MetricScan:
+    """
+    Single BigQuery statement computing all metrics of a query which read the same table.
+    """
+    def __init__(self, query: BigQueryQuery, dimension_columns: List[str],
+                 metric_columns: Dict[str, Tuple[str, str | None]], period_column: str | None = None):
+        self.query = query
+        self.dimension_columns = dimension_columns
+        # metric id -> (value column, column counting rows matching metric where expression)
+        self.metric_columns = metric_columns
+        self.period_column = period_column
+
+    def metric_result(self, metric_id: str, result: TabularDataResult, period: str | None = None) -> TabularDataResult:
+        value_column, rows_column = self.metric_columns[metric_id]
+        if len(self.metric_columns) == 1 and rows_column is None and self.period_column is None:
+            return result
+        df = result.df
+        if self.period_column is not None:
+            df = df[df[self.period_column] == period]
+        if rows_column is not None:
+            # metric queried on its own wouldn't return rows without any row matching its where expression
+            df = df[df[rows_column] > 0]
+        df = df[self.dimension_columns + [value_column]] \
+            .rename(columns={value_column: constants.DATA_COLUMN_ALIAS}) \
+            .reset_index(drop=True)
+        return TabularDataResult(df)
+
+
+def _group_metrics(metrics: Dict[str, WarehouseMetric]) -> List[Dict[str, WarehouseMetric]]:
+    metrics_by_table: Dict[str, Dict[str, WarehouseMetric]] = {}
+    for metric_id, metric in metrics.items():
+        metrics_by_table.setdefault(metric.data_source_table, {})[metric_id] = metric
+
+    groups = []
+    for table_metrics in metrics_by_table.values():
+        if len({metric.where_expression for metric in table_metrics.values()}) == 1:
+            groups.append(table_metrics)
+            continue
+        fused = {metric_id: metric for metric_id, metric in table_metrics.items()
+                 if metric.where_expression is None or metric_builder.conditional_select_template(metric)}
+        if len(fused) < 2:
+            fused = {}
+        else:
+            groups.append(fused)
+        groups.extend({metric_id: metric} for metric_id, metric in table_metrics.items() if metric_id not in fused)
+    return groups
+
+
+def _build_date_condition(column_source: ColumnSource, date_intervals: List[DatetimeInterval]) -> BooleanExpression:
+    boolean_expression = None
+    for date_interval in date_intervals:
+        date_column = column_source.get_and_load_column(constants.DATE_PARTITION_COLUMN_NAME, [date_interval])
+        date_condition = BooleanExpression.from_date(date_column, date_interval)
+        if not boolean_expression:
+            boolean_expression = date_condition
+        else:
+            boolean_expression = boolean_expression.or_(date_condition)
+    return BooleanExpressionParenthesis(boolean_expression)
+
+
+def _build_period_condition(period: Period, column_source: ColumnSource) -> BooleanExpression:
+    period_condition = _build_date_condition(column_source, period.date_intervals)
+    for filter in period.column_filters:
+        column = column_source.get_and_load_column(filter.column_ref.column_id, period.date_intervals)
+        period_condition.and_(BooleanExpression.from_filter(column, filter.operation, filter.value_list,
+                                                            filter.column_ref.column().data_type))
+    return BooleanExpressionParenthesis(period_condition)
 
+
+def _build_scan(query: WarehouseChartQuery, metrics: Dict[str, WarehouseMetric],
+                data_watermark: str | None, periods: List[Period] | None = None) -> MetricScan:
     user_history_definition = query.datasource.user_history_definition \
         if isinstance(query.datasource, UserHistoryDataSource) else None
+    data_source_table = next(iter(metrics.values())).data_source_table
+    where_expressions = {metric.where_expression for metric in metrics.values()}
+    shared_where_metric = next(iter(metrics.values())) if len(where_expressions) == 1 else None
+
+    sql_builder = QueryBuilder()
 
-    for metric_id, metric in query.metrics.items():
-        sql_builder = QueryBuilder()
+    select_statement = SelectStatement()
+    column_source = column_source_builder.build(query.app_id, data_source_table, query.datasource,
+                                                user_history_definition, sql_builder, select_statement,
+                                                query.date_intervals)
 
-        select_statement = SelectStatement()
-        column_source = column_source_builder.build(query.app_id, metric.data_source_table, query.datasource,
-                                                    user_history_definition, sql_builder, select_statement)
+    select_statement = select_statement.from_(column_source.table)
 
-        select_statement = select_statement.from_(column_source.table)
+    period_expressions = []
+    if periods:
+        period_conditions = [_build_period_condition(period, column_source) for period in periods]
+        select_statement.where(BooleanExpressionParenthesis(BooleanExpression.as_(
+            ' OR '.join(condition.to_sql() for condition in period_conditions))))
+        period_cases = ' '.join(f"WHEN {condition.to_sql()} THEN '{period.name}'"
+                                for period, condition in zip(periods, period_conditions))
+        period_expressions.append(Expression(f'CASE {period_cases} END').as_alias(constants.PERIOD_COLUMN_ALIAS))
+    else:
+        select_statement.where(_build_date_condition(column_source, query.date_intervals))
 
-        boolean_expression = None
-        for date_interval in query.date_intervals:
-            date_column = column_source.get_and_load_column(constants.DATE_PARTITION_COLUMN_NAME, [date_interval])
-            date_condition = BooleanExpression.from_date(date_column, date_interval)
-            if not boolean_expression:
-                boolean_expression = date_condition
+    metric_columns = {}
+    # identical metrics (i.e. same metric of main and compare period) are computed only once
+    columns_by_expression = {}
+    kpi_expressions = []
+    distinct_metrics = len({(metric.select_expression, metric.where_expression) for metric in metrics.values()})
+    for metric_id, metric in metrics.items():
+        expression_key = (metric.select_expression, metric.where_expression)
+        if expression_key in columns_by_expression:
+            metric_columns[metric_id] = columns_by_expression[expression_key]
+            continue
+        idx = len(columns_by_expression)
+        value_column = constants.DATA_COLUMN_ALIAS if distinct_metrics == 1 \
+            else f'{constants.DATA_COLUMN_ALIAS}_{idx + 1}'
+        rows_column = None
+        if shared_where_metric or not metric.where_expression:
+            kpi_expressions.append(metric_builder.build_select_expression(
+                metric, column_source, query.date_intervals, query.datasource, value_column))
+        else:
+            kpi_expressions.append(metric_builder.build_conditional_select_expression(
+                metric, column_source, query.date_intervals, query.datasource, value_column))
+            if metric_builder.conditional_select_template(metric) == metric_builder.row_count_template(metric):
+                # counting rows matching where expression is the value itself
+                rows_column = value_column
             else:
-                boolean_expression = boolean_expression.or_(date_condition)
-        select_statement.where(BooleanExpressionParenthesis(boolean_expression))
-        kpi_expression = metric_builder.build_select_expression(
-            metric, column_source, query.date_intervals, query.datasource)
-
-        for filter in query.column_filters:
-            filter_builder.build_from_filter(
-                app_id=query.app_id, column_source=column_source, date_intervals=query.date_intervals,
-                datasource=query.datasource, filter=filter,
-                select_statement=select_statement, sql_builder=sql_builder)
-
-        if metric.where_expression:
-            select_statement.and_where(metric_builder.build_boolean_expression(
-                metric, column_source, query.date_intervals, query.datasource))
-
-        x_axis_expression = x_axis_expression_builder.build(query, column_source, query.date_intervals)
-
-        group_by_expressions = []
-        for idx, group_by_column in enumerate(query.column_group_bys):
-            group_by_expressions.append(group_by_builder.build(
-                app_id=query.app_id, column_source=column_source, date_intervals=query.date_intervals,
-                datasource=query.datasource, group_by=group_by_column,
-                alias=f'group_by_{idx + 1}', select_statement=select_statement, sql_builder=sql_builder
-            ))
-
-        select_statement \
-            .select([x_axis_expression] + group_by_expressions + [kpi_expression]) \
-            .group_by([x_axis_expression] + group_by_expressions) \
-            .order_by([x_axis_expression])
-        sql_builder.select(select_statement)
-
-        symbol_to_query_map[metric_id] = BigQueryQuery(query.page_id, query.request_id,
-                                                       f"{query.datasource.id}.{metric.data_source_table}.{metric_id}",
-                                                       sql_builder.to_sql(),
-                                                       query.app_id)
-    return symbol_to_query_map
+                rows_column = f'rows_{idx + 1}'
+                kpi_expressions.append(metric_builder.build_row_count_expression(
+                    metric, column_source, query.date_intervals, query.datasource, rows_column))
+        columns_by_expression[expression_key] = (value_column, rows_column)
+        metric_columns[metric_id] = (value_column, rows_column)
+
+    for filter in query.column_filters:
+        filter_builder.build_from_filter(
+            app_id=query.app_id, column_source=column_source, date_intervals=query.date_intervals,
+            datasource=query.datasource, filter=filter,
+            select_statement=select_statement, sql_builder=sql_builder)
+
+    if shared_where_metric and shared_where_metric.where_expression:
+        select_statement.and_where(metric_builder.build_boolean_expression(
+            shared_where_metric, column_source, query.date_intervals, query.datasource))
+
+    x_axis_expression = x_axis_expression_builder.build(query, column_source, query.date_intervals)
+
+    group_by_expressions = []
+    for idx, group_by_column in enumerate(query.column_group_bys):
+        group_by_expressions.append(group_by_builder.build(
+            app_id=query.app_id, column_source=column_source, date_intervals=query.date_intervals,
+            datasource=query.datasource, group_by=group_by_column,
+            alias=f'{constants.GROUP_BY_COLUMN_ALIAS_PREFIX}{idx + 1}', select_statement=select_statement,
+            sql_builder=sql_builder
+        ))
+
+    select_statement \
+        .select([x_axis_expression] + group_by_expressions + period_expressions + kpi_expressions) \
+        .group_by([x_axis_expression] + group_by_expressions + period_expressions) \
+        .order_by([x_axis_expression])
+    sql_builder.select(select_statement)
+
+    bigquery_query = BigQueryQuery(query.page_id, query.request_id,
+                                   f"{query.datasource.id}.{data_source_table}.{'-'.join(metrics.keys())}",
+                                   sql_builder.to_sql(),
+                                   query.app_id,
+                                   data_watermark,
+                                   query.priority)
+    dimension_columns = [constants.X_AXIS_COLUMN_ALIAS] + [f'{constants.GROUP_BY_COLUMN_ALIAS_PREFIX}{idx + 1}'
+                                                           for idx in range(len(query.column_group_bys))]
+    return MetricScan(bigquery_query, dimension_columns, metric_columns,
+                      constants.PERIOD_COLUMN_ALIAS if periods else None)
+
+
+def build_scans(query: WarehouseChartQuery, periods: List[Period] | None = None) -> List[MetricScan]:
+    """
+    Metrics reading the same table are computed by a single statement. Where expressions which differ between
+    these metrics are turned into conditional aggregates. If periods are given, rows of every period are tagged
+    by period column, and query date intervals and filters must cover all periods.
+    """
+    data_watermark = _data_watermark(query)
+    return [_build_scan(query, metrics, data_watermark, periods) for metrics in _group_metrics(query.metrics)]
+
+
+def build(query: WarehouseChartQuery) -> Dict[str, BigQueryQuery]:
+    return {metric_id: scan.query for scan in build_scans(query) for metric_id in scan.metric_columns}
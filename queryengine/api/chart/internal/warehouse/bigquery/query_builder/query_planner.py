@@ -0,0 +1,140 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import dataclasses
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from queryengine.api.chart.internal.domain import WarehouseChartQuery, ColumnFilter
+from queryengine.api.chart.internal.warehouse.bigquery.query_builder import query_builder
+from queryengine.api.chart.internal.warehouse.bigquery.query_builder.query_builder import MetricScan, Period
+from queryengine.core.datasource.datasource import DataType
+from queryengine.core.dateinterval import DatetimeInterval
+
+
+@dataclass
+class PlannedMetric:
+    query_name: str
+    metric_id: str
+    scan: MetricScan
+    scan_metric_id: str
+    period: str | None
+
+
+def _same_shape(query: WarehouseChartQuery, other: WarehouseChartQuery) -> bool:
+    return query.app_id == other.app_id and query.datasource == other.datasource \
+        and query.time_grain == other.time_grain and query.x_axis_column == other.x_axis_column \
+        and query.column_group_bys == other.column_group_bys
+
+
+def _same_period(query: WarehouseChartQuery, other: WarehouseChartQuery) -> bool:
+    return query.date_intervals == other.date_intervals and query.column_filters == other.column_filters
+
+
+def _date_intervals_disjoint(date_intervals: List[DatetimeInterval], other: List[DatetimeInterval]) -> bool:
+    # date filters compare dates, so intervals touching on the same day overlap
+    return all(interval.date_to.date() < other_interval.date_from.date() or
+               other_interval.date_to.date() < interval.date_from.date()
+               for interval in date_intervals for other_interval in other)
+
+
+def _filters_disjoint(filter: ColumnFilter, other: ColumnFilter) -> bool:
+    if filter.column_ref != other.column_ref or filter.operation != 'between' or other.operation != 'between':
+        return False
+    data_type = filter.column_ref.column().data_type
+    if data_type == DataType.date:
+        parse = str
+    elif data_type in [DataType.number, DataType.integer]:
+        parse = float
+    else:
+        return False
+    value_from, value_to = map(parse, filter.value_list)
+    other_from, other_to = map(parse, other.value_list)
+    return value_to < other_from or other_to < value_from
+
+
+def _exclusive(query: WarehouseChartQuery, other: WarehouseChartQuery) -> bool:
+    """
+    True if no row can match both queries, which allows tagging every row with a single period.
+    """
+    return _date_intervals_disjoint(query.date_intervals, other.date_intervals) or \
+        any(_filters_disjoint(filter, other_filter)
+            for filter in query.column_filters for other_filter in other.column_filters)
+
+
+def _mergeable(query: WarehouseChartQuery, group: List[WarehouseChartQuery]) -> bool:
+    if not all(_same_shape(query, other) and _exclusive(query, other) for other in group):
+        return False
+    # filters not shared by all queries are applied by period condition, which can't join other datasources
+    common_filters = [f for f in query.column_filters if all(f in other.column_filters for other in group)]
+    return all(f.column_ref.datasource == q.datasource
+               for q in group + [query] for f in q.column_filters if f not in common_filters)
+
+
+def _merged_query(period_queries: Dict[str, WarehouseChartQuery]) -> Tuple[WarehouseChartQuery, List[Period]]:
+    queries = list(period_queries.values())
+    common_filters = [f for f in queries[0].column_filters if all(f in q.column_filters for q in queries[1:])]
+    merged = dataclasses.replace(
+        queries[0],
+        metrics={},
+        date_intervals=[interval for q in queries for interval in q.date_intervals],
+        column_filters=common_filters
+    )
+    periods = [Period(name, q.date_intervals, [f for f in q.column_filters if f not in common_filters])
+               for name, q in period_queries.items()]
+    return merged, periods
+
+
+def plan(queries: Dict[str, WarehouseChartQuery]) -> List[PlannedMetric]:
+    """
+    Plans all queries of a single chart into as few scans as possible. Queries reading the same rows (i.e. main and
+    sort by query) share a period, queries reading disjoint rows (i.e. main and compare query) are merged into
+    a single scan and their rows are told apart by period column.
+    """
+    # every group is a single scan, period name -> names of queries reading period rows
+    groups: List[Dict[str, List[str]]] = []
+    for name, query in queries.items():
+        for group in groups:
+            period_name = next((period_name for period_name in group
+                                if _same_shape(query, queries[period_name])
+                                and _same_period(query, queries[period_name])), None)
+            if period_name is not None:
+                group[period_name].append(name)
+                break
+            if _mergeable(query, [queries[period_name] for period_name in group]):
+                group[name] = [name]
+                break
+        else:
+            groups.append({name: [name]})
+
+    planned_metrics = []
+    for group in groups:
+        if len(group) == 1:
+            merged, periods = dataclasses.replace(queries[next(iter(group))], metrics={}), None
+        else:
+            merged, periods = _merged_query({period_name: queries[period_name] for period_name in group})
+
+        scan_metrics = {}
+        for period_name, names in group.items():
+            for name in names:
+                for metric_id, metric in queries[name].metrics.items():
+                    scan_metric_id = f'{name}.{metric_id}' if len(queries) > 1 else metric_id
+                    merged.metrics[scan_metric_id] = metric
+                    scan_metrics[scan_metric_id] = (name, metric_id, period_name if periods else None)
+
+        for scan in query_builder.build_scans(merged, periods):
+            for scan_metric_id in scan.metric_columns:
+                name, metric_id, period = scan_metrics[scan_metric_id]
+                planned_metrics.append(PlannedMetric(name, metric_id, scan, scan_metric_id, period))
+    return planned_metrics
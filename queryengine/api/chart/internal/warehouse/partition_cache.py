@@ -0,0 +1,186 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import dataclasses
+import hashlib
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+from queryengine.api.chart.internal.domain import WarehouseChartQuery
+from queryengine.api.chart.internal.warehouse.warehouse import Warehouse
+from queryengine.core import constants
+from queryengine.core.bigquery.result_cache import ResultCache
+from queryengine.core.dateinterval import DatetimeInterval
+from queryengine.core.tabular_data_result import TabularDataResult, TabularDataResults
+from queryengine.core.timegrain import TimeGrain
+from queryengine.core.warehouse import FutureResult
+
+
+def _is_partitioned(query: WarehouseChartQuery) -> bool:
+    # rows charted by date depend only on the data of their own day, for daily datasources as well as for events
+    # truncated to time grain of at most a day
+    return query.x_axis_column.column_id == constants.DATE_PARTITION_COLUMN_NAME \
+        and _closed_until(query) is not None
+
+
+def _closed_until(query: WarehouseChartQuery) -> date | None:
+    """
+    Last day for which data of all datasources of the query doesn't change anymore, None if some datasource can
+    change at any time.
+    """
+    datasources = {query.datasource} \
+        | {column_filter.column_ref.datasource for column_filter in query.column_filters} \
+        | {group_by.datasource for group_by in query.column_group_bys}
+    closed_until = [datasource.closed_until() for datasource in datasources]
+    if any(d is None for d in closed_until):
+        return None
+    return min(closed_until)
+
+
+def shape_key(query: WarehouseChartQuery) -> str:
+    """
+    Identifies everything about the query except its dates. Time grain of daily datasources is left out, because
+    they are always queried by day and rolled up to the time grain afterwards.
+    """
+    shape = (
+        query.app_id,
+        query.datasource.id,
+        query.time_grain if query.datasource.time_grain != TimeGrain.day else None,
+        sorted((metric_id, metric.select_expression, metric.where_expression, metric.data_source_table)
+               for metric_id, metric in query.metrics.items()),
+        [(f.column_ref.datasource.id, f.column_ref.column_id, f.operation, list(f.value_list))
+         for f in query.column_filters],
+        [(c.datasource.id, c.column_id) for c in query.column_group_bys],
+        (query.x_axis_column.datasource.id, query.x_axis_column.column_id),
+    )
+    return hashlib.sha256(repr(shape).encode('utf-8')).hexdigest()
+
+
+def _dates(date_intervals: List[DatetimeInterval]) -> List[date]:
+    dates = set()
+    for date_interval in date_intervals:
+        dates.update(date_interval.date_from.date() + timedelta(days=i) for i in range(date_interval.days()))
+    return sorted(dates)
+
+
+def _date_intervals(dates: List[date]) -> List[DatetimeInterval]:
+    # consecutive dates are queried as a single interval
+    date_intervals: List[Tuple[date, date]] = []
+    for d in dates:
+        if date_intervals and date_intervals[-1][1] + timedelta(days=1) == d:
+            date_intervals[-1] = (date_intervals[-1][0], d)
+        else:
+            date_intervals.append((d, d))
+    return [DatetimeInterval(datetime.combine(date_from, datetime.min.time()),
+                             datetime.combine(date_to, datetime.min.time()))
+            for date_from, date_to in date_intervals]
+
+
+class _PartitionedQuery:
+    def __init__(self, query: WarehouseChartQuery, result_cache: ResultCache):
+        self.query = query
+        self.result_cache = result_cache
+        self.shape_key = shape_key(query)
+        self.closed_until = _closed_until(query)
+        self.cached: Dict[str, List[TabularDataResult]] = {metric_id: [] for metric_id in query.metrics}
+        self.missing_dates: List[date] = []
+
+    def look_up(self):
+        dates = _dates(self.query.date_intervals)
+        # all days are looked up at once, as some caches are slow to reach
+        cached = self.result_cache.get_many([self._key(metric_id, d) for d in dates if d <= self.closed_until
+                                             for metric_id in self.query.metrics])
+        for d in dates:
+            slices = {metric_id: cached.get(self._key(metric_id, d)) for metric_id in self.query.metrics}
+            if any(result is None for result in slices.values()):
+                self.missing_dates.append(d)
+            else:
+                for metric_id, result in slices.items():
+                    self.cached[metric_id].append(result)
+
+    def _key(self, metric_id: str, d: date) -> str:
+        return f'partition:{self.shape_key}:{metric_id}:{d}'
+
+    def missing_query(self) -> WarehouseChartQuery | None:
+        if not self.missing_dates:
+            return None
+        return dataclasses.replace(self.query, date_intervals=_date_intervals(self.missing_dates))
+
+    def put(self, fresh_results: TabularDataResults):
+        for metric_id, result in fresh_results.results_map.items():
+            days = pd.to_datetime(result.df[constants.X_AXIS_COLUMN_ALIAS]).dt.date
+            slices = dict(tuple(result.df.groupby(days, sort=False)))
+            for d in self.missing_dates:
+                if d > self.closed_until:
+                    continue
+                # days without rows are cached too, so they are not queried again
+                self.result_cache.put(self._key(metric_id, d), TabularDataResult(slices.get(d, result.df.iloc[0:0])))
+
+    def stitch(self, fresh_results: TabularDataResults | None) -> TabularDataResults:
+        results = TabularDataResults()
+        for metric_id, cached in self.cached.items():
+            slices = [result.df for result in cached]
+            if fresh_results is not None:
+                slices.append(fresh_results.results_map[metric_id].df)
+            df = pd.concat(slices, ignore_index=True).sort_values(constants.X_AXIS_COLUMN_ALIAS, kind='stable') \
+                .reset_index(drop=True)
+            results.add(metric_id, TabularDataResult(df))
+        return results
+
+
+class _PartitionedFutureResult(FutureResult):
+    def __init__(self, partitioned_query: _PartitionedQuery, missing_future: FutureResult | None):
+        self.partitioned_query = partitioned_query
+        self.missing_future = missing_future
+
+    async def get(self) -> TabularDataResults:
+        fresh_results = None
+        if self.missing_future is not None:
+            fresh_results = await self.missing_future.get()
+            await asyncio.to_thread(self.partitioned_query.put, fresh_results)
+        return self.partitioned_query.stitch(fresh_results)
+
+
+class PartitionCachingWarehouse(Warehouse):
+    """
+    Caches results charted by date per query shape and per day. Days up to the watermark of daily datasources,
+    and event partitions closed for late events, don't change anymore. Only days which were never queried and days
+    which are still open are sent to the backing warehouse and stitched together with cached days.
+    """
+    def __init__(self, backing_warehouse: Warehouse, result_cache: ResultCache):
+        self.backing_warehouse = backing_warehouse
+        self.result_cache = result_cache
+
+    async def submit_query(self, query: WarehouseChartQuery) -> FutureResult:
+        return (await self.submit_queries({'query': query}))['query']
+
+    async def submit_queries(self, queries: Dict[str, WarehouseChartQuery]) -> Dict[str, FutureResult]:
+        partitioned_queries = {name: _PartitionedQuery(query, self.result_cache)
+                               for name, query in queries.items() if _is_partitioned(query)}
+        # caches may decode results and reach disk or network, which would block the event loop
+        await asyncio.gather(*[asyncio.to_thread(partitioned_query.look_up)
+                               for partitioned_query in partitioned_queries.values()])
+        backing_queries = {name: query for name, query in queries.items() if name not in partitioned_queries}
+        for name, partitioned_query in partitioned_queries.items():
+            missing_query = partitioned_query.missing_query()
+            if missing_query is not None:
+                backing_queries[name] = missing_query
+
+        futures = await self.backing_warehouse.submit_queries(backing_queries) if backing_queries else {}
+        for name, partitioned_query in partitioned_queries.items():
+            futures[name] = _PartitionedFutureResult(partitioned_query, futures.get(name))
+        return futures
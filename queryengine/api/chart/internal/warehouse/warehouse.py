@@ -13,6 +13,7 @@
 # limitations under the License.
 
 from abc import abstractmethod, ABC
+from typing import Dict
 
 from queryengine.api.chart.internal.domain import WarehouseChartQuery
 from queryengine.core.warehouse import FutureResult
@@ -20,5 +21,11 @@ from queryengine.core.warehouse import FutureResult
 
 class Warehouse(ABC):
     @abstractmethod
-    def submit_query(self, query: WarehouseChartQuery) -> FutureResult:
+    async def submit_query(self, query: WarehouseChartQuery) -> FutureResult:
         pass
+
+    async def submit_queries(self, queries: Dict[str, WarehouseChartQuery]) -> Dict[str, FutureResult]:
+        """
+        Submits all queries needed by a single chart, so warehouse can plan them together.
+        """
+        return {name: await self.submit_query(query) for name, query in queries.items()}
@@ -13,18 +13,18 @@
 # limitations under the License.
 
 from datetime import timedelta
-from typing import Set, Tuple, List
+from typing import Tuple, List
 
 from queryengine.api.chart.internal.domain import ChartQuery, WarehouseChartQuery, ColumnFilter, TimeGrain
 from queryengine.api.chart.internal.semantic_layer import formula_interpreter
-from queryengine.api.chart.internal.semantic_layer.rollup_data_result import RollupDataResult, RollupDataResults
+from queryengine.api.chart.internal.semantic_layer.rollup_data_result import RollupDataResults
 from queryengine.api.chart.internal.warehouse.warehouse import Warehouse
 from queryengine.api.chart.internal.x_axis_specifics.x_axis_specifics import XAxisSpecifics, WarehouseComparedResults
 from queryengine.core import constants
 from queryengine.core.datasource.datasource import ColumnReference
 from queryengine.core.dateinterval import DatetimeInterval
 from queryengine.core.kpi.kpi import Kpi
-from queryengine.core.tabular_data_result import TabularDataResult
+from queryengine.core.tabular_data_result import IdentityTable, SparseTabularDataResult, TabularDataResult
 
 
 class CohortDaySpecifics(XAxisSpecifics):
@@ -38,50 +38,38 @@ class CohortDaySpecifics(XAxisSpecifics):
         warehouse_query.date_intervals[0].date_to += timedelta(days=warehouse_query.date_intervals[0].days())
         return warehouse_query
 
-    def get_warehouse_compared_results(self, query: ChartQuery, warehouse: Warehouse) -> WarehouseComparedResults:
-        result_future = warehouse.submit_query(self._preprocess_warehouse_query(query.to_warehouse_query()))
-
+    async def get_warehouse_compared_results(self, query: ChartQuery,
+                                             warehouse: Warehouse) -> WarehouseComparedResults:
+        warehouse_query = self._preprocess_warehouse_query(query.to_warehouse_query())
         sort_by_warehouse_query = query.to_sort_by_warehouse_query()
-        sort_by_future = None
-        if sort_by_warehouse_query:
-            sort_by_future = warehouse.submit_query(sort_by_warehouse_query)
+        compared_warehouse_query = query.to_compare_warehouse_query()
+        if compared_warehouse_query:
+            compared_warehouse_query = self._preprocess_warehouse_query(compared_warehouse_query)
 
-        compare_query = query.to_compare_warehouse_query()
-        if compare_query:
-            compared_warehouse_query = self._preprocess_warehouse_query(compare_query)
-            results = result_future.get()
-            compare_results = warehouse.submit_query(compared_warehouse_query).get()
+        results, sort_by_results, compare_results = await self._get_warehouse_results(
+            warehouse, warehouse_query, sort_by_warehouse_query, compared_warehouse_query)
 
-            return WarehouseComparedResults(
-                results=results,
-                compare_results=compare_results,
-                sort_by_results=sort_by_future.get() if sort_by_future else None
-            )
-        else:
-            return WarehouseComparedResults(
-                results=result_future.get(),
-                compare_results=None,
-                sort_by_results=sort_by_future.get() if sort_by_future else None
-            )
+        return WarehouseComparedResults(
+            results=results,
+            compare_results=compare_results,
+            sort_by_results=sort_by_results
+        )
 
     def get_identity_result(self, date_interval: DatetimeInterval, time_grain: TimeGrain | None,
-                            group_by_columns: List[str], group_by_values: Set[Tuple]) -> RollupDataResult:
-        return RollupDataResult(
-            warehouse_result=TabularDataResult.from_cohort_days(
-                days=date_interval.days() // 2,
-                group_by_columns=group_by_columns,
-                group_by_values=group_by_values,
-            ),
-            x_axis_rollup_function_name='sum',
-            y_axis_rollup_function_name='sum'
+                            group_by_columns: List[str], group_by_values: List[Tuple]) -> IdentityTable:
+        return IdentityTable.from_cohort_days(
+            days=date_interval.days() // 2,
+            group_by_columns=group_by_columns,
+            group_by_values=group_by_values,
         )
 
     def get_compare_identity_date_interval(self, query: ChartQuery) -> DatetimeInterval:
         return query.compare_interval
 
     def get_semantic_layer_result(self, query: ChartQuery, kpi: Kpi,
-                                  identity_table_result: RollupDataResult,
-                                  rollup_table_results: RollupDataResults) -> TabularDataResult:
+                                  identity_table_result: IdentityTable,
+                                  rollup_table_results: RollupDataResults) \
+            -> TabularDataResult | SparseTabularDataResult:
         result = formula_interpreter.evaluate(
             identity=identity_table_result
             .rollup(),
@@ -89,16 +77,14 @@ class CohortDaySpecifics(XAxisSpecifics):
             values=rollup_table_results
             .rollup(),
         )
-        result.df[constants.X_AXIS_COLUMN_ALIAS] = result.df[constants.X_AXIS_COLUMN_ALIAS].apply(lambda x: int(x))
-
-        return result
+        return result.map_x_axis(lambda s: s.astype('int64'))
 
     def get_total(self, query: ChartQuery,
-                  identity_table_result: RollupDataResult,
+                  identity_table_result: IdentityTable,
                   rollup_table_results: RollupDataResults) -> TabularDataResult | None:
         return None
 
     def get_single_total(self, query: ChartQuery,
-                         identity_table_result: RollupDataResult,
+                         identity_table_result: IdentityTable,
                          rollup_table_results: RollupDataResults) -> TabularDataResult | None:
         return None
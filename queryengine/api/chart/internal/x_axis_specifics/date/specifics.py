@@ -13,62 +13,50 @@
 # limitations under the License.
 
 from datetime import timedelta
-from typing import Set, Tuple, List
+from typing import Callable, Tuple, List
+
+from pandas import Series
+from pandas.api.types import is_datetime64_any_dtype
 
 from queryengine.api.chart.internal.domain import ChartQuery
 from queryengine.api.chart.internal.semantic_layer import formula_interpreter
-from queryengine.api.chart.internal.semantic_layer.rollup_data_result import RollupDataResult, RollupDataResults
+from queryengine.api.chart.internal.semantic_layer.rollup_data_result import RollupDataResults
 from queryengine.api.chart.internal.warehouse.warehouse import Warehouse
 from queryengine.api.chart.internal.x_axis_specifics.x_axis_specifics import XAxisSpecifics, WarehouseComparedResults
-from queryengine.core import constants
 from queryengine.core.dateinterval import DatetimeInterval
 from queryengine.core.kpi.kpi import Kpi
-from queryengine.core.tabular_data_result import TabularDataResult
+from queryengine.core.tabular_data_result import IdentityTable, SparseTabularDataResult, TabularDataResult
 from queryengine.core.timegrain import TimeGrain
 
 
 class DateSpecifics(XAxisSpecifics):
-    def get_warehouse_compared_results(self, query: ChartQuery, warehouse: Warehouse) -> WarehouseComparedResults:
+    async def get_warehouse_compared_results(self, query: ChartQuery,
+                                             warehouse: Warehouse) -> WarehouseComparedResults:
         warehouse_query = query.to_warehouse_query()
-        result_future = warehouse.submit_query(warehouse_query)
-
         sort_by_warehouse_query = query.to_sort_by_warehouse_query()
-        sort_by_future = None
-        if sort_by_warehouse_query:
-            sort_by_future = warehouse.submit_query(sort_by_warehouse_query)
-
         compared_warehouse_query = query.to_compare_warehouse_query()
-        if compared_warehouse_query:
-            compare_future = warehouse.submit_query(compared_warehouse_query)
-            results = result_future.get()
 
-            compare_results = compare_future.get() \
+        results, sort_by_results, compare_results = await self._get_warehouse_results(
+            warehouse, warehouse_query, sort_by_warehouse_query, compared_warehouse_query)
+
+        if compare_results is not None:
+            compare_results = compare_results \
                 .map_x_axis(mapper=lambda dt: dt + timedelta(days=query.compare_align_offset())) \
-                .filter(lambda dt: query.requested_date_interval.contains_date(dt.date()))
+                .filter(query.requested_date_interval.contains_dates)
 
-            return WarehouseComparedResults(
-                results=results,
-                compare_results=compare_results,
-                sort_by_results=sort_by_future.get() if sort_by_future else None
-            )
-        else:
-            return WarehouseComparedResults(
-                results=result_future.get(),
-                compare_results=None,
-                sort_by_results=sort_by_future.get() if sort_by_future else None
-            )
+        return WarehouseComparedResults(
+            results=results,
+            compare_results=compare_results,
+            sort_by_results=sort_by_results
+        )
 
     def get_identity_result(self, date_interval: DatetimeInterval, time_grain: TimeGrain | None,
-                            group_by_columns: List[str], group_by_values: Set[Tuple]) -> RollupDataResult:
-        return RollupDataResult(
-            warehouse_result=TabularDataResult.from_date_interval(
-                date_interval,
-                time_grain,
-                group_by_columns=group_by_columns,
-                group_by_values=group_by_values,
-            ),
-            x_axis_rollup_function_name='sum',
-            y_axis_rollup_function_name='sum'
+                            group_by_columns: List[str], group_by_values: List[Tuple]) -> IdentityTable:
+        return IdentityTable.from_date_interval(
+            date_interval,
+            time_grain,
+            group_by_columns=group_by_columns,
+            group_by_values=group_by_values,
         )
 
     def get_compare_identity_date_interval(self, query: ChartQuery) -> DatetimeInterval:
@@ -79,32 +67,32 @@ class DateSpecifics(XAxisSpecifics):
         )
 
     def get_semantic_layer_result(self, query: ChartQuery, kpi: Kpi,
-                                  identity_table_result: RollupDataResult,
-                                  rollup_table_results: RollupDataResults) -> TabularDataResult:
+                                  identity_table_result: IdentityTable,
+                                  rollup_table_results: RollupDataResults) \
+            -> TabularDataResult | SparseTabularDataResult:
         result = formula_interpreter.evaluate(
             identity=identity_table_result
-            .rollup(x_axis_mapper=lambda s: s.apply(query.time_grain.truncate_datetime)),
+            .rollup(x_axis_mapper=_truncate_datetimes(query.time_grain)),
             formula=kpi.formula,
             values=rollup_table_results
-            .rollup(x_axis_mapper=lambda s: s.apply(query.time_grain.truncate_datetime)),
+            .rollup(x_axis_mapper=_truncate_datetimes(query.time_grain)),
         )
         if query.datasource.time_grain.to_minutes() >= TimeGrain.day.to_minutes():
-            result.df[constants.X_AXIS_COLUMN_ALIAS] = result.df[
-                constants.X_AXIS_COLUMN_ALIAS].apply(lambda dt: dt.date())
+            result = result.map_x_axis(lambda s: s.dt.date)
         return result
 
     def get_total(self, query: ChartQuery,
-                  identity_table_result: RollupDataResult,
+                  identity_table_result: IdentityTable,
                   rollup_table_results: RollupDataResults) -> TabularDataResult | None:
         total = formula_interpreter.evaluate(
             identity=identity_table_result.rollup(x_axis_mapper=lambda dt: 0),
             formula=query.kpi.formula,
             values=rollup_table_results.rollup(x_axis_mapper=lambda dt: 0),
         )
-        return total
+        return total.dense()
 
     def get_single_total(self, query: ChartQuery,
-                         identity_table_result: RollupDataResult,
+                         identity_table_result: IdentityTable,
                          rollup_table_results: RollupDataResults) -> TabularDataResult | None:
         return formula_interpreter.evaluate(
             identity=identity_table_result
@@ -112,4 +100,14 @@ class DateSpecifics(XAxisSpecifics):
             formula=query.kpi.formula,
             values=rollup_table_results
             .rollup(x_axis_mapper=lambda dt: 0, group_by_columns_mapper=lambda x: 0)
-        )
+        ).dense()
+
+
+def _truncate_datetimes(time_grain: TimeGrain) -> Callable[[Series], Series]:
+    def truncate(x_axis_values: Series) -> Series:
+        if not is_datetime64_any_dtype(x_axis_values):
+            return x_axis_values.apply(time_grain.truncate_datetime)
+        tz = x_axis_values.dt.tz
+        values = time_grain.truncate_datetimes(x_axis_values.dt.tz_localize(None).to_numpy())
+        return Series(values, index=x_axis_values.index, name=x_axis_values.name).dt.tz_localize(tz)
+    return truncate
@@ -12,17 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import Set, List, Tuple
+from typing import List, Tuple
 
-from queryengine.api.chart.internal.domain import ChartQuery
-from queryengine.api.chart.internal.semantic_layer.rollup_data_result import RollupDataResult, RollupDataResults
+from queryengine.api.chart.internal.domain import ChartQuery, WarehouseChartQuery
+from queryengine.api.chart.internal.semantic_layer.rollup_data_result import RollupDataResults
 from queryengine.api.chart.internal.warehouse.warehouse import Warehouse
 from queryengine.core import constants
 from queryengine.core.dateinterval import DatetimeInterval
 from queryengine.core.kpi.kpi import Kpi
-from queryengine.core.tabular_data_result import TabularDataResults
+from queryengine.core.tabular_data_result import IdentityTable, TabularDataResults
 from queryengine.core.timegrain import TimeGrain
 
 
@@ -34,13 +35,30 @@ class WarehouseComparedResults:
 
 
 class XAxisSpecifics(ABC):
+    @staticmethod
+    async def _get_warehouse_results(warehouse: Warehouse, warehouse_query: WarehouseChartQuery,
+                                     sort_by_warehouse_query: WarehouseChartQuery | None,
+                                     compared_warehouse_query: WarehouseChartQuery | None
+                                     ) -> Tuple[TabularDataResults, TabularDataResults | None,
+                                                TabularDataResults | None]:
+        # all queries are submitted together, so warehouse can merge them and run them concurrently
+        warehouse_queries = {'main': warehouse_query}
+        if sort_by_warehouse_query:
+            warehouse_queries['sort_by'] = sort_by_warehouse_query
+        if compared_warehouse_query:
+            warehouse_queries['compare'] = compared_warehouse_query
+        futures = await warehouse.submit_queries(warehouse_queries)
+        results = await asyncio.gather(*[future.get() for future in futures.values()])
+        results_by_name = dict(zip(futures.keys(), results))
+        return results_by_name['main'], results_by_name.get('sort_by'), results_by_name.get('compare')
+
     @abstractmethod
-    def get_warehouse_compared_results(self, query: ChartQuery, warehouse: Warehouse) -> WarehouseComparedResults:
+    async def get_warehouse_compared_results(self, query: ChartQuery, warehouse: Warehouse) -> WarehouseComparedResults:
         pass
 
     @abstractmethod
     def get_identity_result(self, date_interval: DatetimeInterval, time_grain: TimeGrain | None,
-                            group_by_columns: List[str], group_by_values: Set[Tuple]) -> RollupDataResult:
+                            group_by_columns: List[str], group_by_values: List[Tuple]) -> IdentityTable:
         pass
 
     @abstractmethod
@@ -48,17 +66,17 @@ class XAxisSpecifics(ABC):
         pass
 
     @abstractmethod
-    def get_semantic_layer_result(self, query: ChartQuery, kpi: Kpi, identity_table_result: RollupDataResult,
+    def get_semantic_layer_result(self, query: ChartQuery, kpi: Kpi, identity_table_result: IdentityTable,
                                   rollup_table_results: RollupDataResults):
         pass
 
     @abstractmethod
-    def get_total(self, query: ChartQuery, identity_table_result: RollupDataResult,
+    def get_total(self, query: ChartQuery, identity_table_result: IdentityTable,
                   rollup_table_results: RollupDataResults):
         pass
 
     @abstractmethod
-    def get_single_total(self, query: ChartQuery, identity_table_result: RollupDataResult,
+    def get_single_total(self, query: ChartQuery, identity_table_result: IdentityTable,
                          rollup_table_results: RollupDataResults):
         pass
 
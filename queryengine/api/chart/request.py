@@ -18,6 +18,7 @@ from typing import List
 from queryengine.api.chart.internal.domain import ChartQuery, ColumnFilter
 from queryengine.core.app.app import App
 from queryengine.core.app.datasource import AppRepository
+from queryengine.core.bigquery.admission import QueryPriority
 from queryengine.core.datasource.repository import DataSourceRepository
 from queryengine.core.dateinterval import DateInterval
 from queryengine.core.kpi.repository import KpiRepository
@@ -53,7 +54,8 @@ class ChartQueryDTO:
     group_by_limit: int | None = None
 
     def to_domain_model(self, app_id: str, app_repository: AppRepository, datasource_repository: DataSourceRepository,
-                        kpi_repository: KpiRepository) -> ChartQuery:
+                        kpi_repository: KpiRepository,
+                        priority: QueryPriority = QueryPriority.interactive) -> ChartQuery:
         app = app_repository.from_app_id(app_id)
         kpi_ref = kpi_repository.load_by_full_kpi_id(app=app, full_kpi_id=self.kpi_id)
         sort_by_kpi_ref = kpi_repository.load_by_full_kpi_id(app=app,
@@ -76,5 +78,6 @@ class ChartQueryDTO:
             sort_by_datasource=datasource_repository.load_datasource_by_id(app,
                                                                            sort_by_kpi_ref.datasource_id) if sort_by_kpi_ref else None,
             sort_by_kpi=sort_by_kpi_ref.kpi if sort_by_kpi_ref else None,
-            group_by_limit=self.group_by_limit
+            group_by_limit=self.group_by_limit,
+            priority=priority
         )
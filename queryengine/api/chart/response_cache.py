@@ -0,0 +1,156 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import dataclasses
+import hashlib
+import json
+import uuid
+import zlib
+from threading import Lock
+from typing import Awaitable, Callable, Dict, Set, Tuple
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.logger import logger
+from fastapi.responses import JSONResponse
+
+from queryengine.api.chart.internal.domain import ChartQuery
+from queryengine.api.chart.request import ChartQueryDTO
+from queryengine.api.chart.response import ChartDataDTO
+from queryengine.core.bigquery.admission import QueryPriority
+from queryengine.core.shared_store import SharedStore
+
+
+def data_watermark(query: ChartQuery) -> str | None:
+    datasources = {query.datasource} \
+        | {column_filter.column_ref.datasource for column_filter in query.column_filters} \
+        | {group_by.datasource for group_by in query.column_group_bys} \
+        | ({query.sort_by_datasource} if query.sort_by_datasource else set())
+    watermarks = []
+    for datasource in sorted(datasources, key=lambda d: d.id):
+        watermark = datasource.data_watermark()
+        if watermark is None:
+            return None
+        watermarks.append(f'{datasource.id}={watermark}')
+    return ','.join(watermarks)
+
+
+def cache_key(app_id: str, query_dto: ChartQueryDTO, query: ChartQuery) -> str:
+    """
+    Identifies the chart regardless of the page and request asking for it. Definitions of kpis are part of the key,
+    so responses computed before a kpi changed are never served.
+    """
+    canonical_dto = {name: value for name, value in dataclasses.asdict(query_dto).items()
+                     if name not in ('page_id', 'request_id')}
+    definitions = [repr(query.kpi), repr(query.sort_by_kpi)]
+    payload = json.dumps([app_id, canonical_dto, definitions], sort_keys=True, default=str)
+    return 'chart:' + hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _render(chart_data: ChartDataDTO) -> bytes:
+    return JSONResponse(content=jsonable_encoder(chart_data)).body
+
+
+def _encode(watermark: str, body: bytes) -> bytes:
+    return zlib.compress(watermark.encode('utf-8') + b'\n' + body)
+
+
+def _decode(value: bytes) -> Tuple[str, bytes]:
+    watermark, body = zlib.decompress(value).split(b'\n', 1)
+    return watermark.decode('utf-8'), body
+
+
+class ChartResponseCache:
+    """
+    Caches rendered chart responses together with watermarks of the data they were computed from. Once new data
+    lands, the stale response is still served while a single background refresh computes the new one. Charts of
+    data which can change at any time are not cached.
+    """
+    def __init__(self, store: SharedStore, ttl_seconds: int):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self._lock = Lock()
+        self._refreshing: Set[str] = set()
+        self._refresh_tasks: Set[asyncio.Task] = set()
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._refresh_errors = 0
+
+    async def respond(self, app_id: str, query_dto: ChartQueryDTO, query: ChartQuery,
+                      compute: Callable[[ChartQueryDTO, QueryPriority], Awaitable[ChartDataDTO]]) -> Response:
+        watermark = data_watermark(query)
+        if watermark is None:
+            return self._response(_render(await compute(query_dto, QueryPriority.interactive)))
+
+        key = cache_key(app_id, query_dto, query)
+        value = (await asyncio.to_thread(self.store.get_many, [key])).get(key)
+        if value is not None:
+            cached_watermark, body = _decode(value)
+            if cached_watermark == watermark:
+                with self._lock:
+                    self._hits += 1
+            else:
+                with self._lock:
+                    self._stale_hits += 1
+                self._refresh(key, watermark, query_dto, compute)
+            return self._response(body)
+
+        with self._lock:
+            self._misses += 1
+        body = _render(await compute(query_dto, QueryPriority.interactive))
+        await asyncio.to_thread(self.store.set_many, {key: _encode(watermark, body)}, self.ttl_seconds)
+        return self._response(body)
+
+    def _refresh(self, key: str, watermark: str, query_dto: ChartQueryDTO,
+                 compute: Callable[[ChartQueryDTO, QueryPriority], Awaitable[ChartDataDTO]]):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        # own ids, so cancelling the page which triggered the refresh doesn't cancel it
+        refresh_id = f'refresh-{uuid.uuid4()}'
+        refresh_dto = dataclasses.replace(query_dto, page_id=refresh_id, request_id=refresh_id)
+        task = asyncio.create_task(self._run_refresh(key, watermark, refresh_dto, compute))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _run_refresh(self, key: str, watermark: str, query_dto: ChartQueryDTO,
+                           compute: Callable[[ChartQueryDTO, QueryPriority], Awaitable[ChartDataDTO]]):
+        try:
+            # refreshes only warm the cache up, so they don't compete with page loads for warehouse slots
+            body = _render(await compute(query_dto, QueryPriority.background))
+            await asyncio.to_thread(self.store.set_many, {key: _encode(watermark, body)}, self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f'Refreshing cached chart response failed: {e}')
+            with self._lock:
+                self._refresh_errors += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    @staticmethod
+    def _response(body: bytes) -> Response:
+        return Response(content=body, media_type='application/json')
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'stale_hits': self._stale_hits,
+                'misses': self._misses,
+                'refreshing': len(self._refreshing),
+                'refresh_errors': self._refresh_errors,
+            }
@@ -12,39 +12,48 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 import time
 
 from fastapi.logger import logger
 from opentelemetry import trace
 
-from queryengine.api.chart.internal.domain import ChartQuery, ChartQueryResult
-from queryengine.api.chart.internal.semantic_layer.kpi_chart_result import KpiChartQueryResult
+from queryengine.api.chart.internal.domain import ChartQuery
+from queryengine.api.chart.internal.semantic_layer.chart_semantic_layer import apply_semantic_layer, empty_result
+from queryengine.api.chart.internal.semantic_layer.process_pool import SemanticLayerPool
 from queryengine.api.chart.internal.warehouse.warehouse import Warehouse
 from queryengine.api.chart.internal.x_axis_specifics.x_axis_specifics import get_x_axis_specifics
 from queryengine.api.chart.request import ChartQueryDTO
 from queryengine.api.chart.response import ChartDataDTO
 from queryengine.core.app.datasource import AppRepository
+from queryengine.core.bigquery.admission import QueryPriority
 from queryengine.core.datasource.repository import DataSourceRepository
 from queryengine.core.kpi.repository import KpiRepository
-from queryengine.core.warehouse import TooManyRowsException, TooManyGroupByValuesException
-from queryengine.core import constants
 
 
 class ChartQueryService:
     def __init__(self, app_repository: AppRepository, datasource_repository: DataSourceRepository,
-                 kpi_repository: KpiRepository, warehouse: Warehouse):
+                 kpi_repository: KpiRepository, warehouse: Warehouse,
+                 semantic_layer_pool: SemanticLayerPool | None = None):
         self._app_repository = app_repository
         self._datasource_repository = datasource_repository
         self._kpi_repository = kpi_repository
         self._warehouse = warehouse
+        self._semantic_layer_pool = semantic_layer_pool
 
-    def execute(self, app_id: str, query_dto: ChartQueryDTO) -> ChartDataDTO:
-        query = query_dto.to_domain_model(
+    def load_query(self, app_id: str, query_dto: ChartQueryDTO,
+                   priority: QueryPriority = QueryPriority.interactive) -> ChartQuery:
+        return query_dto.to_domain_model(
             app_id=app_id,
             app_repository=self._app_repository,
             datasource_repository=self._datasource_repository,
-            kpi_repository=self._kpi_repository
+            kpi_repository=self._kpi_repository,
+            priority=priority
         )
+
+    async def execute(self, app_id: str, query_dto: ChartQueryDTO,
+                      priority: QueryPriority = QueryPriority.interactive) -> ChartDataDTO:
+        query = self.load_query(app_id, query_dto, priority)
         if not query.date_interval:
             return ChartDataDTO.from_chart_results(self._empty_result(query))
 
@@ -62,13 +71,21 @@ class ChartQueryService:
             try:
                 # warehouse data
                 query_start_time = time.time()
-                warehouse_compared_results = get_x_axis_specifics(query.x_axis_column.column_id) \
+                warehouse_compared_results = await get_x_axis_specifics(query.x_axis_column.column_id) \
                     .get_warehouse_compared_results(query, self._warehouse)
                 query_end_time = time.time()
 
                 semantic_start_time = time.time()
-                with tracer.start_as_current_span("semantic_layer"):
-                    chart_result = self._apply_semantic_layer(query, warehouse_compared_results)
+                with tracer.start_as_current_span("semantic_layer") as semantic_layer_span:
+                    if self._semantic_layer_pool is not None and \
+                            self._semantic_layer_pool.offloads(warehouse_compared_results):
+                        semantic_layer_span.set_attribute("process_pool", True)
+                        chart_query_result = await self._semantic_layer_pool.apply(query, warehouse_compared_results)
+                        chart_result = await asyncio.to_thread(ChartDataDTO.from_chart_results, chart_query_result)
+                    else:
+                        # pandas work is CPU bound, keep it off the event loop so other requests can make progress
+                        chart_result = await asyncio.to_thread(
+                            self._apply_semantic_layer, query, warehouse_compared_results)
                 semantic_end_time = time.time()
                 span.set_attribute("status", "OK")
                 span.set_status(trace.Status(trace.StatusCode.OK, "OK"))
@@ -90,50 +107,7 @@ Total: {end_time - start_time:.2f}s
             return chart_result
 
     def _empty_result(self, query: ChartQuery):
-        return ChartQueryResult(
-            chart_data=None,
-            chart_total=None,
-            chart_total_overall=None,
-            compare_period_chart_data=None,
-            compare_period_chart_total=None,
-            compare_period_chart_total_overall=None,
-            unit=query.kpi.unit
-        )
+        return empty_result(query)
 
     def _apply_semantic_layer(self, query, warehouse_compared_results) -> ChartDataDTO:
-        #check distinct values in group by columns
-        tracer = trace.get_tracer("query_engine")
-        distinct_group_by_values = warehouse_compared_results.results.group_by_columns_distinct_values_count()
-        max_rows = warehouse_compared_results.results.get_max_rows()
-        if distinct_group_by_values > constants.BIGQUERY_MAX_DISTINCT_GROUP_BY_VALUES and \
-            max_rows > constants.BIGQUERY_MAX_ROWS / 2:
-            with tracer.start_as_current_span("group_by_columns_distinct_value") as span:
-                span.set_attribute("distinct_group_by_values", distinct_group_by_values)
-                span.set_attribute("rows_count", max_rows)
-                raise TooManyGroupByValuesException()
-
-        if len(warehouse_compared_results.results.group_by_columns()) > 0 and len(
-                warehouse_compared_results.results.group_by_values()) == 0:
-            # special case where we use group by but got no data so we can't easily generate identity values with 0
-            # we just return empty results
-            chart_result = self._empty_result(query)
-        else:
-            # semantic layer data
-            with tracer.start_as_current_span("semantic_layer_build_results") as span:
-                kpi_result = KpiChartQueryResult.build_from_result(
-                    query, warehouse_compared_results.results,
-                    warehouse_compared_results.sort_by_results)
-            with tracer.start_as_current_span("semantic_layer_build_compare_results") as span:
-                compared_kpi_result = KpiChartQueryResult.build_from_compare_result(
-                    query, warehouse_compared_results.compare_results, kpi_result.result)
-
-            chart_result = ChartQueryResult(
-                chart_data=kpi_result.result,
-                chart_total=kpi_result.total,
-                chart_total_overall=kpi_result.single_total,
-                compare_period_chart_data=compared_kpi_result.result,
-                compare_period_chart_total=compared_kpi_result.total,
-                compare_period_chart_total_overall=compared_kpi_result.single_total,
-                unit=query.kpi.unit
-            )
-        return ChartDataDTO.from_chart_results(chart_result)
+        return ChartDataDTO.from_chart_results(apply_semantic_layer(query, warehouse_compared_results))
@@ -12,47 +12,61 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from fastapi.logger import logger
 
 from queryengine import dependencies
+from queryengine.api.chart.internal.semantic_layer.process_pool import SemanticLayerPool
 from queryengine.api.chart.internal.warehouse.bigquery.bigquery_warehouse import BigQueryWarehouse
+from queryengine.api.chart.internal.warehouse.partition_cache import PartitionCachingWarehouse
 from queryengine.api.chart.internal.warehouse.warehouse import Warehouse
 from queryengine.api.chart.request import ChartQueryDTO
 from queryengine.api.chart.response import ChartDataDTO
+from queryengine.api.chart.response_cache import ChartResponseCache
 from queryengine.api.chart.service import ChartQueryService
 from queryengine.core.app.datasource import AppRepository
 from queryengine.core.bigquery.queryexecutor import BigQueryExecutor
+from queryengine.core.bigquery.result_cache import ResultCache
 from queryengine.core.datasource.repository import DataSourceRepository
 from queryengine.core.kpi.repository import KpiRepository
-from queryengine.core.warehouse import TooManyRequestsException, TooManyGroupByValuesException, TooManyRowsException
+from queryengine.core.warehouse import TooManyRequestsException, TooManyGroupByValuesException, \
+    TooLargeResultException, TooManyBytesException
 from queryengine.logging.router import LoggingRoute
 
 router = APIRouter(route_class=LoggingRoute)
 
 
 def bigquery_warehouse(
-        bigquery_executor: BigQueryExecutor = Depends(dependencies.bigquery_executor)) -> BigQueryWarehouse:
-    yield BigQueryWarehouse(bigquery_executor)
+        bigquery_executor: BigQueryExecutor = Depends(dependencies.chart_bigquery_executor),
+        result_cache: ResultCache = Depends(dependencies.result_cache)) -> Warehouse:
+    yield PartitionCachingWarehouse(BigQueryWarehouse(bigquery_executor), result_cache)
 
 
-@router.post("/api/v1/{app_id}/charts/submit")
-def submit_chart(app_id: str, request: ChartQueryDTO,
-                 warehouse: Warehouse = Depends(bigquery_warehouse),
-                 app_config_repository: AppRepository = Depends(dependencies.app_config_repository),
-                 datasource_repository: DataSourceRepository = Depends(dependencies.datasource_repository),
-                 kpi_repository: KpiRepository = Depends(dependencies.kpi_repository),
-                 ) -> ChartDataDTO:
+@router.post("/api/v1/{app_id}/charts/submit", response_model=ChartDataDTO)
+async def submit_chart(app_id: str, request: ChartQueryDTO,
+                       warehouse: Warehouse = Depends(bigquery_warehouse),
+                       app_config_repository: AppRepository = Depends(dependencies.app_config_repository),
+                       datasource_repository: DataSourceRepository = Depends(dependencies.datasource_repository),
+                       kpi_repository: KpiRepository = Depends(dependencies.kpi_repository),
+                       chart_response_cache: ChartResponseCache = Depends(dependencies.chart_response_cache),
+                       semantic_layer_pool: SemanticLayerPool | None = Depends(dependencies.semantic_layer_pool),
+                       ) -> Response:
     logger.info(f'Got chart request: {request}')
+    service = ChartQueryService(
+        app_repository=app_config_repository,
+        datasource_repository=datasource_repository,
+        kpi_repository=kpi_repository,
+        warehouse=warehouse,
+        semantic_layer_pool=semantic_layer_pool)
     try:
-        return ChartQueryService(
-            app_repository=app_config_repository,
-            datasource_repository=datasource_repository,
-            kpi_repository=kpi_repository,
-            warehouse=warehouse).execute(app_id, request)
+        return await chart_response_cache.respond(
+            app_id, request, service.load_query(app_id, request),
+            lambda query_dto, priority: service.execute(app_id, query_dto, priority))
     except TooManyRequestsException:
         raise HTTPException(status_code=429)
     except TooManyGroupByValuesException:
         raise HTTPException(status_code=422, detail='Too many group by values')
-    except TooManyRowsException:
-        raise HTTPException(status_code=422, detail='Too many rows')
+    except TooLargeResultException as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except TooManyBytesException as e:
+        raise HTTPException(status_code=422, detail=str(e))
@@ -25,11 +25,11 @@ class BigQueryWarehouse(Warehouse):
     def __init__(self, big_query_executor: BigQueryExecutor):
         self.big_query_executor = big_query_executor
 
-    def submit_query(self, query: ColumnValuesQuery) -> FutureResult:
+    async def submit_query(self, query: ColumnValuesQuery) -> FutureResult:
         tracer = trace.get_tracer("query_engine")
         with tracer.start_as_current_span("build_sql"):
             bigquery_query_map = query_builder.build(query)
             futures = []
             for symbol_id, query in bigquery_query_map.items():
-                futures.append((symbol_id, query, self.big_query_executor.execute(query)))
+                futures.append((symbol_id, query, self.big_query_executor.submit(query)))
             return BigQueryFutureResult(futures)
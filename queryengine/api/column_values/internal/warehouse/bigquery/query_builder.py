@@ -17,6 +17,7 @@ from typing import Dict
 
 from queryengine.api.column_values.internal.domain import ColumnValuesQuery
 from queryengine.core import constants
+from queryengine.core.bigquery.admission import QueryPriority
 from queryengine.core.bigquery.queryexecutor import BigQueryQuery
 from queryengine.core.bigquery.sql.boolean_expression import BooleanExpression
 from queryengine.core.bigquery.sql.sql_builder import QueryBuilder, SelectStatement
@@ -41,4 +42,6 @@ def build(query: ColumnValuesQuery) -> Dict[str, BigQueryQuery]:
         query.page_id, query.request_id,
         f"{query.column.datasource.id}.{query.column.datasource.table_name}.{query.column.column_id}",
         sql_builder.to_sql(),
-        query.app.app_id())}
+        query.app.app_id(),
+        query.column.datasource.data_watermark(),
+        QueryPriority.column_values)}
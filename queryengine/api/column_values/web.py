@@ -37,14 +37,14 @@ def bigquery_warehouse(
 
 
 @router.post("/api/v1/{app_id}/column-values/submit")
-def submit_colum_values(app_id: str, request: ColumnValuesQueryDTO,
-                        warehouse: Warehouse = Depends(bigquery_warehouse),
-                        app_config_repository: AppRepository = Depends(dependencies.app_config_repository),
-                        datasource_repository: DataSourceRepository = Depends(dependencies.datasource_repository),
-                        ) -> List:
+async def submit_colum_values(app_id: str, request: ColumnValuesQueryDTO,
+                              warehouse: Warehouse = Depends(bigquery_warehouse),
+                              app_config_repository: AppRepository = Depends(dependencies.app_config_repository),
+                              datasource_repository: DataSourceRepository = Depends(dependencies.datasource_repository),
+                              ) -> List:
     logger.info(f'Got column values request: {request}')
     try:
-        return ColumnValuesQueryService(
+        return await ColumnValuesQueryService(
             app_repository=app_config_repository,
             datasource_repository=datasource_repository,
             warehouse=warehouse
@@ -20,5 +20,5 @@ from queryengine.core.warehouse import FutureResult
 
 class Warehouse(ABC):
     @abstractmethod
-    def submit_query(self, query: EventErrorsQuery) -> FutureResult:
+    async def submit_query(self, query: EventErrorsQuery) -> FutureResult:
         pass
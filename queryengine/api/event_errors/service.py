@@ -32,7 +32,7 @@ class EventErrorsQueryService:
         self._datasource_repository = datasource_repository
         self.warehouse = warehouse
 
-    def execute(self, app_id: str, query_dto: EventErrorsQueryDTO) -> int:
+    async def execute(self, app_id: str, query_dto: EventErrorsQueryDTO) -> int:
         query = query_dto.to_domain_model(
             app_id=app_id,
             app_repository=self._app_repository
@@ -48,7 +48,7 @@ class EventErrorsQueryService:
             span.set_attribute("days", query.date_interval.days())
 
             start_time = time.time()
-            tabular_data_results = self.warehouse.submit_query(query).get()
+            tabular_data_results = await (await self.warehouse.submit_query(query)).get()
             end_time = time.time()
             logger.info(f'''Event errors query {query} finished. Total: {end_time - start_time:.2f}s''')
 
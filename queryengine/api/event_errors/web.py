@@ -35,14 +35,14 @@ def bigquery_warehouse(
     yield BigQueryWarehouse(bigquery_executor)
 
 @router.post("/api/v1/{app_id}/event-errors/submit")
-def submit_event_errors(app_id: str, request: EventErrorsQueryDTO,
-                        warehouse: Warehouse = Depends(bigquery_warehouse),
-                        app_config_repository: AppRepository = Depends(dependencies.app_config_repository),
-                        datasource_repository: DataSourceRepository = Depends(dependencies.datasource_repository),
-                        ) -> Dict[str, int]:
+async def submit_event_errors(app_id: str, request: EventErrorsQueryDTO,
+                              warehouse: Warehouse = Depends(bigquery_warehouse),
+                              app_config_repository: AppRepository = Depends(dependencies.app_config_repository),
+                              datasource_repository: DataSourceRepository = Depends(dependencies.datasource_repository),
+                              ) -> Dict[str, int]:
     logger.info(f'Got event errors request: {request}')
     try:
-        return EventErrorsQueryService(
+        return await EventErrorsQueryService(
             app_repository=app_config_repository,
             datasource_repository=datasource_repository,
             warehouse=warehouse
@@ -0,0 +1,166 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Deque, Dict
+
+from queryengine.core.warehouse import TooManyRequestsException
+
+
+class QueryPriority(IntEnum):
+    # lower value is admitted first
+    interactive = 0
+    column_values = 1
+    background = 2
+
+
+DEFAULT_MAX_WAIT_SECONDS = {
+    QueryPriority.interactive: 30.0,
+    QueryPriority.column_values: 10.0,
+    QueryPriority.background: 300.0,
+}
+
+
+class _Waiter:
+    def __init__(self, app_id: str, priority: QueryPriority):
+        self.app_id = app_id
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class AdmissionScheduler:
+    """
+    Limits number of concurrently running BigQuery jobs. Jobs which can't run right away wait in bounded per app
+    queues. Free slots go to the highest priority class with waiting jobs and within it to the app with the lowest
+    number of running jobs relative to its weight, so a single app can't starve others. Jobs which can't get a slot
+    in time are rejected with TooManyRequestsException.
+    """
+    def __init__(self, max_running: int, max_queued_per_app: int,
+                 max_wait_seconds: Dict[QueryPriority, float] | None = None,
+                 app_weights: Dict[str, float] | None = None):
+        self.max_running = max_running
+        self.max_queued_per_app = max_queued_per_app
+        self.max_wait_seconds = max_wait_seconds or DEFAULT_MAX_WAIT_SECONDS
+        self.app_weights = app_weights or {}
+        self._running_by_app: Dict[str, int] = defaultdict(int)
+        self._running = 0
+        self._queues: Dict[QueryPriority, Dict[str, Deque[_Waiter]]] = {priority: {} for priority in QueryPriority}
+        self._admitted = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._wait_seconds_total = 0.0
+        self._wait_seconds_max = 0.0
+
+    def _queued(self, app_id: str) -> int:
+        return sum(len(queues.get(app_id, ())) for queues in self._queues.values())
+
+    def _next_waiter(self) -> _Waiter | None:
+        for priority in QueryPriority:
+            queues = self._queues[priority]
+            if not queues:
+                continue
+            app_id = min(queues, key=lambda a: (self._running_by_app.get(a, 0) / self.app_weights.get(a, 1.0),
+                                                queues[a][0].enqueued_at))
+            waiter = queues[app_id].popleft()
+            if not queues[app_id]:
+                del queues[app_id]
+            return waiter
+        return None
+
+    def _dispatch(self):
+        while self._running < self.max_running:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            self._running += 1
+            self._running_by_app[waiter.app_id] += 1
+            waiter.future.set_result(None)
+
+    def _remove(self, waiter: _Waiter):
+        queue = self._queues[waiter.priority].get(waiter.app_id)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[waiter.priority][waiter.app_id]
+
+    def _release(self, app_id: str):
+        self._running -= 1
+        self._running_by_app[app_id] -= 1
+        if self._running_by_app[app_id] == 0:
+            del self._running_by_app[app_id]
+        self._dispatch()
+
+    async def _acquire(self, app_id: str, priority: QueryPriority) -> float:
+        if self._queued(app_id) >= self.max_queued_per_app:
+            self._rejected += 1
+            raise TooManyRequestsException()
+
+        waiter = _Waiter(app_id, priority)
+        self._queues[priority].setdefault(app_id, deque()).append(waiter)
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait_seconds[priority])
+        except (asyncio.TimeoutError, asyncio.CancelledError) as ex:
+            if waiter.future.done():
+                # slot was granted while we were giving up
+                self._release(app_id)
+            else:
+                waiter.future.cancel()
+                self._remove(waiter)
+            if isinstance(ex, asyncio.TimeoutError):
+                self._timed_out += 1
+                raise TooManyRequestsException()
+            raise
+
+        wait_seconds = time.monotonic() - waiter.enqueued_at
+        self._admitted += 1
+        self._wait_seconds_total += wait_seconds
+        self._wait_seconds_max = max(self._wait_seconds_max, wait_seconds)
+        return wait_seconds
+
+    @asynccontextmanager
+    async def slot(self, app_id: str, priority: QueryPriority):
+        """
+        Waits for a free slot and holds it for the duration of the context, yields seconds spent waiting.
+        """
+        wait_seconds = await self._acquire(app_id, priority)
+        try:
+            yield wait_seconds
+        finally:
+            self._release(app_id)
+
+    def stats(self) -> Dict[str, object]:
+        queued_by_app = defaultdict(int)
+        for queues in self._queues.values():
+            for app_id, queue in queues.items():
+                queued_by_app[app_id] += len(queue)
+        return {
+            'running': self._running,
+            'max_running': self.max_running,
+            'queued': sum(queued_by_app.values()),
+            'admitted': self._admitted,
+            'rejected': self._rejected,
+            'timed_out': self._timed_out,
+            'wait_seconds_avg': self._wait_seconds_total / self._admitted if self._admitted else 0.0,
+            'wait_seconds_max': self._wait_seconds_max,
+            'apps': {
+                app_id: {'running': self._running_by_app.get(app_id, 0), 'queued': queued_by_app.get(app_id, 0)}
+                for app_id in set(self._running_by_app) | set(queued_by_app)
+            },
+        }
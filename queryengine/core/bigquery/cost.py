@@ -0,0 +1,123 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import contextvars
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from expiringdict import ExpiringDict
+from google.cloud.bigquery import Client
+from opentelemetry import trace
+
+from queryengine.core.bigquery.queryexecutor import BigQueryExecutor, BigQueryQuery, build_job_config
+from queryengine.core.tabular_data_result import TabularDataResult
+from queryengine.core.warehouse import TooManyBytesException
+
+
+class CostEstimator(ABC):
+    @abstractmethod
+    async def estimate_bytes(self, query: BigQueryQuery) -> int:
+        pass
+
+
+class DryRunCostEstimator(CostEstimator):
+    """
+    Estimates bytes processed by a query with a BigQuery dry run, which is free and doesn't take slots.
+    """
+    def __init__(self, project: str, io_threads: int = 8):
+        self.client = Client(project=project)
+        self.io_executor = ThreadPoolExecutor(max_workers=io_threads, thread_name_prefix='bigquery-dry-run')
+
+    def _dry_run(self, query: BigQueryQuery) -> int:
+        job_config = build_job_config(query)
+        job_config.dry_run = True
+        # estimate what the query would scan, not whether BigQuery happens to have it cached right now
+        job_config.use_query_cache = False
+        return self.client.query(query.sql, job_config=job_config).total_bytes_processed or 0
+
+    async def estimate_bytes(self, query: BigQueryQuery) -> int:
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self.io_executor, lambda: context.run(self._dry_run, query))
+
+
+class CachingCostEstimator(CostEstimator):
+    """
+    Caches estimates per query fingerprint, so repeated query shapes don't pay for the dry run round trip.
+    Estimates expire, because tables grow over time.
+    """
+    def __init__(self, backing_estimator: CostEstimator, max_len: int = 10000, max_age_seconds: int = 3600):
+        self.backing_estimator = backing_estimator
+        self._estimates = ExpiringDict(max_len=max_len, max_age_seconds=max_age_seconds)
+
+    async def estimate_bytes(self, query: BigQueryQuery) -> int:
+        fingerprint = query.fingerprint()
+        estimate = self._estimates.get(fingerprint)
+        if estimate is None:
+            estimate = await self.backing_estimator.estimate_bytes(query)
+            self._estimates[fingerprint] = estimate
+        return estimate
+
+
+class BytesBudget:
+    """
+    Rejects charts whose queries would together process more bytes than the app is allowed to scan per chart.
+    Queries of a chart are summed by their request.
+    """
+    def __init__(self, estimator: CostEstimator, max_bytes: int | None, app_max_bytes: Dict[str, int] | None = None,
+                 max_requests: int = 10000, max_request_age_seconds: int = 600):
+        self.estimator = estimator
+        self.max_bytes = max_bytes
+        self.app_max_bytes = app_max_bytes or {}
+        self._request_bytes = ExpiringDict(max_len=max_requests, max_age_seconds=max_request_age_seconds)
+
+    def _max_bytes(self, app_id: str) -> int | None:
+        return self.app_max_bytes.get(app_id, self.max_bytes)
+
+    async def charge(self, query: BigQueryQuery) -> int:
+        """
+        Returns estimated bytes processed by the query, raises TooManyBytesException if queries of its request
+        would process more bytes than its app is allowed to.
+        """
+        estimated_bytes = await self.estimator.estimate_bytes(query)
+        # nothing is awaited between reading and updating bytes of the request, so concurrent queries can't race
+        request_bytes = self._request_bytes.get(query.request_id, 0) + estimated_bytes
+        max_bytes = self._max_bytes(query.app_id)
+        if max_bytes is not None and request_bytes > max_bytes:
+            raise TooManyBytesException(request_bytes, max_bytes)
+        self._request_bytes[query.request_id] = request_bytes
+        return estimated_bytes
+
+
+class BytesBudgetBigQueryExecutor(BigQueryExecutor):
+    """
+    Checks queries against the bytes budget before they are executed. Placed below the result cache, so cached
+    results are served without a dry run and regardless of the budget.
+    """
+    def __init__(self, backing_bigquery_executor: BigQueryExecutor, bytes_budget: BytesBudget):
+        self.backing_bigquery_executor = backing_bigquery_executor
+        self.bytes_budget = bytes_budget
+
+    async def execute(self, query: BigQueryQuery) -> TabularDataResult:
+        estimated_bytes = await self.bytes_budget.charge(query)
+        trace.get_current_span().set_attribute(f"estimated_bytes {query.metric_id}", estimated_bytes)
+        return await self.backing_bigquery_executor.execute(query)
+
+    def cancel_by_page_id(self, page_id: str):
+        self.backing_bigquery_executor.cancel_by_page_id(page_id)
+
+    def cancel_by_request_id(self, request_id: str):
+        self.backing_bigquery_executor.cancel_by_request_id(request_id)
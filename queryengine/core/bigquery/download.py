@@ -0,0 +1,103 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from abc import ABC, abstractmethod
+
+import db_dtypes
+import pandas as pd
+import pyarrow
+import pyarrow.compute
+from fastapi.logger import logger
+from google.cloud.bigquery.table import RowIterator
+
+from queryengine.core import constants
+
+
+def _types_mapper(arrow_type: pyarrow.DataType):
+    # same dtypes RowIterator.to_dataframe produces, so downstream code sees identical frames
+    if pyarrow.types.is_boolean(arrow_type):
+        return pd.BooleanDtype()
+    if pyarrow.types.is_integer(arrow_type):
+        return pd.Int64Dtype()
+    if pyarrow.types.is_date32(arrow_type):
+        return db_dtypes.DateDtype()
+    if pyarrow.types.is_time64(arrow_type):
+        return db_dtypes.TimeDtype()
+    return None
+
+
+def _is_dimension_column(name: str) -> bool:
+    return name.startswith(constants.GROUP_BY_COLUMN_ALIAS_PREFIX) or name == constants.PERIOD_COLUMN_ALIAS
+
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Group by and period columns hold few distinct values repeated on many rows, so strings are stored as categories
+    and integers in the smallest integer type. X axis and metric columns keep their dtypes, as KPI formulas compute
+    with them.
+    """
+    for column in filter(_is_dimension_column, df.columns):
+        if pd.api.types.is_object_dtype(df[column]):
+            df[column] = df[column].astype('category')
+        elif pd.api.types.is_integer_dtype(df[column]):
+            df[column] = pd.to_numeric(df[column], downcast='integer')
+    return df
+
+
+def arrow_to_dataframe(table: pyarrow.Table) -> pd.DataFrame:
+    # strings are dictionary encoded before conversion, so a python string isn't created for every row
+    for i, field in enumerate(table.schema):
+        if _is_dimension_column(field.name) and pyarrow.types.is_string(field.type):
+            table = table.set_column(i, field.name, pyarrow.compute.dictionary_encode(table.column(i)))
+    # self_destruct frees arrow buffers column by column while converting, which keeps peak memory close to the
+    # size of the resulting data frame
+    return compact_dtypes(table.to_pandas(types_mapper=_types_mapper, split_blocks=True, self_destruct=True))
+
+
+class ResultDownloader(ABC):
+    @abstractmethod
+    def download(self, result: RowIterator) -> pd.DataFrame:
+        pass
+
+
+class RestResultDownloader(ResultDownloader):
+    def download(self, result: RowIterator) -> pd.DataFrame:
+        return compact_dtypes(result.to_dataframe(create_bqstorage_client=False))
+
+
+class ArrowResultDownloader(ResultDownloader):
+    """
+    Downloads results as arrow record batches. Results which fit into the first page of query results are converted
+    from that page, larger results are read through the BigQuery Storage Read API, which streams the result table
+    in parallel.
+    """
+    def __init__(self, small_result_rows: int):
+        self.small_result_rows = small_result_rows
+        self.bqstorage_client = self._create_bqstorage_client()
+
+    @staticmethod
+    def _create_bqstorage_client():
+        try:
+            from google.cloud import bigquery_storage
+        except ImportError:
+            logger.warning('google-cloud-bigquery-storage is not installed, large results are downloaded over REST')
+            return None
+        return bigquery_storage.BigQueryReadClient()
+
+    def download(self, result: RowIterator) -> pd.DataFrame:
+        if result.total_rows is not None and result.total_rows <= self.small_result_rows:
+            table = result.to_arrow(create_bqstorage_client=False)
+        else:
+            table = result.to_arrow(bqstorage_client=self.bqstorage_client, create_bqstorage_client=False)
+        return arrow_to_dataframe(table)
@@ -0,0 +1,90 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Dict, List
+
+
+@dataclass
+class RunningJob:
+    job_id: str
+    app_id: str
+    page_id: str
+    request_id: str
+    metric_id: str
+    started_at: float = field(default_factory=time.monotonic)
+    inserted: bool = False
+    cancelled: bool = False
+
+    def age_seconds(self) -> float:
+        return time.monotonic() - self.started_at
+
+
+class JobRegistry:
+    """
+    Thread safe registry of BigQuery jobs started by executors. Job is registered before it is inserted, so
+    cancellation requested while job insert is in flight is not lost: whichever of insert and cancel finishes
+    last cancels the job in BigQuery.
+    """
+    def __init__(self):
+        self._jobs: Dict[str, RunningJob] = {}
+        self._lock = Lock()
+
+    def register(self, job_id: str, app_id: str, page_id: str, request_id: str, metric_id: str):
+        with self._lock:
+            self._jobs[job_id] = RunningJob(job_id, app_id, page_id, request_id, metric_id)
+
+    def unregister(self, job_id: str):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def mark_inserted(self, job_id: str) -> bool:
+        """
+        Returns False if job was cancelled before it was inserted, caller has to cancel it in BigQuery.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.cancelled:
+                return False
+            job.inserted = True
+            return True
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Returns True if job is already inserted, caller has to cancel it in BigQuery.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            job.cancelled = True
+            return job.inserted
+
+    def jobs(self) -> List[RunningJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def stats(self) -> Dict[str, object]:
+        jobs = self.jobs()
+        grouped = {'by_app': defaultdict(list), 'by_page': defaultdict(list), 'by_request': defaultdict(list)}
+        for job in jobs:
+            job_info = {'job_id': job.job_id, 'metric_id': job.metric_id, 'age_seconds': round(job.age_seconds(), 3),
+                        'inserted': job.inserted, 'cancelled': job.cancelled}
+            grouped['by_app'][job.app_id].append(job_info)
+            grouped['by_page'][job.page_id].append(job_info)
+            grouped['by_request'][job.request_id].append(job_info)
+        return {'running': len(jobs), **{key: dict(value) for key, value in grouped.items()}}
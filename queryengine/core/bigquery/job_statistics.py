@@ -0,0 +1,52 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from datetime import datetime
+from typing import Dict
+
+from fastapi.logger import logger
+from google.cloud.bigquery import QueryJob
+from opentelemetry.trace import Span
+from pandas import DataFrame
+
+
+def _isoformat(timestamp: datetime | None) -> str:
+    return timestamp.isoformat() if timestamp is not None else ''
+
+
+def job_statistics(query_job: QueryJob, total_rows: int, df: DataFrame | None,
+                   queue_wait_seconds: float) -> Dict[str, object]:
+    """
+    Collects what a finished job cost. Values are never None, so they can be used as span attributes.
+    """
+    return {
+        'job_id': query_job.job_id,
+        'bytes_processed': query_job.total_bytes_processed or 0,
+        'bytes_billed': query_job.total_bytes_billed or 0,
+        'slot_millis': query_job.slot_millis or 0,
+        'cache_hit': bool(query_job.cache_hit),
+        'rows': total_rows,
+        'df_memory_bytes': int(df.memory_usage(index=True, deep=True).sum()) if df is not None else 0,
+        'queue_wait_seconds': queue_wait_seconds,
+        'job_started': _isoformat(query_job.started),
+        'job_ended': _isoformat(query_job.ended),
+    }
+
+
+def record_job_statistics(span: Span, labels: Dict[str, str], statistics: Dict[str, object]):
+    fields = {**labels, **statistics}
+    span.set_attributes(fields)
+    logger.info(f'Query {labels["metric_id"]} of app {labels["app_id"]} processed '
+                f'{statistics["bytes_processed"]} bytes in {statistics["slot_millis"]} slot ms',
+                extra={'json_fields': fields})
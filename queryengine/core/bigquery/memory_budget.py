@@ -0,0 +1,104 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from threading import Lock
+from typing import Iterable
+
+import pyarrow
+from expiringdict import ExpiringDict
+from google.cloud.bigquery import SchemaField
+
+from queryengine.core.warehouse import TooLargeResultException, TooManyRequestsException
+
+# bytes a value of the column takes while the result is downloaded and converted to a data frame
+_FIELD_TYPE_BYTES = {
+    'STRING': 32,
+    'BYTES': 32,
+    'INTEGER': 8,
+    'INT64': 8,
+    'FLOAT': 8,
+    'FLOAT64': 8,
+    'NUMERIC': 16,
+    'BIGNUMERIC': 32,
+    'BOOLEAN': 1,
+    'BOOL': 1,
+    'TIMESTAMP': 8,
+    'DATETIME': 8,
+    'DATE': 8,
+    'TIME': 8,
+}
+_UNKNOWN_FIELD_TYPE_BYTES = 64
+
+
+def estimate_result_bytes(total_rows: int | None, schema: Iterable[SchemaField]) -> int:
+    """
+    Estimates memory taken by a query result from its row count and schema, before it's downloaded.
+    """
+    row_bytes = sum(_FIELD_TYPE_BYTES.get(field.field_type, _UNKNOWN_FIELD_TYPE_BYTES) for field in schema)
+    return (total_rows or 0) * row_bytes
+
+
+def estimate_arrow_bytes(table: pyarrow.Table) -> int:
+    return table.nbytes
+
+
+class MemoryReservation:
+    def __init__(self, budget: 'MemoryBudget', estimated_bytes: int):
+        self.budget = budget
+        self.estimated_bytes = estimated_bytes
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.budget._release(self.estimated_bytes)
+
+
+class MemoryBudget:
+    """
+    Limits memory taken by results of the warehouse. Results of a request may together take at most
+    max_request_bytes, so huge results are rejected before they are downloaded. Results being downloaded by the
+    process may together take at most max_process_bytes, so concurrent requests don't run the process out of memory.
+    """
+    def __init__(self, max_request_bytes: int, max_process_bytes: int, max_requests: int = 10000,
+                 max_request_age_seconds: int = 600):
+        self.max_request_bytes = max_request_bytes
+        self.max_process_bytes = max_process_bytes
+        self._lock = Lock()
+        self._request_bytes = ExpiringDict(max_len=max_requests, max_age_seconds=max_request_age_seconds)
+        self._process_bytes = 0
+
+    def reserve(self, request_id: str, estimated_bytes: int) -> MemoryReservation:
+        """
+        Reserves memory for a result of the request until the returned reservation is exited. Raises
+        TooLargeResultException if results of the request would take too much memory and TooManyRequestsException
+        if the process is short of memory at the moment.
+        """
+        with self._lock:
+            request_bytes = self._request_bytes.get(request_id, 0) + estimated_bytes
+            if request_bytes > self.max_request_bytes:
+                raise TooLargeResultException(request_bytes, self.max_request_bytes)
+            if self._process_bytes + estimated_bytes > self.max_process_bytes:
+                raise TooManyRequestsException()
+            self._request_bytes[request_id] = request_bytes
+            self._process_bytes += estimated_bytes
+        return MemoryReservation(self, estimated_bytes)
+
+    def _release(self, estimated_bytes: int):
+        with self._lock:
+            self._process_bytes -= estimated_bytes
+
+    def reserved_bytes(self) -> int:
+        with self._lock:
+            return self._process_bytes
@@ -12,13 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
+import contextvars
+import hashlib
 import os
+import re
 import time
+import uuid
 from abc import ABC, abstractmethod
-from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor, Future
-from threading import Thread, BoundedSemaphore
-from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from threading import Lock
+from typing import Callable, Dict
 
 from expiringdict import ExpiringDict
 from fastapi.logger import logger
@@ -26,46 +31,94 @@ from google.cloud.bigquery import Client, QueryJobConfig
 from opentelemetry import context as otel_context
 from opentelemetry import trace
 
+from queryengine.core import constants
+from queryengine.core.bigquery.admission import AdmissionScheduler, QueryPriority
+from queryengine.core.bigquery.download import ResultDownloader, RestResultDownloader
+from queryengine.core.bigquery.job_registry import JobRegistry
+from queryengine.core.bigquery.job_statistics import job_statistics, record_job_statistics
+from queryengine.core.bigquery.memory_budget import MemoryBudget, MemoryReservation, estimate_result_bytes
+from queryengine.core.bigquery.result_cache import ResultCache
 from queryengine.core.tabular_data_result import TabularDataResult, TabularDataResults
-from queryengine.core.warehouse import FutureResult, TooManyRequestsException, TooManyRowsException
+from queryengine.core.warehouse import FutureResult, QueryCancelledException
 
 
 class BigQueryQuery:
-    def __init__(self, page_id: str, request_id: str, metric_id: str, sql: str, app_id: str):
+    def __init__(self, page_id: str, request_id: str, metric_id: str, sql: str, app_id: str,
+                 data_watermark: str | None = None, priority: QueryPriority = QueryPriority.interactive):
         self.page_id = page_id
         self.request_id = request_id
         self.metric_id = metric_id
         self.sql = sql
         self.app_id = app_id
+        # identifies the state of the data the query reads, None if data can change at any time
+        self.data_watermark = data_watermark
+        self.priority = priority
 
     def get_environment(self):
         if os.environ.get('SERVICE_SUFFIX', '') == '':
             return 'production'
         return os.environ.get('SERVICE_SUFFIX', '')
 
+    def fingerprint(self) -> str:
+        normalized_sql = re.sub(r'\s+', ' ', self.sql).strip()
+        return hashlib.sha256(normalized_sql.encode('utf-8')).hexdigest()
+
+    def cache_key(self) -> str | None:
+        if self.data_watermark is None:
+            return None
+        return f'{self.fingerprint()}:{self.data_watermark}'
+
 
 class BigQueryFutureResult(FutureResult):
     def __init__(self, futures):
         self._futures = futures
 
-    def get(self) -> TabularDataResults:
+    async def get(self) -> TabularDataResults:
+        results = await asyncio.gather(*[future for _, _, future in self._futures])
         query_results = TabularDataResults()
-        for symbol_id, query, future in self._futures:
-            query_result = future.result()
+        for (symbol_id, query, future), query_result in zip(self._futures, results):
             query_results.add(symbol_id, query_result)
         return query_results
 
 
+_MAX_LABEL_LENGTH = 63
+
+
+def _metric_label(metric_id: str) -> str:
+    label = metric_id.replace('.', '_')
+    if len(label) <= _MAX_LABEL_LENGTH:
+        return label
+    # ids of fused scans join ids of all their metrics, so they are cut to fit the label and told apart by a hash
+    digest = hashlib.sha256(metric_id.encode('utf-8')).hexdigest()[:8]
+    return f'{label[:_MAX_LABEL_LENGTH - len(digest) - 1]}-{digest}'
+
+
+def _build_labels(query: BigQueryQuery) -> Dict[str, str]:
+    return {
+        'app_id': query.app_id,
+        'environment': query.get_environment(),
+        'service': 'query_engine',
+        'metric_id': _metric_label(query.metric_id),
+    }
+
+
+def build_job_config(query: BigQueryQuery) -> QueryJobConfig:
+    """
+    Job config with labels of the query, shared by query jobs and dry runs.
+    """
+    job_config = QueryJobConfig(use_query_cache=True)
+    job_config.labels = _build_labels(query)
+    return job_config
+
+
 class BigQueryExecutor(ABC):
     @abstractmethod
-    def execute(self, query: BigQueryQuery) -> Future[TabularDataResult]:
+    async def execute(self, query: BigQueryQuery) -> TabularDataResult:
         pass
 
-    def _on_query_start(self, query: BigQueryQuery, job_id: str):
-        pass
-
-    def _on_query_end(self, query: BigQueryQuery, job_id: str):
-        pass
+    def submit(self, query: BigQueryQuery) -> asyncio.Task:
+        # schedules the query right away, so all queries of a request run concurrently
+        return asyncio.ensure_future(self.execute(query))
 
     def cancel_by_page_id(self, page_id: str):
         pass
@@ -74,6 +127,38 @@ class BigQueryExecutor(ABC):
         pass
 
 
+def _cancel_job(client: Client, job_id: str):
+    try:
+        client.cancel_job(job_id=job_id)
+    except:
+        logger.exception(f'Failed to cancel job {job_id}')
+
+
+def _insert_job(client: Client, registry: JobRegistry, job_id: str, query: BigQueryQuery):
+    query_job = client.query(query.sql, job_config=build_job_config(query), job_id=job_id)
+    logger.info(f'Running query: \n{query_job.query}')
+    if not registry.mark_inserted(job_id):
+        # query was cancelled while the job was being inserted
+        _cancel_job(client, job_id)
+        raise QueryCancelledException()
+    return query_job
+
+
+@contextmanager
+def _registered_job(registry: JobRegistry, query: BigQueryQuery, cancel_job: Callable[[str], object]):
+    job_id = f'query_engine_{uuid.uuid4().hex}'
+    registry.register(job_id, query.app_id, query.page_id, query.request_id, query.metric_id)
+    try:
+        yield job_id
+    except asyncio.CancelledError:
+        # nobody is waiting for the result anymore, stop burning slots
+        if registry.cancel(job_id):
+            cancel_job(job_id)
+        raise
+    finally:
+        registry.unregister(job_id)
+
+
 class TracedThreadPoolExecutor(ThreadPoolExecutor):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -95,116 +180,251 @@ class TracedThreadPoolExecutor(ThreadPoolExecutor):
             return super().submit(lambda: fn(*args, **kwargs))
 
 
-class BoundedExecutor:
-    def __init__(self, max_workers):
-        self.executor = TracedThreadPoolExecutor(max_workers=max_workers)
-        self.semaphore = BoundedSemaphore(max_workers)
+def _default_memory_budget() -> MemoryBudget:
+    return MemoryBudget(
+        max_request_bytes=constants.RESULT_MAX_REQUEST_BYTES,
+        max_process_bytes=constants.RESULT_MAX_PROCESS_BYTES
+    )
 
-    def submit(self, fn, *args, **kwargs):
-        if not self.semaphore.acquire(blocking=False):
-            raise TooManyRequestsException()
 
-        try:
-            future = self.executor.submit(fn, *args, **kwargs)
-        except:
-            self.semaphore.release()
-            raise
-        else:
-            future.add_done_callback(lambda x: self.semaphore.release())
-            return future
+def _reserve_memory(memory_budget: MemoryBudget, query: BigQueryQuery, query_job, result, queue_wait_seconds: float,
+                    span) -> MemoryReservation:
+    estimated_bytes = estimate_result_bytes(result.total_rows, result.schema)
+    span.set_attribute("estimated_result_bytes", estimated_bytes)
+    try:
+        return memory_budget.reserve(query.request_id, estimated_bytes)
+    except Exception:
+        record_job_statistics(span, _build_labels(query),
+                              job_statistics(query_job, result.total_rows, None, queue_wait_seconds))
+        raise
 
-    def shutdown(self, wait=True):
-        self.executor.shutdown(wait)
+
+def _default_scheduler(max_running: int) -> AdmissionScheduler:
+    return AdmissionScheduler(
+        max_running=max_running,
+        max_queued_per_app=constants.ADMISSION_MAX_QUEUED_PER_APP
+    )
 
 
 class SimpleBigQueryExecutor(BigQueryExecutor):
-    def __init__(self, project: str, threads: int, max_rows: int):
+    def __init__(self, project: str, threads: int, memory_budget: MemoryBudget | None = None,
+                 downloader: ResultDownloader | None = None, scheduler: AdmissionScheduler | None = None,
+                 registry: JobRegistry | None = None):
         self.client = Client(project=project)
-        self.executor = BoundedExecutor(max_workers=threads)
-        self.max_rows = max_rows
+        self.executor = TracedThreadPoolExecutor(max_workers=threads)
+        # all query threads can be blocked waiting for jobs, so cancel calls get their own threads
+        self.cancel_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='bigquery-cancel')
+        self.memory_budget = memory_budget or _default_memory_budget()
+        self.downloader = downloader or RestResultDownloader()
+        # admitted jobs should get a thread right away, so scheduler shouldn't admit more jobs than there are threads
+        self.scheduler = scheduler or _default_scheduler(threads)
+        self.registry = registry or JobRegistry()
+
+    def _execute_sync(self, query: BigQueryQuery, job_id: str, queued_at: float) -> TabularDataResult:
+        tracer = trace.get_tracer("query_engine")
+        queue_wait_seconds = time.monotonic() - queued_at
+
+        with tracer.start_as_current_span(f"query {query.metric_id}") as span:
+            with tracer.start_as_current_span("execution"):
+                query_job = _insert_job(self.client, self.registry, job_id, query)
+                result = query_job.result()
+                reservation = _reserve_memory(self.memory_budget, query, query_job, result, queue_wait_seconds, span)
+            with reservation, tracer.start_as_current_span("data import"):
+                df = self.downloader.download(result)
+            record_job_statistics(span, _build_labels(query),
+                                  job_statistics(query_job, result.total_rows, df, queue_wait_seconds))
+        return TabularDataResult(df)
 
-    def _execute_sync(self, query: BigQueryQuery) -> TabularDataResult:
+    def _cancel_job(self, job_id: str):
+        self.cancel_executor.submit(_cancel_job, self.client, job_id)
+
+    async def execute(self, query: BigQueryQuery) -> TabularDataResult:
+        queued_at = time.monotonic()
+        async with self.scheduler.slot(query.app_id, query.priority) as wait_seconds:
+            trace.get_current_span().set_attribute(f"queue_wait {query.metric_id}", wait_seconds)
+            with _registered_job(self.registry, query, self._cancel_job) as job_id:
+                return await asyncio.wrap_future(self.executor.submit(self._execute_sync, query, job_id, queued_at))
+
+
+class AsyncBigQueryExecutor(BigQueryExecutor):
+    """
+    Runs BigQuery jobs on the event loop. Only the short REST calls (job insert, job status, result download) are
+    offloaded to a small thread pool, while waiting for the job is done by polling with asyncio.sleep, so thousands
+    of jobs can be in flight without holding a thread each.
+    """
+    def __init__(self, project: str, max_jobs: int, memory_budget: MemoryBudget | None = None, io_threads: int = 16,
+                 min_poll_interval: float = 0.1, max_poll_interval: float = 2.0,
+                 downloader: ResultDownloader | None = None, scheduler: AdmissionScheduler | None = None,
+                 registry: JobRegistry | None = None):
+        self.client = Client(project=project)
+        self.downloader = downloader or RestResultDownloader()
+        self.io_executor = ThreadPoolExecutor(max_workers=io_threads, thread_name_prefix='bigquery-io')
+        self.memory_budget = memory_budget or _default_memory_budget()
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.scheduler = scheduler or _default_scheduler(max_jobs)
+        self.registry = registry or JobRegistry()
+
+    async def _run_io(self, fn: Callable, *args, **kwargs):
+        # copy context so otel spans started on the event loop are parents of spans started in io threads
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self.io_executor, lambda: context.run(fn, *args, **kwargs))
+
+    async def _wait_for_job(self, query_job):
+        poll_interval = self.min_poll_interval
+        while True:
+            await self._run_io(query_job.reload)
+            if query_job.state == 'DONE':
+                return
+            await asyncio.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, self.max_poll_interval)
+
+    def _cancel_job(self, job_id: str):
+        self.io_executor.submit(_cancel_job, self.client, job_id)
+
+    async def execute(self, query: BigQueryQuery) -> TabularDataResult:
+        queued_at = time.monotonic()
+        async with self.scheduler.slot(query.app_id, query.priority) as wait_seconds:
+            trace.get_current_span().set_attribute(f"queue_wait {query.metric_id}", wait_seconds)
+            with _registered_job(self.registry, query, self._cancel_job) as job_id:
+                return await self._execute(query, job_id, queued_at)
+
+    async def _execute(self, query: BigQueryQuery, job_id: str, queued_at: float) -> TabularDataResult:
         tracer = trace.get_tracer("query_engine")
+        queue_wait_seconds = time.monotonic() - queued_at
 
-        with tracer.start_as_current_span(f"query {query.metric_id}"):
+        with tracer.start_as_current_span(f"query {query.metric_id}") as span:
             with tracer.start_as_current_span("execution"):
-                job_config = QueryJobConfig(use_query_cache=True)
-                job_config.labels = {
-                    'app_id': query.app_id,
-                    'environment': query.get_environment(),
-                    'service': 'query_engine',
-                    'metric_id': query.metric_id.replace('.', '_'),
-                }
-                query_job = self.client.query(query.sql, job_config=job_config)
-                logger.info(f'Running query: \n{query_job.query}')
-                self._on_query_start(query, query_job.job_id)
-                result = query_job.result(max_results=self.max_rows)
-                if result.total_rows > self.max_rows:
-                    raise TooManyRowsException()
-            with tracer.start_as_current_span("data import"):
-                df = result.to_dataframe()
-        self._on_query_end(query, query_job.job_id)
+                query_job = await self._run_io(_insert_job, self.client, self.registry, job_id, query)
+                await self._wait_for_job(query_job)
+                result = await self._run_io(query_job.result)
+                reservation = _reserve_memory(self.memory_budget, query, query_job, result, queue_wait_seconds, span)
+            with reservation, tracer.start_as_current_span("data import"):
+                df = await self._run_io(self.downloader.download, result)
+            record_job_statistics(span, _build_labels(query),
+                                  job_statistics(query_job, result.total_rows, df, queue_wait_seconds))
         return TabularDataResult(df)
 
-    def execute(self, query: BigQueryQuery) -> Future[TabularDataResult]:
-        return self.executor.submit(self._execute_sync, query)  # TODO TooManyRequestsException
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.callers = 0
+
+
+class SingleFlightBigQueryExecutor(BigQueryExecutor):
+    """
+    Coalesces identical queries which are running at the same time into a single BigQuery job.
+    The job is cancelled only when every caller waiting for it has been cancelled.
+    """
+    def __init__(self, backing_bigquery_executor: BigQueryExecutor):
+        self.backing_bigquery_executor = backing_bigquery_executor
+        self._flights: Dict[str, _Flight] = {}
+
+    def _start_flight(self, fingerprint: str, query: BigQueryQuery) -> _Flight:
+        flight = _Flight(asyncio.ensure_future(self.backing_bigquery_executor.execute(query)))
+
+        def on_done(_):
+            if self._flights.get(fingerprint) is flight:
+                del self._flights[fingerprint]
+
+        flight.task.add_done_callback(on_done)
+        self._flights[fingerprint] = flight
+        return flight
+
+    async def execute(self, query: BigQueryQuery) -> TabularDataResult:
+        fingerprint = query.fingerprint()
+        flight = self._flights.get(fingerprint)
+        is_leader = flight is None
+        if is_leader:
+            flight = self._start_flight(fingerprint, query)
+        trace.get_current_span().set_attribute(f"single_flight {query.metric_id}", "leader" if is_leader else "follower")
+
+        flight.callers += 1
+        try:
+            # shield, so cancelling one caller does not cancel the job other callers are waiting for
+            result = await asyncio.shield(flight.task)
+        finally:
+            flight.callers -= 1
+            if flight.callers == 0 and not flight.task.done():
+                # nobody waits for the job anymore, new callers must start a new one
+                if self._flights.get(fingerprint) is flight:
+                    del self._flights[fingerprint]
+                flight.task.cancel()
+        return result if is_leader else TabularDataResult(result.df.copy())
 
 
 class CancellableBigQueryExecutor(BigQueryExecutor):
-    def __init__(self, backing_bigquery_executor: SimpleBigQueryExecutor):
+    """
+    Cancels queries of a page or a request the moment they are cancelled, by cancelling the tasks waiting for them.
+    Backing executors cancel BigQuery jobs nobody waits for. Queries of recently cancelled pages and requests are
+    rejected right away.
+    """
+    def __init__(self, backing_bigquery_executor: BigQueryExecutor):
         self.backing_bigquery_executor = backing_bigquery_executor
         self.cancelled_request_ids = ExpiringDict(max_len=100, max_age_seconds=60)
         self.cancelled_page_ids = ExpiringDict(max_len=100, max_age_seconds=60)
-        self.jobs_by_request_id = defaultdict(set)
-        self.jobs_by_page_id = defaultdict(set)
-        self.cancel_thread = Thread(target=self._periodic_cancel)
-        self.cancel_thread.start()
-
-    def _on_query_start(self, query: BigQueryQuery, job_id: str):
-        super(CancellableBigQueryExecutor, self)._on_query_start(query, job_id)
-        if query.request_id in self.cancelled_request_ids or query.page_id in self.cancelled_page_ids:
-            raise Exception('Query cancelled')
-        self.jobs_by_request_id[query.request_id].add(job_id)
-        self.jobs_by_page_id[query.page_id].add(job_id)
-
-    def _on_query_end(self, query: BigQueryQuery, job_id: str):
-        super(CancellableBigQueryExecutor, self)._on_query_end(query, job_id)
-        request_id_jobs = self.jobs_by_request_id[query.request_id]
-        request_id_jobs.remove(job_id)
-        if not request_id_jobs:
-            del self.jobs_by_request_id[query.request_id]
-
-        page_id_jobs = self.jobs_by_page_id[query.page_id]
-        page_id_jobs.remove(job_id)
-        if not page_id_jobs:
-            del self.jobs_by_page_id[query.page_id]
+        self._callers: Dict[asyncio.Task, BigQueryQuery] = {}
+        self._lock = Lock()
+
+    def _is_cancelled(self, query: BigQueryQuery) -> bool:
+        return query.request_id in self.cancelled_request_ids or query.page_id in self.cancelled_page_ids
+
+    async def execute(self, query: BigQueryQuery) -> TabularDataResult:
+        caller = asyncio.current_task()
+        with self._lock:
+            if self._is_cancelled(query):
+                raise QueryCancelledException()
+            self._callers[caller] = query
+        try:
+            return await self.backing_bigquery_executor.execute(query)
+        except asyncio.CancelledError:
+            if self._is_cancelled(query):
+                raise QueryCancelledException()
+            raise
+        finally:
+            with self._lock:
+                del self._callers[caller]
+
+    def _cancel_callers(self, cancelled_ids: ExpiringDict, cancelled_id: str,
+                        should_cancel: Callable[[BigQueryQuery], bool]):
+        # cancel endpoints may run outside the event loop, so tasks are cancelled thread safe
+        with self._lock:
+            cancelled_ids[cancelled_id] = True
+            callers = [caller for caller, query in self._callers.items() if should_cancel(query)]
+        for caller in callers:
+            caller.get_loop().call_soon_threadsafe(caller.cancel)
 
     def cancel_by_page_id(self, page_id: str):
-        self.cancelled_page_ids[page_id] = True
+        self._cancel_callers(self.cancelled_page_ids, page_id, lambda query: query.page_id == page_id)
 
     def cancel_by_request_id(self, request_id: str):
-        self.cancelled_request_ids[request_id] = True
+        self._cancel_callers(self.cancelled_request_ids, request_id, lambda query: query.request_id == request_id)
 
-    def _periodic_cancel(self):
-        while True:
-            for page_id in self.cancelled_page_ids:
-                for job_id in self.jobs_by_page_id[page_id]:
-                    try:
-                        self.backing_bigquery_executor.client.cancel_job(job_id=job_id)
-                    except:
-                        pass  # TODO log here
-                    finally:
-                        del self.cancelled_page_ids[page_id]
-
-            for request_id in self.cancelled_request_ids:
-                for job_id in self.jobs_by_request_id[request_id]:
-                    try:
-                        self.backing_bigquery_executor.client.cancel_job(job_id=job_id)
-                    except:
-                        pass  # TODO log here
-                    finally:
-                        del self.cancelled_request_ids[request_id]
-            time.sleep(5)
-
-    def execute(self, query: BigQueryQuery) -> Future[TabularDataResult]:
-        return self.backing_bigquery_executor.execute(query)
+
+class CachingBigQueryExecutor(BigQueryExecutor):
+    def __init__(self, backing_bigquery_executor: BigQueryExecutor, result_cache: ResultCache):
+        self.backing_bigquery_executor = backing_bigquery_executor
+        self.result_cache = result_cache
+
+    async def execute(self, query: BigQueryQuery) -> TabularDataResult:
+        cache_key = query.cache_key()
+        if cache_key is None:
+            return await self.backing_bigquery_executor.execute(query)
+
+        # caches may decode results and reach disk or network, which would block the event loop
+        result = await asyncio.to_thread(self.result_cache.get, cache_key)
+        trace.get_current_span().set_attribute(f"result_cache {query.metric_id}", "miss" if result is None else "hit")
+        if result is not None:
+            return result
+
+        result = await self.backing_bigquery_executor.execute(query)
+        await asyncio.to_thread(self.result_cache.put, cache_key, result)
+        return result
+
+    def cancel_by_page_id(self, page_id: str):
+        self.backing_bigquery_executor.cancel_by_page_id(page_id)
+
+    def cancel_by_request_id(self, request_id: str):
+        self.backing_bigquery_executor.cancel_by_request_id(request_id)
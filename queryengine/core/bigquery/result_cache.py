@@ -0,0 +1,357 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from threading import Event, Lock, Thread
+from typing import Dict, List, Tuple
+
+import pyarrow
+from fastapi.logger import logger
+
+from queryengine.core.shared_store import SharedStore
+from queryengine.core.tabular_data_result import TabularDataResult
+
+
+def result_size_bytes(result: TabularDataResult) -> int:
+    return int(result.df.memory_usage(index=True, deep=True).sum())
+
+
+def result_to_bytes(result: TabularDataResult) -> bytes:
+    table = pyarrow.Table.from_pandas(result.df)
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema,
+                                options=pyarrow.ipc.IpcWriteOptions(compression='zstd')) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def result_from_bytes(data: bytes) -> TabularDataResult:
+    return TabularDataResult(pyarrow.ipc.open_stream(data).read_all().to_pandas(split_blocks=True))
+
+
+class ResultCache(ABC):
+    @abstractmethod
+    def get(self, key: str) -> TabularDataResult | None:
+        pass
+
+    @abstractmethod
+    def put(self, key: str, result: TabularDataResult):
+        pass
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        pass
+
+    def get_many(self, keys: List[str]) -> Dict[str, TabularDataResult]:
+        """
+        Returns results found in cache. Caches which are slow to reach look all keys up at once.
+        """
+        results = {}
+        for key in keys:
+            result = self.get(key)
+            if result is not None:
+                results[key] = result
+        return results
+
+
+class InMemoryResultCache(ResultCache):
+    """
+    LRU cache of warehouse results bounded by the memory footprint of cached data frames.
+    Results are copied on the way in and out, so callers can't modify cached data.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, Tuple[TabularDataResult, int]] = OrderedDict()
+        self._lock = Lock()
+        self._size_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: str) -> TabularDataResult | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            result, _ = entry
+        return TabularDataResult(result.df.copy())
+
+    def put(self, key: str, result: TabularDataResult):
+        result = TabularDataResult(result.df.copy())
+        size_bytes = result_size_bytes(result)
+        if size_bytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (result, size_bytes)
+            self._size_bytes += size_bytes
+            while self._size_bytes > self.max_bytes:
+                _, (_, evicted_size_bytes) = self._entries.popitem(last=False)
+                self._size_bytes -= evicted_size_bytes
+                self._evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'size_bytes': self._size_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+            }
+
+
+class DiskResultCache(ResultCache):
+    """
+    LRU cache of warehouse results stored as arrow IPC files in a local directory and bounded by their size on disk.
+    Files are named by hash of the cache key, which identifies query and state of its data, so the index is rebuilt
+    from the directory on startup and survives restarts. Files are read memory mapped, so the OS pages data in
+    directly instead of reading it into an intermediate buffer.
+    """
+    _suffix = '.arrow'
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        # file name -> size, least recently used first
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._size_bytes = 0
+        self._load_index()
+
+    def _load_index(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(self._suffix):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, file_name, size_bytes in sorted(files):
+            self._entries[file_name] = size_bytes
+            self._size_bytes += size_bytes
+        self._evict()
+
+    def _file_name(self, key: str) -> str:
+        return hashlib.sha256(key.encode('utf-8')).hexdigest() + self._suffix
+
+    def _path(self, file_name: str) -> str:
+        return os.path.join(self.directory, file_name)
+
+    def _evict(self):
+        while self._size_bytes > self.max_bytes:
+            file_name, size_bytes = self._entries.popitem(last=False)
+            self._size_bytes -= size_bytes
+            self._evictions += 1
+            try:
+                os.remove(self._path(file_name))
+            except FileNotFoundError:
+                pass
+
+    def _forget(self, file_name: str):
+        with self._lock:
+            size_bytes = self._entries.pop(file_name, None)
+            if size_bytes is not None:
+                self._size_bytes -= size_bytes
+
+    def get(self, key: str) -> TabularDataResult | None:
+        file_name = self._file_name(key)
+        with self._lock:
+            if file_name not in self._entries:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(file_name)
+            self._hits += 1
+        path = self._path(file_name)
+        try:
+            with pyarrow.memory_map(path) as source:
+                table = pyarrow.ipc.open_file(source).read_all()
+            # modification time keeps recency order across restarts
+            os.utime(path)
+        except (FileNotFoundError, pyarrow.ArrowInvalid):
+            logger.warning(f'Result cache file {path} is missing or corrupted')
+            self._forget(file_name)
+            return None
+        return TabularDataResult(table.to_pandas(split_blocks=True))
+
+    def put(self, key: str, result: TabularDataResult):
+        table = pyarrow.Table.from_pandas(result.df)
+        file_name = self._file_name(key)
+        # written to a temporary file first, so readers never see partially written files
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as sink, pyarrow.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            size_bytes = os.path.getsize(tmp_path)
+            if size_bytes > self.max_bytes:
+                os.remove(tmp_path)
+                return
+            os.replace(tmp_path, self._path(file_name))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            if file_name in self._entries:
+                self._size_bytes -= self._entries.pop(file_name)
+            self._entries[file_name] = size_bytes
+            self._size_bytes += size_bytes
+            self._evict()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'size_bytes': self._size_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+            }
+
+
+class TieredResultCache(ResultCache):
+    """
+    Looks results up in faster tiers first. Results found in a slower tier are put into all faster tiers.
+    """
+    def __init__(self, tiers: Dict[str, ResultCache]):
+        self.tiers = tiers
+
+    def get(self, key: str) -> TabularDataResult | None:
+        missed: List[ResultCache] = []
+        for tier in self.tiers.values():
+            result = tier.get(key)
+            if result is not None:
+                for faster_tier in missed:
+                    faster_tier.put(key, result)
+                return result
+            missed.append(tier)
+        return None
+
+    def get_many(self, keys: List[str]) -> Dict[str, TabularDataResult]:
+        results = {}
+        missed: List[ResultCache] = []
+        for tier in self.tiers.values():
+            found = tier.get_many([key for key in keys if key not in results])
+            for key, result in found.items():
+                for faster_tier in missed:
+                    faster_tier.put(key, result)
+            results.update(found)
+            if len(results) == len(keys):
+                break
+            missed.append(tier)
+        return results
+
+    def put(self, key: str, result: TabularDataResult):
+        for tier in self.tiers.values():
+            tier.put(key, result)
+
+    def stats(self) -> Dict[str, int]:
+        return {f'{name}_{stat}': value
+                for name, tier in self.tiers.items() for stat, value in tier.stats().items()}
+
+
+class SharedResultCache(ResultCache):
+    """
+    Cache of warehouse results shared by all instances of the service. Results are stored as compressed arrow
+    payloads. Writes are buffered and sent to the store in batches by a background thread, so they don't add
+    network round trips to requests. Lookups of a request are sent to the store at once. Store errors are logged
+    and treated as misses, as the cache only saves warehouse work.
+    """
+    def __init__(self, store: SharedStore, ttl_seconds: int, batch_size: int = 100,
+                 flush_interval_seconds: float = 1.0):
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self._lock = Lock()
+        self._pending: Dict[str, bytes] = {}
+        self._flush_requested = Event()
+        self._hits = 0
+        self._misses = 0
+        self._errors = 0
+        self._flushes = 0
+        Thread(target=self._flush_periodically, name='shared-cache-flush', daemon=True).start()
+
+    def _flush_periodically(self):
+        while True:
+            self._flush_requested.wait(self.flush_interval_seconds)
+            self._flush_requested.clear()
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending = dict(self._pending)
+        if not pending:
+            return
+        try:
+            self.store.set_many(pending, self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f'Writing {len(pending)} results to shared cache failed: {e}')
+            with self._lock:
+                self._errors += 1
+        with self._lock:
+            self._flushes += 1
+            for key, data in pending.items():
+                # results put again while flushing are sent with the next batch
+                if self._pending.get(key) is data:
+                    del self._pending[key]
+
+    def get(self, key: str) -> TabularDataResult | None:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: List[str]) -> Dict[str, TabularDataResult]:
+        keys = list(dict.fromkeys(keys))
+        with self._lock:
+            found = {key: self._pending[key] for key in keys if key in self._pending}
+        missing = [key for key in keys if key not in found]
+        if missing:
+            try:
+                found.update(self.store.get_many(missing))
+            except Exception as e:
+                logger.warning(f'Reading {len(missing)} results from shared cache failed: {e}')
+                with self._lock:
+                    self._errors += 1
+        with self._lock:
+            self._hits += len(found)
+            self._misses += len(keys) - len(found)
+        return {key: result_from_bytes(data) for key, data in found.items()}
+
+    def put(self, key: str, result: TabularDataResult):
+        data = result_to_bytes(result)
+        with self._lock:
+            self._pending[key] = data
+            if len(self._pending) >= self.batch_size:
+                self._flush_requested.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'hits': self._hits,
+                'misses': self._misses,
+                'errors': self._errors,
+                'flushes': self._flushes,
+            }
@@ -52,7 +52,7 @@ class BooleanExpression(Expression):
 
     def or_(self, boolean_expression: 'BooleanExpression') -> 'BooleanExpression':
         tail = self._find_tail()
-        tail.next_node = BooleanExpressionNode(BooleanOperator.AND, boolean_expression)
+        tail.next_node = BooleanExpressionNode(BooleanOperator.OR, boolean_expression)
         return self
 
     @staticmethod
@@ -20,5 +20,17 @@ EVENT_TIMESTAMP_COLUMN_NAME = 'event_tstamp'
 EVENT_SANDBOX_COLUMN_NAME = 'sandbox_mode'
 X_AXIS_COLUMN_ALIAS = 'x_axis'
 DATA_COLUMN_ALIAS = 'value'
+PERIOD_COLUMN_ALIAS = 'period'
+GROUP_BY_COLUMN_ALIAS_PREFIX = 'group_by_'
 BIGQUERY_MAX_DISTINCT_GROUP_BY_VALUES = 500
 BIGQUERY_MAX_ROWS = 200000
+BIGQUERY_SMALL_RESULT_ROWS = 10000
+RESULT_MAX_REQUEST_BYTES = 256 * 1024 * 1024
+RESULT_MAX_PROCESS_BYTES = 2 * 1024 * 1024 * 1024
+ADMISSION_MAX_QUEUED_PER_APP = 500
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+RESULT_CACHE_DISK_MAX_BYTES = 10 * 1024 * 1024 * 1024
+RESULT_CACHE_SHARED_TTL_SECONDS = 24 * 60 * 60
+CHART_RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+CHART_RESPONSE_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+SEMANTIC_LAYER_POOL_MIN_ROWS = 50000
@@ -14,7 +14,7 @@
 
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 from typing import List, Dict
 
@@ -100,6 +100,18 @@ class DataSource(ABC):
             return None
         return date_interval.clamp(self.data_availability.date_from, self.data_availability.date_to)
 
+    def data_watermark(self) -> str | None:
+        # changes whenever new data lands, None means data can change at any time
+        if not self.data_availability:
+            return None
+        return str(self.data_availability.date_to.date())
+
+    def closed_until(self) -> date | None:
+        # last day whose data doesn't change anymore, None if data can change at any time
+        if self.data_watermark() is None:
+            return None
+        return self.data_availability.date_to.date()
+
     @abstractmethod
     def _data_availability(self, app: App) -> DatetimeInterval | None:
         pass
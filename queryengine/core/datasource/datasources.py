@@ -12,7 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from typing import List
 
 import pytz
@@ -46,6 +46,7 @@ class EventDataSource(DataSource):
         super(EventDataSource, self).__init__(app, id, label, description, schema, table_name,
                                               columns, Cardinality.many, TimeGrain.min15)
         self.realtime_schema = 'load'
+        self.close_partition_after_hours = app.common_configs.close_event_partition_after_hours
         self.raw_data_availability = self._raw_data_availability(app)
 
     @staticmethod
@@ -98,6 +99,14 @@ class EventDataSource(DataSource):
         date_to = datetime.utcnow().replace(tzinfo=pytz.UTC)
         return DatetimeInterval(date_from, date_to)
 
+    def data_watermark(self) -> str | None:
+        # realtime events are appended to the load schema all the time
+        return None
+
+    def closed_until(self) -> date | None:
+        # late events are still loaded into a partition for some hours after its day is over
+        return (datetime.utcnow() - timedelta(hours=self.close_partition_after_hours)).date() - timedelta(days=1)
+
     def _raw_data_availability(self, app: App) -> DatetimeInterval | None:
         if not app.app_config.has_data_up_to('user_history'):
             return None
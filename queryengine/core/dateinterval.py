@@ -16,11 +16,17 @@ from dataclasses import dataclass
 from datetime import datetime, date, timedelta
 from typing import List, Optional
 
+import numpy as np
 import pytz
+from pandas import Series
 
 from queryengine.core.timegrain import TimeGrain
 
 
+def _to_datetime64(dt: datetime) -> np.datetime64:
+    return np.datetime64(dt.replace(tzinfo=None), 'ns')
+
+
 @dataclass
 class DatetimeInterval:
     date_from: datetime
@@ -34,12 +40,13 @@ class DatetimeInterval:
         return (self.date_to - self.date_from).days + 1
 
     def generate_all_dates(self, time_grain: TimeGrain) -> List[datetime]:
-        dates = []
-        current_datetime = time_grain.truncate_datetime(self.date_from)
-        while current_datetime <= self.date_to:
-            dates.append(current_datetime)
-            current_datetime = time_grain.next_datetime(current_datetime)
-        return dates
+        return [dt.replace(tzinfo=pytz.UTC) for dt in self.datetime_range(time_grain).astype('datetime64[us]').tolist()]
+
+    def datetime_range(self, time_grain: TimeGrain) -> np.ndarray:
+        """
+        Same as generate_all_dates, as datetime64 array of UTC datetimes.
+        """
+        return time_grain.datetime_range(_to_datetime64(self.date_from), _to_datetime64(self.date_to))
 
     def clamp(self, date_from: datetime, date_to: datetime) -> Optional['DatetimeInterval']:
         if self.date_from > date_to or self.date_to < date_from:
@@ -59,6 +66,14 @@ class DatetimeInterval:
     def contains_date(self, d: date) -> bool:
         return self.date_from.date() <= d <= self.date_to.date()
 
+    def contains_dates(self, values: Series) -> Series:
+        """
+        Vectorized contains_date of dates of UTC datetimes.
+        """
+        day_from = TimeGrain.day.truncate_datetime(self.date_from)
+        day_after_to = TimeGrain.day.truncate_datetime(self.date_to) + timedelta(days=1)
+        return (values >= day_from) & (values < day_after_to)
+
 
 @dataclass(frozen=True)
 class DateInterval:
@@ -0,0 +1,116 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+from typing import Callable, Dict, List, Tuple
+
+_FUNCTION_CALL = re.compile(
+    r'\b(DATE_TRUNC|TIMESTAMP_TRUNC|TIMESTAMP_ADD|TIMESTAMP_SUB|DATE_ADD|DATE_SUB|TIMESTAMP)\s*\(', re.IGNORECASE)
+_INTERVAL = re.compile(r'^\s*INTERVAL\s+(.+)\s+(\w+)\s*$', re.IGNORECASE | re.DOTALL)
+_TYPES = {
+    'INT64': 'BIGINT',
+    'FLOAT64': 'DOUBLE',
+    'NUMERIC': 'DECIMAL(38, 9)',
+    'STRING': 'VARCHAR',
+    'BOOL': 'BOOLEAN',
+    # BigQuery timestamps are always UTC, DuckDB connections run in UTC
+    'TIMESTAMP': 'TIMESTAMPTZ',
+}
+_CAST_TYPE = re.compile(r'\bAS\s+(' + '|'.join(_TYPES) + r')\b(?=\s*\))', re.IGNORECASE)
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'")
+_MASKED_LITERAL = re.compile(r'\x00(\d+)\x00')
+
+
+def _call_arguments(sql: str, start: int) -> Tuple[List[str], int]:
+    """
+    Splits arguments of a function call whose opening parenthesis is at sql[start - 1].
+    Returns arguments and index just past the closing parenthesis.
+    """
+    arguments, depth, quote, argument_start = [], 0, None, start
+    for i in range(start, len(sql)):
+        c = sql[i]
+        if quote:
+            if c == quote:
+                quote = None
+        elif c == '"':
+            quote = c
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            if depth == 0:
+                arguments.append(sql[argument_start:i])
+                return arguments, i + 1
+            depth -= 1
+        elif c == ',' and depth == 0:
+            arguments.append(sql[argument_start:i])
+            argument_start = i + 1
+    raise ValueError(f'Unbalanced parentheses in: {sql}')
+
+
+def _trunc(cast_to: str | None) -> Callable[[List[str]], str]:
+    def translate(arguments: List[str]) -> str:
+        expression, part = arguments
+        truncated = f"date_trunc('{part.strip().lower()}', {expression})"
+        return f'CAST({truncated} AS {cast_to})' if cast_to else truncated
+    return translate
+
+
+def _add_interval(sign: str) -> Callable[[List[str]], str]:
+    def translate(arguments: List[str]) -> str:
+        expression, interval = arguments
+        amount, part = _INTERVAL.match(interval).groups()
+        return f'({expression} {sign} ({amount}) * INTERVAL 1 {part.upper()})'
+    return translate
+
+
+_FUNCTIONS: Dict[str, Callable[[List[str]], str]] = {
+    'DATE_TRUNC': _trunc(None),
+    'TIMESTAMP_TRUNC': _trunc('TIMESTAMPTZ'),
+    'TIMESTAMP_ADD': _add_interval('+'),
+    'TIMESTAMP_SUB': _add_interval('-'),
+    'DATE_ADD': _add_interval('+'),
+    'DATE_SUB': _add_interval('-'),
+    'TIMESTAMP': lambda arguments: f'CAST({arguments[0]} AS TIMESTAMPTZ)',
+}
+
+
+def _translate_functions(sql: str) -> str:
+    translated, position = [], 0
+    for match in _FUNCTION_CALL.finditer(sql):
+        if match.start() < position:
+            # nested call, already translated together with the outer one
+            continue
+        arguments, end = _call_arguments(sql, match.end())
+        translated.append(sql[position:match.start()])
+        translated.append(_FUNCTIONS[match.group(1).upper()]([_translate_functions(a) for a in arguments]))
+        position = end
+    translated.append(sql[position:])
+    return ''.join(translated)
+
+
+def to_duckdb(sql: str) -> str:
+    """
+    Translates SQL generated by query builders from BigQuery to DuckDB dialect. Only constructs query builders
+    generate are supported. Backticked `dataset.table` names become a single quoted identifier, so DuckDB tables
+    are named after the BigQuery dataset and table they stand in for.
+    """
+    # string literals are masked, so their content is never translated
+    literals = _STRING_LITERAL.findall(sql)
+    masked_literals = iter(range(len(literals)))
+    sql = _STRING_LITERAL.sub(lambda _: f'\x00{next(masked_literals)}\x00', sql)
+
+    sql = sql.replace('`', '"')
+    sql = _translate_functions(sql)
+    sql = _CAST_TYPE.sub(lambda match: f'AS {_TYPES[match.group(1).upper()]}', sql)
+    return _MASKED_LITERAL.sub(lambda match: literals[int(match.group(1))], sql)
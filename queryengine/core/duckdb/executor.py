@@ -0,0 +1,63 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+from fastapi.logger import logger
+from opentelemetry import trace
+
+from queryengine.core.bigquery.download import arrow_to_dataframe
+from queryengine.core.bigquery.memory_budget import MemoryBudget, estimate_arrow_bytes
+from queryengine.core.bigquery.queryexecutor import BigQueryExecutor, BigQueryQuery, TracedThreadPoolExecutor
+from queryengine.core.duckdb.dialect import to_duckdb
+from queryengine.core.tabular_data_result import TabularDataResult
+
+
+def connect(database: str = ':memory:'):
+    # duckdb is needed only to run without BigQuery, so it's not a hard dependency
+    import duckdb
+    connection = duckdb.connect(database)
+    connection.execute("SET GLOBAL TimeZone = 'UTC'")
+    return connection
+
+
+class DuckDbExecutor(BigQueryExecutor):
+    """
+    Runs queries generated for BigQuery against a local DuckDB database, whose tables are named after BigQuery
+    `dataset.table` they stand in for. Used for load testing and profiling without BigQuery and for serving small
+    apps cheaply.
+    """
+    def __init__(self, connection, threads: int, memory_budget: MemoryBudget):
+        self.connection = connection
+        self.executor = TracedThreadPoolExecutor(max_workers=threads, thread_name_prefix='duckdb')
+        self.memory_budget = memory_budget
+
+    def _execute_sync(self, query: BigQueryQuery) -> TabularDataResult:
+        tracer = trace.get_tracer("query_engine")
+
+        with tracer.start_as_current_span(f"query {query.metric_id}"):
+            with tracer.start_as_current_span("execution"):
+                sql = to_duckdb(query.sql)
+                logger.info(f'Running query: \n{sql}')
+                # connections can't be shared between threads, cursors are connections to the same database
+                with self.connection.cursor() as cursor:
+                    table = cursor.execute(sql).to_arrow_table()
+                # results are fetched into the process by duckdb, so only their conversion is budgeted
+                reservation = self.memory_budget.reserve(query.request_id, estimate_arrow_bytes(table))
+            with reservation, tracer.start_as_current_span("data import"):
+                df = arrow_to_dataframe(table)
+        return TabularDataResult(df)
+
+    async def execute(self, query: BigQueryQuery) -> TabularDataResult:
+        return await asyncio.wrap_future(self.executor.submit(self._execute_sync, query))
@@ -0,0 +1,156 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List
+
+from queryengine.core import constants
+from queryengine.core.app.app import App
+from queryengine.core.datasource.datasource import Cardinality, DataType
+from queryengine.core.datasource.datasources import UserHistoryDataSource
+from queryengine.core.datasource.repository import DataSourceRepository
+from queryengine.core.kpi.repository import KpiRepository
+
+_FORMULA_COLUMN = re.compile(r'\{(\w+)\}')
+
+
+@dataclass
+class SyntheticTable:
+    # BigQuery `dataset.table` name the table stands in for
+    name: str
+    columns: Dict[str, DataType]
+    rows_per_user: Cardinality
+
+
+def _key_columns(rows_per_user: Cardinality) -> Dict[str, DataType]:
+    columns = {
+        constants.DATE_PARTITION_COLUMN_NAME: DataType.date,
+        constants.UNIQUE_ID_COLUMN_NAME: DataType.string,
+    }
+    if rows_per_user == Cardinality.many:
+        columns[constants.EVENT_TIMESTAMP_COLUMN_NAME] = DataType.datetime
+        columns[constants.EVENT_SANDBOX_COLUMN_NAME] = DataType.boolean
+    else:
+        columns[constants.REGISTRATION_DATE_COLUMN_NAME] = DataType.date
+        columns[constants.COHORT_DAY_COLUMN_NAME] = DataType.integer
+    return columns
+
+
+def _external_tables(app: App, datasource: UserHistoryDataSource) -> List[SyntheticTable]:
+    columns_by_table: Dict[str, Dict[str, DataType]] = {}
+    for external_column in datasource.user_history_definition.external_table_columns.values():
+        columns = columns_by_table.setdefault(f'{external_column.dataset_name}.{external_column.table_name}',
+                                              _key_columns(Cardinality.one))
+        for column in _FORMULA_COLUMN.findall(external_column.table_filter_formula or ''):
+            columns.setdefault(column, DataType.string)
+        for column in _FORMULA_COLUMN.findall(external_column.table_aggregation_formula):
+            columns.setdefault(column, DataType.number)
+    return [SyntheticTable(name, columns, Cardinality.one) for name, columns in columns_by_table.items()]
+
+
+def synthetic_tables(app: App, datasource_repository: DataSourceRepository,
+                     kpi_repository: KpiRepository | None = None) -> List[SyntheticTable]:
+    """
+    Tables query builders read for the app: user history tables (including the ones KPIs read from), tables of
+    external user history columns and raw and realtime event tables. Columns read by external table formulas are
+    guessed from the formulas.
+    """
+    tables = []
+    for datasource in datasource_repository.all_daily_data_sources(app).values():
+        columns = _key_columns(datasource.rows_per_user) | \
+                  {column.id: column.data_type for column in datasource.columns_by_id.values()}
+        table_names = [datasource.table_name, datasource.user_enrich_table_name()]
+        if kpi_repository is not None:
+            table_names.extend(metric.data_source_table
+                               for kpi in kpi_repository.load_by_datasource_id(app, datasource.id).values()
+                               for metric in kpi.metrics.values())
+        for table_name in dict.fromkeys(table_names):
+            tables.append(SyntheticTable(f'{app.app_id()}_{datasource.schema}.{table_name}', columns,
+                                         datasource.rows_per_user))
+        if isinstance(datasource, UserHistoryDataSource):
+            tables.extend(_external_tables(app, datasource))
+
+    for datasource in datasource_repository.all_event_data_sources(app).values():
+        columns = _key_columns(Cardinality.many) | \
+                  {column.id: column.data_type for column in datasource.columns_by_id.values()}
+        for schema in [datasource.schema, datasource.realtime_schema]:
+            tables.append(SyntheticTable(f'{app.app_id()}_{schema}.{datasource.table_name}', columns,
+                                         Cardinality.many))
+    return tables
+
+
+def _value_expression(column_id: str, data_type: DataType) -> str:
+    if column_id == constants.DATE_PARTITION_COLUMN_NAME:
+        return 'days.date_'
+    if column_id == constants.UNIQUE_ID_COLUMN_NAME:
+        return "'user_' || users.id"
+    if column_id == constants.EVENT_TIMESTAMP_COLUMN_NAME:
+        return "CAST(days.date_ AS TIMESTAMPTZ) + (hash(users.id, days.date_, events.id) % 86400) * INTERVAL 1 SECOND"
+    if column_id == constants.EVENT_SANDBOX_COLUMN_NAME:
+        return 'FALSE'
+    if column_id == constants.REGISTRATION_DATE_COLUMN_NAME:
+        return 'users.registration_date'
+    if column_id == constants.COHORT_DAY_COLUMN_NAME:
+        return 'days.date_ - users.registration_date'
+
+    value_hash = f"hash(users.id, days.date_, events.id, '{column_id}')"
+    scalar_type = DataType(data_type.value.split(',')[-1].rstrip('>')) if data_type.value.startswith('map') \
+        else data_type
+    return {
+        DataType.number: f'({value_hash} % 10000) / 100.0',
+        DataType.integer: f'CAST({value_hash} % 100 AS BIGINT)',
+        DataType.string: f"'value_' || ({value_hash} % 10)",
+        DataType.date: 'days.date_',
+        DataType.datetime: 'CAST(days.date_ AS TIMESTAMPTZ)',
+        DataType.boolean: f'{value_hash} % 2 = 0',
+    }[scalar_type]
+
+
+def _select_expressions(columns: Dict[str, DataType]) -> List[str]:
+    # dotted columns (i.e. params.level) are fields of a struct column, as in BigQuery
+    structs: Dict[str, List[str]] = {}
+    expressions = []
+    for column_id, data_type in columns.items():
+        if '.' in column_id:
+            struct, field = column_id.split('.', 1)
+            if struct not in structs:
+                structs[struct] = []
+                expressions.append(struct)
+            structs[struct].append(f'"{field}" := {_value_expression(column_id, data_type)}')
+        else:
+            expressions.append(f'{_value_expression(column_id, data_type)} AS "{column_id}"')
+    return [f'struct_pack({", ".join(structs[e])}) AS "{e}"' if e in structs else e for e in expressions]
+
+
+def generate(connection, tables: List[SyntheticTable], date_from: date, date_to: date,
+             users: int = 1000, events_per_user: int = 5):
+    """
+    Fills DuckDB connection with deterministic synthetic data. Users register uniformly during the date range and
+    have a row per day (or events_per_user events per day) from the registration date on.
+    """
+    for table in tables:
+        events = events_per_user if table.rows_per_user == Cardinality.many else 1
+        connection.execute(f'''CREATE OR REPLACE TABLE "{table.name}" AS
+SELECT {", ".join(_select_expressions(table.columns))}
+FROM (
+    SELECT range AS id,
+           DATE '{date_from}' + CAST(hash(range) % (DATE '{date_to}' - DATE '{date_from}' + 1) AS INTEGER)
+               AS registration_date
+    FROM range({users})
+) AS users
+JOIN (SELECT CAST(range AS DATE) AS date_ FROM range(DATE '{date_from}', DATE '{date_to}' + 1, INTERVAL 1 DAY)) AS days
+    ON days.date_ >= users.registration_date
+CROSS JOIN (SELECT range AS id FROM range({events})) AS events''')
@@ -0,0 +1,142 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, List, Tuple
+from urllib.parse import urlparse
+
+
+class SharedStore(ABC):
+    """
+    Key-value store shared by all workers and instances of the service. Values are opaque bytes which expire after
+    given number of seconds.
+    """
+    @abstractmethod
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        pass
+
+    @abstractmethod
+    def set_many(self, values: Dict[str, bytes], ttl_seconds: int):
+        pass
+
+
+class InMemorySharedStore(SharedStore):
+    """
+    LRU store of a single process bounded by size of values, used when no shared store is configured.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, Tuple[bytes, float]] = OrderedDict()
+        self._size_bytes = 0
+        self._lock = Lock()
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        now = time.time()
+        values = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                value, expires_at = entry
+                if expires_at <= now:
+                    self._size_bytes -= len(self._entries.pop(key)[0])
+                    continue
+                self._entries.move_to_end(key)
+                values[key] = value
+        return values
+
+    def set_many(self, values: Dict[str, bytes], ttl_seconds: int):
+        expires_at = time.time() + ttl_seconds
+        with self._lock:
+            for key, value in values.items():
+                if len(value) > self.max_bytes:
+                    continue
+                if key in self._entries:
+                    self._size_bytes -= len(self._entries.pop(key)[0])
+                self._entries[key] = (value, expires_at)
+                self._size_bytes += len(value)
+            while self._size_bytes > self.max_bytes:
+                _, (value, _) = self._entries.popitem(last=False)
+                self._size_bytes -= len(value)
+
+
+class SqliteSharedStore(SharedStore):
+    """
+    Stand-in for a network store, shared by workers of a single machine through a local database file.
+    """
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = Lock()
+        with self._lock:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)')
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        if not keys:
+            return {}
+        placeholders = ','.join('?' * len(keys))
+        with self._lock:
+            rows = self._connection.execute(
+                f'SELECT key, value FROM entries WHERE key IN ({placeholders}) AND expires_at > ?',
+                list(keys) + [time.time()]).fetchall()
+        return {key: value for key, value in rows}
+
+    def set_many(self, values: Dict[str, bytes], ttl_seconds: int):
+        now = time.time()
+        with self._lock:
+            with self._connection:
+                self._connection.execute('BEGIN')
+                self._connection.executemany(
+                    'INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)',
+                    [(key, value, now + ttl_seconds) for key, value in values.items()])
+                self._connection.execute('DELETE FROM entries WHERE expires_at <= ?', [now])
+
+
+class RedisSharedStore(SharedStore):
+    def __init__(self, url: str):
+        # redis is needed only when instances share a cache, so it's not a hard dependency
+        import redis
+        self._client = redis.Redis.from_url(url)
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        if not keys:
+            return {}
+        return {key: value for key, value in zip(keys, self._client.mget(keys)) if value is not None}
+
+    def set_many(self, values: Dict[str, bytes], ttl_seconds: int):
+        pipeline = self._client.pipeline(transaction=False)
+        for key, value in values.items():
+            pipeline.set(key, value, ex=ttl_seconds)
+        pipeline.execute()
+
+
+def from_url(url: str) -> SharedStore:
+    """
+    Creates store from `redis://host:port/db` or `sqlite:///path/to/file.db` url.
+    """
+    scheme = urlparse(url).scheme
+    if scheme in ('redis', 'rediss', 'unix'):
+        return RedisSharedStore(url)
+    if scheme == 'sqlite':
+        return SqliteSharedStore(url[len('sqlite://'):])
+    raise ValueError(f'Unsupported shared store url {url}')
@@ -12,10 +12,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import List, Set, Dict, Tuple, Callable
+from typing import List, Set, Dict, Tuple, Callable, Iterable, Iterator
 from fastapi.logger import logger
 
-from pandas import DataFrame, MultiIndex, unique
+import numpy as np
+import pytz
+from pandas import DataFrame, DatetimeIndex, Index, MultiIndex, RangeIndex, Series, factorize, isna, unique
+from pandas.api.extensions import take
+from pandas.api.types import is_categorical_dtype
 from pandas.core.groupby import GroupBy
 
 from queryengine.core import constants
@@ -23,16 +27,70 @@ from queryengine.core.dateinterval import DatetimeInterval
 from queryengine.core.timegrain import TimeGrain
 
 
-def _safe_division(num, denom, default_value=0):
-    if denom == 0:
-        return default_value
-    return num / denom
+def _float_values(values):
+    if isinstance(values, (int, float)):
+        return float(values)
+    if isinstance(values, np.ndarray):
+        return values.astype('float64', copy=False)
+    return values.to_numpy(dtype='float64', na_value=np.nan)
+
+
+def safe_division(num, denom, default_value=0):
+    num = _float_values(num)
+    denom = _float_values(denom)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denom == 0, default_value, num / denom)
+
+
+class _NullKey:
+    # stands for missing key values, as MultiIndex.get_indexer can't tell them from values missing in its levels
+    def __repr__(self):
+        return 'NULL'
+
+
+_NULL_KEY = _NullKey()
+
+
+def _key_values(values: Series) -> Series:
+    if not values.hasnans:
+        return values
+    return values.astype(object).where(values.notna(), _NULL_KEY)
+
+
+def _value_rows(df: DataFrame) -> Iterator[Tuple]:
+    # missing categories are read as None, like missing values of object columns
+    return DataFrame({column: df[column].astype(object).where(df[column].notna(), None)
+                      if is_categorical_dtype(df[column]) else df[column]
+                      for column in df.columns}).itertuples(index=False, name=None)
+
+
+def _key_index(df: DataFrame) -> Index:
+    if len(df.columns) == 1:
+        return Index(_key_values(df[df.columns[0]]))
+    return MultiIndex.from_arrays([_key_values(df[column]) for column in df.columns])
+
+
+def _listed_positions(group_by_df: DataFrame, group_by_values: List[Tuple]) -> np.ndarray:
+    # position of the row's group by values in the list, the last one if listed more times, -1 if it's not listed
+    listed_values = MultiIndex.from_tuples([tuple(_NULL_KEY if isna(v) else v for v in value)
+                                            for value in group_by_values])
+    listed_values = listed_values[~listed_values.duplicated(keep='last')]
+    return listed_values.get_indexer(MultiIndex.from_arrays(
+        [_key_values(group_by_df[column]) for column in group_by_df.columns]))
+
+
+def _values_dtype(values, filled: bool):
+    # type of values in a column, with missing ones filled in if some are
+    if filled:
+        values = take(values[:0], np.array([-1]), allow_fill=True)
+    return Series(values[:0]).dtype
 
 
 class TabularDataResult:
     def __init__(self, df: DataFrame):
         self.df = df
-        # self.df.set_index(self._merge_columns())
+        # (x_axis, group by...) index of rows, built when result is first combined with another one
+        self._key_index: Tuple[DataFrame, Tuple[str, ...], Index] | None = None
 
     def __add__(self, other):
         if self.df.empty:
@@ -75,11 +133,11 @@ class TabularDataResult:
             return self
         if isinstance(other, (int, float)):
             return TabularDataResult(self.df.assign(**{
-                constants.DATA_COLUMN_ALIAS: lambda x: _safe_division(x[constants.DATA_COLUMN_ALIAS], other)}))
+                constants.DATA_COLUMN_ALIAS: lambda x: safe_division(x[constants.DATA_COLUMN_ALIAS].array, other)}))
         if isinstance(other, TabularDataResult):
             if other.df.empty:
                 return other
-            return self.combine_values(other, lambda x, y: _safe_division(x, y))
+            return self.combine_values(other, lambda x, y: safe_division(x, y))
         raise ValueError(f'Unsupported type {type(other)}')
 
     def __rtruediv__(self, other):
@@ -87,11 +145,11 @@ class TabularDataResult:
             return self
         if isinstance(other, (int, float)):
             return TabularDataResult(self.df.assign(**{
-                constants.DATA_COLUMN_ALIAS: lambda x: _safe_division(other, x[constants.DATA_COLUMN_ALIAS])}))
+                constants.DATA_COLUMN_ALIAS: lambda x: safe_division(other, x[constants.DATA_COLUMN_ALIAS].array)}))
         if isinstance(other, TabularDataResult):
             if other.df.empty:
                 return other
-            return self.combine_values(other, lambda x, y: _safe_division(y, x))
+            return self.combine_values(other, lambda x, y: safe_division(y, x))
         raise ValueError(f'Unsupported type {type(other)}')
 
     def __neg__(self):
@@ -100,6 +158,9 @@ class TabularDataResult:
     def __eq__(self, other):
         return self.df.equals(other.df)
 
+    def dense(self) -> 'TabularDataResult':
+        return self
+
     def _merge_columns(self) -> List[str]:
         return [constants.X_AXIS_COLUMN_ALIAS] + self.group_by_columns()
 
@@ -107,7 +168,9 @@ class TabularDataResult:
         return self.df.columns.tolist()[1:-1]
 
     def group_by_values(self) -> List[Tuple]:
-        return [tuple(x) for x in self.df[self.group_by_columns()].values if len(x) > 0]
+        if not self.group_by_columns():
+            return []
+        return list(_value_rows(self.df[self.group_by_columns()]))
 
     def get_top_n_values(self, n: int) -> 'TabularDataResult':
         df = self.df.sort_values(constants.DATA_COLUMN_ALIAS, ascending=False).head(n)
@@ -117,48 +180,62 @@ class TabularDataResult:
         df = self.df.sort_values(constants.DATA_COLUMN_ALIAS, ascending=True).head(n)
         return TabularDataResult(df)
 
+    def _group_codes(self) -> np.ndarray:
+        if not self.group_by_columns():
+            return np.zeros(len(self.df), dtype=np.int64)
+        columns = self.group_by_columns()
+        # categories are grouped by their codes, as groups of missing categories aren't numbered
+        keys = DataFrame({column: values.cat.codes if is_categorical_dtype(values) else values
+                          for column, values in self.df[columns].items()})
+        return keys.groupby(columns, dropna=False, sort=False).ngroup().to_numpy()
+
     def filter_by_group_by_values(self, group_by_values: List[Tuple]) -> 'TabularDataResult':
-        if self.df.empty or len(group_by_values) == 0:
+        if self.df.empty or len(group_by_values) == 0 or not self.group_by_columns():
             return self
-        sorting_score = {v: idx for idx, v in enumerate(group_by_values)}
-        # df = self.df[self.df[self.group_by_columns()].apply(tuple, axis=1).isin(group_by_values)]
-        df = self.df[MultiIndex.from_arrays([self.df[x] for x in self.group_by_columns()]).isin(group_by_values)]
-        df['_sorting_score'] = df[self.group_by_columns()].apply(tuple, axis=1).map(lambda key: sorting_score[key])
+        return self._filter_by_sorting_score(_listed_positions(self.df[self.group_by_columns()], group_by_values))
+
+    def filter_by_group_by_codes(self, listed_codes: np.ndarray,
+                                 group_by_keys: 'GroupByKeys') -> 'TabularDataResult':
+        """
+        Like filter_by_group_by_values, with the list given as codes of the dictionary.
+        """
+        if self.df.empty or len(listed_codes) == 0 or not self.group_by_columns():
+            return self
+        codes = group_by_keys.encode(self)
+        return self._filter_by_sorting_score(group_by_keys.positions(listed_codes)[codes])
+
+    def _filter_by_sorting_score(self, sorting_score: np.ndarray) -> 'TabularDataResult':
+        df = self.df[sorting_score >= 0].assign(_sorting_score=sorting_score[sorting_score >= 0])
         df.sort_values(by=[constants.X_AXIS_COLUMN_ALIAS, '_sorting_score'], inplace=True)
         df.drop(['_sorting_score'], inplace=True, axis=1)
         return TabularDataResult(df)
 
     def trim_zeros(self) -> 'TabularDataResult':
+        """
+        Removes rows of every group before its first and after its last non zero value, groups which are all zeros
+        are removed completely.
+        """
         if self.df.empty:
             return self
 
-        def trim_zeros_from_start_and_end(row):
-            # Check if all values are zero
-            if row.eq(0).all():
-                row.loc[:] = True
-                return row
-            first_non_zero = row.ne(0).idxmax() - 1
-            last_non_zero = row[::-1].ne(0).idxmax() + 1
-            row.loc[:] = False
-            row.loc[:first_non_zero] = True
-            row.loc[last_non_zero:] = True
-
-            return row
-
-        result_df = self.df.sort_values(self.group_by_columns() + [constants.X_AXIS_COLUMN_ALIAS])#.reset_index(drop=True)
-        grouped_df = result_df.groupby(self.group_by_columns(), dropna=False) if len(self.group_by_columns()) > 0 else result_df
-        result_df['trim_row'] = grouped_df[
-            constants.DATA_COLUMN_ALIAS].apply(lambda x: trim_zeros_from_start_and_end(x.copy())) if len(
-            self.group_by_columns()) > 0 else trim_zeros_from_start_and_end(grouped_df[
-                                                                                constants.DATA_COLUMN_ALIAS].copy())
-        
-        return_df = self.df.drop(self.df[result_df['trim_row'] == True].index)
-        return TabularDataResult(return_df)
-
-    def filter(self, filter: Callable[[object], bool]):
+        order = self.df[constants.X_AXIS_COLUMN_ALIAS].reset_index(drop=True).sort_values(kind='stable').index.to_numpy()
+        non_zero = Series(self.df[constants.DATA_COLUMN_ALIAS].ne(0).to_numpy(dtype=bool, na_value=True)[order]
+                          .astype(np.int64))
+        group_codes = self._group_codes()[order]
+        # rows with a non zero value at or before them, and at or after them within their group
+        after_first = non_zero.groupby(group_codes).cumsum().to_numpy() > 0
+        before_last = non_zero[::-1].groupby(group_codes[::-1]).cumsum().to_numpy()[::-1] > 0
+        keep = np.empty(len(order), dtype=bool)
+        keep[order] = after_first & before_last
+        return TabularDataResult(self.df[keep])
+
+    def filter(self, filter: Callable[[Series], Series]):
+        """
+        Keeps rows for which filter of x axis values is true. Filter gets all x axis values at once.
+        """
         if self.df.empty:
             return self
-        df = self.df[self.df[constants.X_AXIS_COLUMN_ALIAS].map(filter)]
+        df = self.df[np.asarray(filter(self.df[constants.X_AXIS_COLUMN_ALIAS]), dtype=bool)]
         return TabularDataResult(df)
 
     def map_x_axis(self, mapper: Callable[[object], object]) -> 'TabularDataResult':
@@ -178,55 +255,106 @@ class TabularDataResult:
         df = self.df.assign(**mapper_dict)
         return TabularDataResult(df)
 
+    def key_index(self, columns: List[str] | None = None) -> Index:
+        """
+        Index of rows by given key columns, x axis and group by columns by default. It is kept with the result, so
+        results taking part in several operations are indexed only once.
+        """
+        columns = tuple(columns or self._merge_columns())
+        if self._key_index is not None:
+            df, key_columns, index = self._key_index
+            if df is self.df and key_columns == columns:
+                return index
+        if len(columns) == 1:
+            index = Index(_key_values(self.df[columns[0]]))
+        else:
+            index = MultiIndex.from_arrays([_key_values(self.df[column]) for column in columns])
+        self._key_index = (self.df, columns, index)
+        return index
+
+    def _indexer(self, table_result: 'TabularDataResult') -> np.ndarray | None:
+        """
+        Position of every row in the other result with the same key, -1 if there isn't any. None if keys of the
+        other result are not unique, so rows can't be aligned one to one.
+        """
+        merge_columns = self._merge_columns()
+        other_index = table_result.key_index(merge_columns)
+        if not other_index.is_unique:
+            return None
+        index = self.key_index(merge_columns)
+        if index.equals(other_index):
+            return np.arange(len(index))
+        return other_index.get_indexer(index)
+
+    def aligned_values(self, table_result: 'TabularDataResult') -> Tuple[object, np.ndarray] | None:
+        """
+        Values of the other result for every row of this one, and mask of rows which have a match. None if keys of
+        the other result are not unique.
+        """
+        if table_result.df.empty:
+            return np.full(len(self.df), np.nan), np.zeros(len(self.df), dtype=bool)
+        indexer = self._indexer(table_result)
+        if indexer is None:
+            return None
+        values = table_result.df[constants.DATA_COLUMN_ALIAS].array
+        if len(indexer) == len(values) and (indexer == np.arange(len(indexer))).all():
+            return values, np.ones(len(indexer), dtype=bool)
+        return take(values, indexer, allow_fill=True), indexer >= 0
+
     def merge_values(self, table_result: 'TabularDataResult') -> 'TabularDataResult':
-        merged = self.df.merge(table_result.df, on=self._merge_columns(), how='left', suffixes=('_1', '_2'))
-        merged[constants.DATA_COLUMN_ALIAS] = merged[f'{constants.DATA_COLUMN_ALIAS}_2'].fillna(
-            merged[f'{constants.DATA_COLUMN_ALIAS}_1'])
-        df = merged[table_result.df.columns.values.tolist()]
+        indexer = self._indexer(table_result)
+        if indexer is None:
+            merged = self.df.merge(table_result.df, on=self._merge_columns(), how='left', suffixes=('_1', '_2'))
+            merged[constants.DATA_COLUMN_ALIAS] = merged[f'{constants.DATA_COLUMN_ALIAS}_2'].fillna(
+                merged[f'{constants.DATA_COLUMN_ALIAS}_1'])
+            df = merged[table_result.df.columns.values.tolist()]
+            return TabularDataResult(df)
+        values = take(table_result.df[constants.DATA_COLUMN_ALIAS].array, indexer, allow_fill=True)
+        df = self.df[table_result.df.columns.values.tolist()].reset_index(drop=True)
+        df[constants.DATA_COLUMN_ALIAS] = values
+        df[constants.DATA_COLUMN_ALIAS] = df[constants.DATA_COLUMN_ALIAS].fillna(
+            self.df[constants.DATA_COLUMN_ALIAS].reset_index(drop=True))
         return TabularDataResult(df)
 
     def combine_values(self, table_result: 'TabularDataResult',
-                       combiner: Callable[[float, float], float]) -> 'TabularDataResult':
-        merged = self.df.merge(table_result.df, on=self._merge_columns(), suffixes=('_1', '_2'))
-        merged[constants.DATA_COLUMN_ALIAS] = merged.apply(lambda row: combiner(
-            row[f'{constants.DATA_COLUMN_ALIAS}_1'],
-            row[f'{constants.DATA_COLUMN_ALIAS}_2'],
-        ), axis=1)
-        return TabularDataResult(merged[self.df.columns.tolist()])
+                       combiner: Callable[[object, object], object]) -> 'TabularDataResult':
+        """
+        Combines values of rows with the same key, rows without a match are dropped. Combiner works on whole
+        value arrays.
+        """
+        indexer = self._indexer(table_result)
+        if indexer is None:
+            merged = self.df.merge(table_result.df, on=self._merge_columns(), suffixes=('_1', '_2'))
+            merged[constants.DATA_COLUMN_ALIAS] = combiner(
+                merged[f'{constants.DATA_COLUMN_ALIAS}_1'].array,
+                merged[f'{constants.DATA_COLUMN_ALIAS}_2'].array,
+            )
+            return TabularDataResult(merged[self.df.columns.tolist()])
+        matched = indexer >= 0
+        if matched.all():
+            df = self.df.reset_index(drop=True)
+            values = self.df[constants.DATA_COLUMN_ALIAS].array
+        else:
+            df = self.df[matched].reset_index(drop=True)
+            values = self.df[constants.DATA_COLUMN_ALIAS].array[matched]
+            indexer = indexer[matched]
+        other_values = table_result.df[constants.DATA_COLUMN_ALIAS].array.take(indexer)
+        return TabularDataResult(df.assign(**{constants.DATA_COLUMN_ALIAS: combiner(values, other_values)}))
 
     def group_by_x_axis(self, reducer: Callable[[GroupBy], DataFrame]) -> 'TabularDataResult':
-        df = reducer(self.df.groupby(self._merge_columns(), as_index=False, sort=False))
+        df = reducer(self.df.groupby(self._merge_columns(), as_index=False, sort=False, observed=True))
         return TabularDataResult(df[self.df.columns.tolist()])
 
     def group_by_group_by_values(self, reducer: Callable[[GroupBy], DataFrame]) -> 'TabularDataResult':
         if not self.group_by_columns():
             return self
-        df = reducer(self.df.groupby(self._merge_columns(), as_index=False, sort=False))
+        df = reducer(self.df.groupby(self._merge_columns(), as_index=False, sort=False, observed=True))
         return TabularDataResult(df[self.df.columns.tolist()])
 
     @classmethod
     def _from_x_axis_values(cls, x_axis_values: List, group_by_columns: List[str], group_by_values: Set[Tuple]):
-        x_axis_repeated_values = []
-        for x_axis_value in x_axis_values:
-            for i in range(max(1, len(group_by_values))):
-                x_axis_repeated_values.append(x_axis_value)
-        data: Dict[str, List[object]] = {
-            constants.X_AXIS_COLUMN_ALIAS: x_axis_repeated_values,
-        }
-
-        # add group by series
-        for group_by_column in group_by_columns:
-            data[group_by_column] = []
-        for group_by_value in sorted(group_by_values, key=lambda x: (None in x, x)):
-            for idx, group_by_column in enumerate(group_by_columns):
-                data[group_by_column].append(group_by_value[idx])
-        for group_by_column in group_by_columns:
-            # if len(data[group_by_column]) == 0:
-            #     data[group_by_column].append(None)
-            data[group_by_column] *= max(1, len(x_axis_values))
-
-        data[constants.DATA_COLUMN_ALIAS] = [0] * len(data[constants.X_AXIS_COLUMN_ALIAS])
-        return TabularDataResult(DataFrame(data))
+        return IdentityTable.from_x_axis_values(x_axis_values, group_by_columns,
+                                                _sorted_group_by_values(group_by_values)).to_result()
 
     @classmethod
     def from_cohort_days(cls, days: int, group_by_columns: List[str],
@@ -245,6 +373,290 @@ class TabularDataResult:
             group_by_values=group_by_values)
 
 
+class IdentityTable:
+    """
+    Table of zeros for every x axis value and every group by values, kept as the two domains instead of their
+    cartesian product. Rows are ordered by x axis value first, so position of a row is position of its x axis value
+    times number of groups plus position of its group by values. Rollups and filters work on the domains, and rows
+    are materialized only for results which need them.
+    """
+    def __init__(self, x_axis_values: Series, groups: DataFrame):
+        self.x_axis_values = x_axis_values.reset_index(drop=True).rename(constants.X_AXIS_COLUMN_ALIAS)
+        # without group by columns there's a single group with no values
+        self.groups = groups.reset_index(drop=True)
+        self._positions_index: Tuple[Index, Index] | None = None
+
+    @classmethod
+    def from_x_axis_values(cls, x_axis_values: List, group_by_columns: List[str],
+                           group_by_values: List[Tuple]) -> 'IdentityTable':
+        # groups are in order of the list, which is sorted by GroupByKeys
+        if group_by_columns:
+            groups = DataFrame({
+                group_by_column: Series([group_by_value[idx] for group_by_value in group_by_values],
+                                        dtype=None if group_by_values else object)
+                for idx, group_by_column in enumerate(group_by_columns)})
+        else:
+            groups = DataFrame(index=range(1))
+        return IdentityTable(Series(x_axis_values, dtype=None if len(x_axis_values) else object), groups)
+
+    @classmethod
+    def from_cohort_days(cls, days: int, group_by_columns: List[str],
+                         group_by_values: List[Tuple]) -> 'IdentityTable':
+        return IdentityTable.from_x_axis_values(list(range(days)), group_by_columns, group_by_values)
+
+    @classmethod
+    def from_date_interval(cls, date_interval: DatetimeInterval, time_grain: TimeGrain, group_by_columns: List[str],
+                           group_by_values: List[Tuple]) -> 'IdentityTable':
+        x_axis_values = DatetimeIndex(date_interval.datetime_range(time_grain)).tz_localize(pytz.UTC)
+        return IdentityTable.from_x_axis_values(x_axis_values, group_by_columns, group_by_values)
+
+    def __len__(self):
+        return len(self.x_axis_values) * len(self.groups)
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    def group_by_columns(self) -> List[str]:
+        return self.groups.columns.tolist()
+
+    def columns(self) -> List[str]:
+        return [constants.X_AXIS_COLUMN_ALIAS] + self.group_by_columns() + [constants.DATA_COLUMN_ALIAS]
+
+    def frame(self, positions: np.ndarray) -> DataFrame:
+        """
+        Axes of rows at given positions, without values.
+        """
+        groups_count = max(1, len(self.groups))
+        data = {constants.X_AXIS_COLUMN_ALIAS: self.x_axis_values.take(positions // groups_count)
+                .reset_index(drop=True)}
+        group_positions = positions % groups_count
+        for column in self.group_by_columns():
+            data[column] = self.groups[column].take(group_positions).reset_index(drop=True)
+        return DataFrame(data, index=RangeIndex(len(positions)))
+
+    def to_result(self) -> TabularDataResult:
+        return TabularDataResult(self.frame(np.arange(len(self))).assign(
+            **{constants.DATA_COLUMN_ALIAS: np.zeros(len(self), dtype=np.int64)}))
+
+    def rollup(self,
+               x_axis_mapper: Callable[[object], object] = lambda x: x,
+               group_by_columns_mapper: Callable[[object], object] = lambda x: x) -> 'IdentityTable':
+        """
+        Same as rolling up materialized rows, sums of zeros are zeros, so only the domains are mapped. Group by
+        values which are missing after mapping are dropped, as grouping drops them.
+        """
+        x_axis_values = self.x_axis_values
+        if len(x_axis_values) > 0:
+            x_axis_values = x_axis_values.to_frame().assign(**{
+                constants.X_AXIS_COLUMN_ALIAS: lambda x: x_axis_mapper(x[constants.X_AXIS_COLUMN_ALIAS])
+            })[constants.X_AXIS_COLUMN_ALIAS].drop_duplicates()
+        groups = self.groups
+        if self.group_by_columns():
+            groups = groups.assign(**{column: (lambda column: lambda x: group_by_columns_mapper(x[column]))(column)
+                                      for column in self.group_by_columns()})
+            groups = groups[groups.notna().all(axis=1)].drop_duplicates()
+        return IdentityTable(x_axis_values, groups)
+
+    def filter_by_group_by_values(self, group_by_values: List[Tuple]) -> 'IdentityTable':
+        if self.empty or len(group_by_values) == 0 or not self.group_by_columns():
+            return self
+        sorting_score = _listed_positions(self.groups, group_by_values)
+        listed = np.flatnonzero(sorting_score >= 0)
+        groups = self.groups.take(listed[np.argsort(sorting_score[listed], kind='stable')])
+        return IdentityTable(self.x_axis_values.sort_values(kind='stable'), groups)
+
+    def positions(self, result: TabularDataResult) -> np.ndarray | None:
+        """
+        Position of every row of the result in the table, -1 if it's outside of it. None if rows of the table or of
+        the result can't be told apart by their keys.
+        """
+        if result.df.empty:
+            return np.zeros(0, dtype=np.int64)
+        if self._positions_index is None:
+            self._positions_index = (Index(_key_values(self.x_axis_values)),
+                                     _key_index(self.groups) if self.group_by_columns() else None)
+        x_axis_index, groups_index = self._positions_index
+        if not x_axis_index.is_unique or (groups_index is not None and not groups_index.is_unique) \
+                or not result.key_index([constants.X_AXIS_COLUMN_ALIAS] + self.group_by_columns()).is_unique:
+            return None
+        x_axis_positions = x_axis_index.get_indexer(_key_values(result.df[constants.X_AXIS_COLUMN_ALIAS]))
+        if groups_index is None:
+            group_positions = np.zeros(len(result.df), dtype=np.int64)
+        else:
+            group_positions = groups_index.get_indexer(_key_index(result.df[self.group_by_columns()]))
+        return np.where((x_axis_positions >= 0) & (group_positions >= 0),
+                        x_axis_positions * len(self.groups) + group_positions, -1)
+
+    def merge_values(self, table_result: TabularDataResult) -> 'SparseTabularDataResult | TabularDataResult':
+        """
+        Values of the result in rows of the table, like merging them into materialized rows.
+        """
+        positions = self.positions(table_result)
+        if positions is None:
+            return self.to_result().merge_values(table_result)
+        inside = positions >= 0
+        # missing values keep zeros of the table, as they do when merged into materialized rows
+        values = table_result.df[constants.DATA_COLUMN_ALIAS][inside].fillna(0).array
+        columns = table_result.df.columns.tolist() if not table_result.df.empty else self.columns()
+        return SparseTabularDataResult(self, positions[inside], values, columns)
+
+
+class SparseTabularDataResult:
+    """
+    Result over rows of an identity table, which keeps only rows with values. Values of all other rows are zeros.
+    Rows are materialized by trimming zeros, which keeps only rows between the first and the last non zero value of
+    every group, or all of them by dense.
+    """
+    def __init__(self, identity: IdentityTable, positions: np.ndarray, values, columns: List[str], dtype=None):
+        order = np.argsort(positions, kind='stable')
+        self.identity = identity
+        self.positions = positions[order]
+        self.values = values.take(order)
+        self.columns = columns
+        # type of values once zeros are filled in, as types of materialized rows would be
+        self.dtype = dtype if dtype is not None else _values_dtype(values, filled=len(positions) < len(identity))
+
+    def _result(self, positions: np.ndarray) -> TabularDataResult:
+        indexer = Index(self.positions).get_indexer(positions)
+        # only rows without values are zeros, missing values of rows with values stay missing
+        values = Series(take(self.values, indexer, allow_fill=True)).where(indexer >= 0, 0).astype(self.dtype)
+        df = self.identity.frame(positions).assign(**{constants.DATA_COLUMN_ALIAS: values})
+        return TabularDataResult(df[self.columns])
+
+    def dense(self) -> TabularDataResult:
+        return self._result(np.arange(len(self.identity)))
+
+    def trim_zeros(self) -> TabularDataResult:
+        """
+        Same as trimming zeros of all rows. X axis position of the first and the last non zero value of every group
+        bound rows which are materialized.
+        """
+        if self.identity.empty:
+            return self.dense()
+        groups_count = len(self.identity.groups)
+        non_zero = Series(self.values).ne(0).to_numpy(dtype=bool, na_value=True)
+        # rank of x axis values in stable sorted order
+        x_axis_order = self.identity.x_axis_values.reset_index(drop=True).sort_values(kind='stable').index.to_numpy()
+        x_axis_rank = np.empty(len(x_axis_order), dtype=np.int64)
+        x_axis_rank[x_axis_order] = np.arange(len(x_axis_order))
+        positions = self.positions[non_zero]
+        ranks = Series(x_axis_rank[positions // groups_count])
+        groups = positions % groups_count
+        first = ranks.groupby(groups).min()
+        last = ranks.groupby(groups).max()
+        spans = (last - first + 1).to_numpy()
+        span_groups = np.repeat(first.index.to_numpy(), spans)
+        span_ranks = np.repeat(first.to_numpy(), spans) + np.arange(spans.sum()) - np.repeat(np.cumsum(spans) - spans,
+                                                                                               spans)
+        return self._result(np.sort(x_axis_order[span_ranks] * groups_count + span_groups))
+
+    def filter_by_group_by_values(self, group_by_values: List[Tuple]) -> 'SparseTabularDataResult':
+        if len(group_by_values) == 0 or not self.identity.group_by_columns():
+            return self
+        identity = self.identity.filter_by_group_by_values(group_by_values)
+        frame = self.identity.frame(self.positions).assign(**{constants.DATA_COLUMN_ALIAS: 0})
+        positions = identity.positions(TabularDataResult(frame))
+        listed = positions >= 0
+        return SparseTabularDataResult(identity, positions[listed], self.values[listed], self.columns, self.dtype)
+
+    def map_x_axis(self, mapper: Callable[[object], object]) -> 'SparseTabularDataResult | TabularDataResult':
+        if self.identity.empty:
+            return self
+        x_axis_values = mapper(self.identity.x_axis_values)
+        if not x_axis_values.is_unique:
+            return self.dense().map_x_axis(mapper)
+        return SparseTabularDataResult(IdentityTable(x_axis_values, self.identity.groups), self.positions,
+                                       self.values, self.columns, self.dtype)
+
+    def total(self) -> TabularDataResult:
+        """
+        Sum of values of every group by values, like rolling up all rows into x axis value 0.
+        """
+        totals = self.identity.rollup(x_axis_mapper=lambda x: 0)
+        values = Series(self.values).fillna(0).to_numpy()
+        frame = self.identity.frame(self.positions).assign(**{constants.DATA_COLUMN_ALIAS: values})
+        sums = TabularDataResult(frame[self.identity.columns()]) \
+            .group_by_group_by_values(lambda group_by: group_by.sum()) \
+            .map_x_axis(lambda x: 0) \
+            .group_by_x_axis(lambda group_by: group_by.sum())
+        return totals.merge_values(sums).dense()
+
+
+class GroupByKeys:
+    """
+    Dictionary of group by values of a request. Every distinct tuple of group by values is encoded once as an
+    integer code, so distinct values of results, order of groups of identity tables and filtering of compare
+    results work on integer arrays, and tuples are built only for distinct values. Result frames keep their group
+    by columns, so merges, rollups, top N values and the response still work on the values.
+    """
+    def __init__(self):
+        self._codes: Dict[Tuple, int] = {}
+        self._values: List[Tuple] = []
+        self._ranks: np.ndarray = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self._values)
+
+    def encode(self, result: TabularDataResult) -> np.ndarray:
+        """
+        Code of group by values of every row of the result.
+        """
+        if result.df.empty or not result.group_by_columns():
+            return np.zeros(0, dtype=np.int64)
+        local_codes = result._group_codes()
+        _, first_rows = np.unique(local_codes, return_index=True)
+        return self.codes(_value_rows(result.df[result.group_by_columns()].iloc[first_rows]))[local_codes]
+
+    def codes(self, values: Iterable[Tuple]) -> np.ndarray:
+        return np.array([self._code(value) for value in values], dtype=np.int64)
+
+    def _code(self, value: Tuple) -> int:
+        # missing values don't compare equal, so they are replaced in keys of the dictionary
+        key = tuple(None if isna(v) else v for v in value)
+        code = self._codes.get(key)
+        if code is None:
+            code = self._codes[key] = len(self._values)
+            self._values.append(value)
+        return code
+
+    def decode(self, codes: np.ndarray) -> List[Tuple]:
+        return [self._values[code] for code in codes]
+
+    def sort(self, codes: np.ndarray) -> np.ndarray:
+        """
+        Codes ordered by their group by values, values with missing ones last.
+        """
+        return codes[np.argsort(self._sort_ranks()[codes], kind='stable')]
+
+    def positions(self, listed_codes: np.ndarray) -> np.ndarray:
+        """
+        Position of every code in the list, the last one if listed more times, -1 if it's not listed.
+        """
+        positions = np.full(len(self._values), -1, dtype=np.int64)
+        np.maximum.at(positions, listed_codes, np.arange(len(listed_codes)))
+        return positions
+
+    def _sort_ranks(self) -> np.ndarray:
+        # rank of every code in order of values, recomputed only when codes were added since
+        if len(self._ranks) == len(self._values):
+            return self._ranks
+        keys = list(self._codes)
+        columns = [factorize(np.array(column, dtype=object), sort=True)[0] for column in zip(*keys)]
+        # missing values are factorized as -1, and are ordered after all others
+        columns = [np.where(column < 0, len(keys), column) for column in columns]
+        has_missing = np.array([None in key for key in keys], dtype=bool)
+        order = np.lexsort(columns[::-1] + [has_missing])
+        self._ranks = np.empty(len(keys), dtype=np.int64)
+        self._ranks[order] = np.arange(len(keys))
+        return self._ranks
+
+
+def _sorted_group_by_values(group_by_values: Iterable[Tuple]) -> List[Tuple]:
+    group_by_keys = GroupByKeys()
+    return group_by_keys.decode(group_by_keys.sort(group_by_keys.codes(group_by_values)))
+
+
 class TabularDataResults:
     def __init__(self, results_map: Dict[str, TabularDataResult] = None):
         self.results_map: Dict[str, TabularDataResult] = results_map or {}
@@ -252,17 +664,26 @@ class TabularDataResults:
     def add(self, id: str, tabular_data_result: TabularDataResult):
         self.results_map[id] = tabular_data_result
 
-    def group_by_values(self):
-        group_by_values = set()
-        for id, result in self.results_map.items():
-            group_by_values = group_by_values.union(result.group_by_values())
-        return group_by_values
-    
+    def group_by_codes(self, group_by_keys: GroupByKeys) -> np.ndarray:
+        """
+        Sorted codes of distinct group by values of all results.
+        """
+        codes = [group_by_keys.encode(result) for result in self.results_map.values()]
+        if not codes:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(codes))
+
+    def group_by_values(self, group_by_keys: GroupByKeys | None = None) -> Set[Tuple]:
+        if group_by_keys is None:
+            group_by_keys = GroupByKeys()
+        return set(group_by_keys.decode(self.group_by_codes(group_by_keys)))
+
     def group_by_columns_distinct_values_count(self):
-        group_by_values = set()
-        for id, result in self.results_map.items():
-            group_by_values = group_by_values.union(unique(result.df[result.group_by_columns()].values.ravel('K')))
-        return len(group_by_values)
+        values = [result.df[column].to_numpy(dtype=object)
+                  for result in self.results_map.values() for column in result.group_by_columns()]
+        if not values:
+            return 0
+        return len(unique(np.concatenate(values)))
 
     def group_by_columns(self) -> List[str]:
         return list(self.results_map.values())[0].group_by_columns()
@@ -272,7 +693,7 @@ class TabularDataResults:
             self.results_map[result_id] = self.results_map[result_id].map_x_axis(mapper)
         return self
 
-    def filter(self, filter: Callable[[object], bool]) -> 'TabularDataResults':
+    def filter(self, filter: Callable[[Series], Series]) -> 'TabularDataResults':
         for result_id in self.results_map.keys():
             self.results_map[result_id] = self.results_map[result_id].filter(filter)
         return self
@@ -281,6 +702,12 @@ class TabularDataResults:
         for result_id in self.results_map.keys():
             self.results_map[result_id] = self.results_map[result_id].filter_by_group_by_values(group_by_values)
         return self
+
+    def filter_by_group_by_codes(self, listed_codes: np.ndarray, group_by_keys: GroupByKeys) -> 'TabularDataResults':
+        for result_id in self.results_map.keys():
+            self.results_map[result_id] = self.results_map[result_id].filter_by_group_by_codes(listed_codes,
+                                                                                               group_by_keys)
+        return self
     
     def get_max_rows(self):
         max_rows = 0
@@ -15,6 +15,7 @@
 from datetime import timedelta, datetime
 from enum import Enum
 
+import numpy as np
 from dateutil.relativedelta import relativedelta
 
 
@@ -68,7 +69,8 @@ class TimeGrain(str, Enum):
 
     def truncate_datetime(self, dt: datetime) -> datetime:
         if self == TimeGrain.min15:
-            return dt.replace(minute=15 * round(dt.minute / 15), second=0, microsecond=0)
+            # rounded to the nearest quarter of an hour, same as in warehouse queries
+            return dt.replace(minute=0, second=0, microsecond=0) + timedelta(minutes=15 * round(dt.minute / 15))
         if self == TimeGrain.hour:
             return dt.replace(minute=0, second=0, microsecond=0)
         if self == TimeGrain.day:
@@ -84,3 +86,84 @@ class TimeGrain(str, Enum):
             return TimeGrain.month.truncate_datetime(dt).replace(month=1)
         else:
             raise ValueError(f"Not supported TimeGrain: {self.value}")
+
+    def truncate_datetimes(self, values: np.ndarray) -> np.ndarray:
+        """
+        Vectorized truncate_datetime of a datetime64 array.
+        """
+        if self == TimeGrain.min15:
+            hours = values.astype('datetime64[h]')
+            minutes = (values - hours).astype('timedelta64[m]').astype(np.int64)
+            truncated = hours + ((minutes + 7) // 15 * 15).astype('timedelta64[m]')
+        elif self == TimeGrain.hour:
+            truncated = values.astype('datetime64[h]')
+        elif self == TimeGrain.day:
+            truncated = values.astype('datetime64[D]')
+        elif self == TimeGrain.week:
+            days = values.astype('datetime64[D]')
+            # 1970-01-01 was a thursday
+            truncated = days - ((days.astype(np.int64) + 3) % 7).astype('timedelta64[D]')
+        elif self == TimeGrain.month:
+            truncated = values.astype('datetime64[M]')
+        elif self == TimeGrain.quarter:
+            months = values.astype('datetime64[M]')
+            truncated = months - (months.astype(np.int64) % 3).astype('timedelta64[M]')
+        elif self == TimeGrain.year:
+            truncated = values.astype('datetime64[Y]')
+        else:
+            raise ValueError(f"Not supported TimeGrain: {self.value}")
+        return truncated.astype(values.dtype)
+
+    def next_datetimes(self, values: np.ndarray) -> np.ndarray:
+        """
+        Vectorized next_datetime of a datetime64 array.
+        """
+        if self in (TimeGrain.month, TimeGrain.quarter, TimeGrain.year):
+            return _add_months(values, self._months())
+        return values + self._timedelta()
+
+    def datetime_range(self, date_from: np.datetime64, date_to: np.datetime64) -> np.ndarray:
+        """
+        Truncated date_from and every next datetime up to date_to, as a datetime64 array.
+        """
+        date_from = self.truncate_datetimes(np.array([date_from]))[0]
+        if self in (TimeGrain.month, TimeGrain.quarter, TimeGrain.year):
+            months = np.arange(date_from.astype('datetime64[M]'), date_to.astype('datetime64[M]') + 1, self._months())
+            values = months.astype(date_from.dtype)
+            return values[values <= date_to]
+        return np.arange(date_from, date_to + 1, self._timedelta())
+
+    def _timedelta(self) -> np.timedelta64:
+        if self == TimeGrain.min15:
+            return np.timedelta64(15, 'm')
+        if self == TimeGrain.hour:
+            return np.timedelta64(1, 'h')
+        if self == TimeGrain.day:
+            return np.timedelta64(1, 'D')
+        elif self == TimeGrain.week:
+            return np.timedelta64(7, 'D')
+        else:
+            raise ValueError(f"Not fixed length TimeGrain: {self.value}")
+
+    def _months(self) -> int:
+        if self == TimeGrain.month:
+            return 1
+        elif self == TimeGrain.quarter:
+            return 3
+        elif self == TimeGrain.year:
+            return 12
+        else:
+            raise ValueError(f"Not month based TimeGrain: {self.value}")
+
+
+def _add_months(values: np.ndarray, months: int) -> np.ndarray:
+    """
+    Same as adding relativedelta(months=months), days past the end of a month are moved to its last day.
+    """
+    days = values.astype('datetime64[D]')
+    month_starts = values.astype('datetime64[M]')
+    next_month_starts = month_starts + months
+    month_days = (next_month_starts + 1).astype('datetime64[D]') - next_month_starts.astype('datetime64[D]')
+    day_of_month = days - month_starts.astype('datetime64[D]')
+    shifted = next_month_starts.astype('datetime64[D]') + np.minimum(day_of_month, month_days - 1)
+    return (shifted + (values - days)).astype(values.dtype)
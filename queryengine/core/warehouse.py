@@ -20,13 +20,25 @@ from queryengine.core.tabular_data_result import TabularDataResults
 class TooManyRequestsException(Exception):
     pass
 
-class TooManyRowsException(Exception):
-    pass
+class TooLargeResultException(Exception):
+    def __init__(self, estimated_bytes: int, max_bytes: int):
+        super().__init__(f'Query results would take {estimated_bytes} bytes of memory, limit is {max_bytes}')
+        self.estimated_bytes = estimated_bytes
+        self.max_bytes = max_bytes
 
 class TooManyGroupByValuesException(Exception):
     pass
 
+class QueryCancelledException(Exception):
+    pass
+
+class TooManyBytesException(Exception):
+    def __init__(self, estimated_bytes: int, max_bytes: int):
+        super().__init__(f'Query would process {estimated_bytes} bytes, limit is {max_bytes}')
+        self.estimated_bytes = estimated_bytes
+        self.max_bytes = max_bytes
+
 class FutureResult(ABC):
     @abstractmethod
-    def get(self) -> TabularDataResults:
+    async def get(self) -> TabularDataResults:
         pass
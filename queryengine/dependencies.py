@@ -13,13 +13,26 @@
 # limitations under the License.
 
 import os
-from typing import Generator
+from typing import Dict, Generator
 
+from queryengine.api.chart.internal.semantic_layer.process_pool import SemanticLayerPool
+from queryengine.api.chart.response_cache import ChartResponseCache
 from queryengine.core.app.datasource import CachedMetadataAppRepository, MetadataAppRepository
-from queryengine.core.bigquery.queryexecutor import SimpleBigQueryExecutor, CancellableBigQueryExecutor
+from queryengine.core.bigquery.queryexecutor import SimpleBigQueryExecutor, CancellableBigQueryExecutor, \
+    AsyncBigQueryExecutor, CachingBigQueryExecutor, SingleFlightBigQueryExecutor
+from queryengine.core.bigquery.admission import AdmissionScheduler
+from queryengine.core.bigquery.cost import BytesBudget, BytesBudgetBigQueryExecutor, CachingCostEstimator, \
+    DryRunCostEstimator
+from queryengine.core.bigquery.download import ArrowResultDownloader, RestResultDownloader
+from queryengine.core.bigquery.job_registry import JobRegistry
+from queryengine.core.bigquery.memory_budget import MemoryBudget
+from queryengine.core.bigquery.result_cache import DiskResultCache, InMemoryResultCache, ResultCache, \
+    SharedResultCache, TieredResultCache
 from queryengine.core.datasource.repository import InMemoryDataSourceRepository
+from queryengine.core.duckdb import executor as duckdb_executor, synthetic_data
 from queryengine.core.kpi.repository import InMemoryKpiRepository
-from queryengine.core import constants
+from queryengine.core.shared_store import InMemorySharedStore
+from queryengine.core import constants, shared_store
 from queryengine.core.user_history_definition.repository import InMemoryUserHistoryDefinitionRepository, CachedUserHistoryDefinitionRepository
 
 _app_config_repository = CachedMetadataAppRepository(MetadataAppRepository(
@@ -27,17 +40,180 @@ _app_config_repository = CachedMetadataAppRepository(MetadataAppRepository(
     metadata_port=os.environ.get("METADATA_PORT", "80")
 ))
 
-_bigquery_executor = CancellableBigQueryExecutor(SimpleBigQueryExecutor(
-    project=os.environ.get('GCP_PROJECT_ID'),
-    threads=100,
-    max_rows=constants.BIGQUERY_MAX_ROWS
-))
+
+def _result_downloader():
+    if os.environ.get('BIGQUERY_DOWNLOAD', 'arrow') == 'rest':
+        return RestResultDownloader()
+    return ArrowResultDownloader(small_result_rows=constants.BIGQUERY_SMALL_RESULT_ROWS)
+
+
+def _app_values(name: str, parse):
+    # i.e. ADMISSION_APP_WEIGHTS=app1=2,app2=0.5
+    values = {}
+    for app_value in filter(None, os.environ.get(name, '').split(',')):
+        app_id, value = app_value.split('=')
+        values[app_id.strip()] = parse(value)
+    return values
+
+
+_executor_type = os.environ.get('BIGQUERY_EXECUTOR', 'threads')
+_threaded_executor = _executor_type != 'asyncio'
+
+_admission_scheduler = AdmissionScheduler(
+    max_running=100 if _threaded_executor else int(os.environ.get('BIGQUERY_MAX_JOBS', '2000')),
+    max_queued_per_app=int(os.environ.get('ADMISSION_MAX_QUEUED_PER_APP', constants.ADMISSION_MAX_QUEUED_PER_APP)),
+    app_weights=_app_values('ADMISSION_APP_WEIGHTS', float)
+)
+
+_job_registry = JobRegistry()
+
+_memory_budget = MemoryBudget(
+    max_request_bytes=int(os.environ.get('RESULT_MAX_REQUEST_BYTES', constants.RESULT_MAX_REQUEST_BYTES)),
+    max_process_bytes=int(os.environ.get('RESULT_MAX_PROCESS_BYTES', constants.RESULT_MAX_PROCESS_BYTES))
+)
+
+
+def _duckdb_executor():
+    connection = duckdb_executor.connect(os.environ.get('DUCKDB_DATABASE', ':memory:'))
+    datasource_repository = InMemoryDataSourceRepository(
+        CachedUserHistoryDefinitionRepository(_app_config_repository))
+    kpi_repository = InMemoryKpiRepository(datasource_repository)
+    for app_id in filter(None, os.environ.get('DUCKDB_SYNTHETIC_APPS', '').split(',')):
+        app = _app_config_repository.from_app_id(app_id.strip())
+        synthetic_data.generate(
+            connection,
+            synthetic_data.synthetic_tables(app, datasource_repository, kpi_repository),
+            date_from=app.app_config.has_data_from('user_history'),
+            date_to=app.app_config.has_data_up_to('user_history'))
+    return duckdb_executor.DuckDbExecutor(
+        connection,
+        threads=os.cpu_count() or 4,
+        memory_budget=_memory_budget
+    )
+
+
+def _backing_bigquery_executor():
+    if _executor_type == 'duckdb':
+        return _duckdb_executor()
+    if not _threaded_executor:
+        return AsyncBigQueryExecutor(
+            project=os.environ.get('GCP_PROJECT_ID'),
+            max_jobs=_admission_scheduler.max_running,
+            memory_budget=_memory_budget,
+            downloader=_result_downloader(),
+            scheduler=_admission_scheduler,
+            registry=_job_registry
+        )
+    return SimpleBigQueryExecutor(
+        project=os.environ.get('GCP_PROJECT_ID'),
+        threads=_admission_scheduler.max_running,
+        memory_budget=_memory_budget,
+        downloader=_result_downloader(),
+        scheduler=_admission_scheduler,
+        registry=_job_registry
+    )
+
+
+_shared_store = shared_store.from_url(os.environ['RESULT_CACHE_SHARED_URL']) \
+    if os.environ.get('RESULT_CACHE_SHARED_URL') else None
+
+
+def _build_result_cache() -> ResultCache:
+    tiers: Dict[str, ResultCache] = {'memory': InMemoryResultCache(
+        max_bytes=int(os.environ.get('RESULT_CACHE_MAX_BYTES', constants.RESULT_CACHE_MAX_BYTES))
+    )}
+    directory = os.environ.get('RESULT_CACHE_DIR')
+    if directory:
+        tiers['disk'] = DiskResultCache(
+            directory=directory,
+            max_bytes=int(os.environ.get('RESULT_CACHE_DISK_MAX_BYTES', constants.RESULT_CACHE_DISK_MAX_BYTES))
+        )
+    if _shared_store is not None:
+        tiers['shared'] = SharedResultCache(
+            store=_shared_store,
+            ttl_seconds=int(os.environ.get('RESULT_CACHE_SHARED_TTL_SECONDS',
+                                           constants.RESULT_CACHE_SHARED_TTL_SECONDS))
+        )
+    if len(tiers) == 1:
+        return tiers['memory']
+    return TieredResultCache(tiers)
+
+
+_result_cache = _build_result_cache()
+
+_chart_response_cache = ChartResponseCache(
+    store=_shared_store or InMemorySharedStore(
+        max_bytes=int(os.environ.get('CHART_RESPONSE_CACHE_MAX_BYTES', constants.CHART_RESPONSE_CACHE_MAX_BYTES))
+    ),
+    ttl_seconds=int(os.environ.get('CHART_RESPONSE_CACHE_TTL_SECONDS', constants.CHART_RESPONSE_CACHE_TTL_SECONDS))
+)
+
+_cancellable_bigquery_executor = CancellableBigQueryExecutor(SingleFlightBigQueryExecutor(_backing_bigquery_executor()))
+_bigquery_executor = CachingBigQueryExecutor(_cancellable_bigquery_executor, _result_cache)
+
+
+def _build_bytes_budget():
+    max_bytes = os.environ.get('CHART_MAX_BYTES')
+    app_max_bytes = _app_values('CHART_MAX_BYTES_APPS', int)
+    if max_bytes is None and not app_max_bytes:
+        return None
+    return BytesBudget(
+        estimator=CachingCostEstimator(DryRunCostEstimator(project=os.environ.get('GCP_PROJECT_ID'))),
+        max_bytes=int(max_bytes) if max_bytes is not None else None,
+        app_max_bytes=app_max_bytes
+    )
+
+
+_bytes_budget = _build_bytes_budget()
+
+# queries of charts are checked against the bytes budget only when they miss the result cache
+_chart_bigquery_executor = _bigquery_executor if _bytes_budget is None else CachingBigQueryExecutor(
+    BytesBudgetBigQueryExecutor(_cancellable_bigquery_executor, _bytes_budget),
+    _result_cache
+)
+
+
+def _build_semantic_layer_pool():
+    processes = int(os.environ.get('SEMANTIC_LAYER_PROCESSES', '0'))
+    if processes <= 0:
+        return None
+    return SemanticLayerPool(
+        processes=processes,
+        min_rows=int(os.environ.get('SEMANTIC_LAYER_POOL_MIN_ROWS', constants.SEMANTIC_LAYER_POOL_MIN_ROWS))
+    )
+
+
+_semantic_layer_pool = _build_semantic_layer_pool()
 
 
 def bigquery_executor() -> Generator:
     yield _bigquery_executor
 
 
+def admission_scheduler() -> Generator:
+    yield _admission_scheduler
+
+
+def job_registry() -> Generator:
+    yield _job_registry
+
+
+def chart_bigquery_executor() -> Generator:
+    yield _chart_bigquery_executor
+
+
+def semantic_layer_pool() -> Generator:
+    yield _semantic_layer_pool
+
+
+def result_cache() -> Generator:
+    yield _result_cache
+
+
+def chart_response_cache() -> Generator:
+    yield _chart_response_cache
+
+
 def app_config_repository() -> Generator:
     yield _app_config_repository
 
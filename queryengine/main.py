@@ -22,22 +22,28 @@ from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
 
 import logging
+from queryengine.api.admission.web import router as admission_router
+from queryengine.api.cache.web import router as cache_router
 from queryengine.api.cancel_query.web import router as cancel_query_router
 from queryengine.api.chart.web import router as chart_router
 from queryengine.api.column_values.web import router as column_values_router
 from queryengine.api.datasource.web import router as datasource_router
 from queryengine.api.healthcheck.web import router as healthcheck_router
+from queryengine.api.jobs.web import router as jobs_router
 from queryengine.api.event_errors.web import router as event_errors_router
 from queryengine.logging.middleware import LoggingMiddleware
 from queryengine.logging.setup_logging import setup_logging
 
 app = FastAPI()
 
+app.include_router(admission_router)
+app.include_router(cache_router)
 app.include_router(cancel_query_router)
 app.include_router(chart_router)
 app.include_router(column_values_router)
 app.include_router(datasource_router)
 app.include_router(healthcheck_router)
+app.include_router(jobs_router)
 app.include_router(event_errors_router)
 
 if os.environ.get('JSON_LOGS', '0') == '1':
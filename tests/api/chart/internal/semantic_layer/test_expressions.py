@@ -14,6 +14,8 @@
 
 from datetime import datetime
 
+import numpy as np
+import pytest
 import pytz
 from pandas import DataFrame
 from pandas.testing import assert_frame_equal
@@ -21,7 +23,7 @@ from pandas.testing import assert_frame_equal
 from queryengine.api.chart.internal.semantic_layer import formula_interpreter
 from queryengine.core import constants
 from queryengine.core.dateinterval import DatetimeInterval
-from queryengine.core.tabular_data_result import TabularDataResult
+from queryengine.core.tabular_data_result import IdentityTable, TabularDataResult
 from queryengine.core.timegrain import TimeGrain
 
 
@@ -163,3 +165,79 @@ def test_simple_expression():
             datetime(2023, 1, 3).replace(tzinfo=pytz.UTC)],
         constants.DATA_COLUMN_ALIAS: [250, 250, 250]
     }), check_like=True)
+
+
+def _values(x_values, y_values):
+    identity = get_identity()
+    return {
+        name: TabularDataResult(DataFrame({
+            constants.X_AXIS_COLUMN_ALIAS: [datetime(2023, 1, day).replace(tzinfo=pytz.UTC) for day in days],
+            constants.DATA_COLUMN_ALIAS: list(days.values())
+        }))
+        for name, days in [('x', x_values), ('y', y_values)]
+    }
+
+
+def test_division_by_zero_and_missing_rows():
+    result = formula_interpreter.evaluate(
+        identity=get_identity(),
+        formula='x / y * 100',
+        values=_values({1: 1, 2: 2}, {1: 4, 2: 0, 3: 5}),
+    )
+
+    assert result.df[constants.DATA_COLUMN_ALIAS].tolist() == [25.0, 0.0, 0.0]
+
+
+def test_formula_is_compiled_once_with_constants_folded():
+    plan = formula_interpreter.compile_formula('x * (2 + 3)')
+
+    assert formula_interpreter.compile_formula('x * (2 + 3)') is plan
+    assert plan.metrics == ['x']
+
+    result = plan.evaluate(get_identity(), _values({1: 1, 2: 2}, {}))
+
+    assert result.df[constants.DATA_COLUMN_ALIAS].tolist() == [5.0, 10.0, 0.0]
+
+
+def test_vectorized_builtin_function(monkeypatch):
+    monkeypatch.setitem(formula_interpreter.builtin_functions, 'greatest', np.maximum)
+
+    result = formula_interpreter.evaluate(
+        identity=get_identity(),
+        formula='GREATEST(x, y) + 1',
+        values=_values({1: 1, 2: 7, 3: 3}, {1: 4, 2: 5, 3: 3}),
+    )
+
+    assert result.df[constants.DATA_COLUMN_ALIAS].tolist() == [5, 8, 4]
+
+
+def test_builtin_function_is_rejected_for_rows_which_cant_be_aligned(monkeypatch):
+    monkeypatch.setitem(formula_interpreter.builtin_functions, 'greatest', np.maximum)
+    values = _values({1: 1, 2: 7}, {1: 4, 2: 5})
+    values['x'] = TabularDataResult(DataFrame({
+        constants.X_AXIS_COLUMN_ALIAS: [datetime(2023, 1, 1).replace(tzinfo=pytz.UTC)] * 2,
+        constants.DATA_COLUMN_ALIAS: [1, 2]
+    }))
+
+    with pytest.raises(ValueError, match='greatest'):
+        formula_interpreter.evaluate(identity=get_identity(), formula='GREATEST(x, y) + 1', values=values)
+
+
+def test_formula_over_identity_table_matches_materialized_rows():
+    identity = IdentityTable.from_date_interval(DatetimeInterval(date_from=datetime(2023, 1, 1),
+                                                                 date_to=datetime(2023, 1, 4)),
+                                                TimeGrain.day, group_by_columns=['g1'], group_by_values=[('a',), ('b',)])
+    days = [datetime(2023, 1, day).replace(tzinfo=pytz.UTC) for day in [1, 2, 3]]
+    values = {
+        'x': TabularDataResult(DataFrame({constants.X_AXIS_COLUMN_ALIAS: days, 'g1': ['a', 'a', 'b'],
+                                          constants.DATA_COLUMN_ALIAS: [np.nan, 2.0, 0.0]})),
+        'y': TabularDataResult(DataFrame({constants.X_AXIS_COLUMN_ALIAS: days, 'g1': ['a', 'a', 'b'],
+                                          constants.DATA_COLUMN_ALIAS: [1.0, 4.0, 0.0]})),
+    }
+
+    for formula in ['x', 'x + y', 'x / y']:
+        sparse = formula_interpreter.evaluate(formula=formula, identity=identity, values=values)
+        dense = formula_interpreter.evaluate(formula=formula, identity=identity.to_result(), values=values)
+
+        assert_frame_equal(sparse.dense().df.reset_index(drop=True), dense.df.reset_index(drop=True))
+        assert_frame_equal(sparse.trim_zeros().df.reset_index(drop=True), dense.trim_zeros().df.reset_index(drop=True))
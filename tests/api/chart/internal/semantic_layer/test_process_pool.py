@@ -0,0 +1,117 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+from datetime import datetime, date
+from multiprocessing import shared_memory
+
+import pytest
+import pytz
+from pandas import DataFrame
+
+from queryengine.api.chart.internal.semantic_layer.process_pool import SemanticLayerPool, SharedTabularDataResults
+from queryengine.api.chart.internal.x_axis_specifics.x_axis_specifics import WarehouseComparedResults
+from queryengine.api.chart.request import ChartQueryDTO
+from queryengine.api.chart.service import ChartQueryService
+from queryengine.core import constants
+from queryengine.core.dateinterval import DateInterval
+from queryengine.core.tabular_data_result import TabularDataResult, TabularDataResults
+
+
+@pytest.fixture(scope='module')
+def semantic_layer_pool() -> SemanticLayerPool:
+    pool = SemanticLayerPool(processes=2, min_rows=0)
+    yield pool
+    pool.shutdown()
+
+
+def _results(days: int, offset: int) -> TabularDataResults:
+    return TabularDataResults({
+        'x': TabularDataResult(DataFrame({
+            constants.X_AXIS_COLUMN_ALIAS: [datetime(2022, 1, 1 + day).replace(tzinfo=pytz.UTC)
+                                            for day in range(days) for _ in range(3)],
+            'g1': ['a', 'b', None] * days,
+            constants.DATA_COLUMN_ALIAS: [float(offset + i) for i in range(3 * days)]
+        })),
+    })
+
+
+def test_shared_tabular_data_results():
+    results = _results(days=3, offset=0)
+    shared_results = SharedTabularDataResults.write(results)
+
+    read_results = shared_results.read()
+
+    assert read_results.results_map.keys() == results.results_map.keys()
+    assert read_results.results_map['x'].df.equals(results.results_map['x'].df)
+    shared_results.unlink()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=shared_results.blocks['x'][0])
+
+
+def test_compare_is_built_in_parallel_without_group_by(
+        app_config_repository, datasource_repository, kpi_repository, warehouse, semantic_layer_pool):
+    query_dto = ChartQueryDTO(
+        page_id='page_id',
+        request_id='request_id',
+        kpi_id='user_history.daily_single',
+        date_interval=DateInterval(date(2022, 1, 10), date(2022, 1, 12)),
+        compare_date_interval=DateInterval(date(2022, 1, 3), date(2022, 1, 5)),
+        column_filters=[],
+        column_group_bys=[],
+        x_axis_column_id='user_history.date_'
+    )
+
+    expected = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                             warehouse).execute('app', query_dto))
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                                 warehouse, semantic_layer_pool).execute('app', query_dto))
+
+    assert chart_result.compare_period_chart_points
+    assert chart_result == expected
+
+
+def test_compare_is_filtered_by_group_by_values_of_result(
+        app_config_repository, datasource_repository, kpi_repository, queued_data_warehouse, semantic_layer_pool):
+    query_dto = ChartQueryDTO(
+        page_id='page_id',
+        request_id='request_id',
+        kpi_id='user_history.daily_single',
+        date_interval=DateInterval(date(2022, 1, 10), date(2022, 1, 11)),
+        compare_date_interval=DateInterval(date(2022, 1, 1), date(2022, 1, 2)),
+        column_filters=[],
+        group_by_limit=1,
+        column_group_bys=['user_history.up_string'],
+        x_axis_column_id='user_history.date_'
+    )
+
+    def execute(pool: SemanticLayerPool | None):
+        queued_data_warehouse.enqueue_data(_results(days=2, offset=0).map_x_axis(lambda x: x.apply(
+            lambda dt: dt.replace(day=dt.day + 9))))
+        queued_data_warehouse.enqueue_data(_results(days=2, offset=10))
+        return asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                             queued_data_warehouse, pool).execute('app', query_dto))
+
+    expected = execute(None)
+    chart_result = execute(semantic_layer_pool)
+
+    assert chart_result.compare_period_chart_points
+    assert chart_result == expected
+
+
+def test_small_charts_are_not_offloaded():
+    pool = SemanticLayerPool(processes=1, min_rows=10)
+
+    assert not pool.offloads(WarehouseComparedResults(_results(days=3, offset=0), None, None))
+    assert pool.offloads(WarehouseComparedResults(_results(days=3, offset=0), _results(days=1, offset=0), None))
+    pool.shutdown()
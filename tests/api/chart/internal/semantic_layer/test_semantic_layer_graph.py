@@ -0,0 +1,98 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from datetime import datetime, date
+
+import pytz
+from pandas import DataFrame
+
+from queryengine.api.chart.internal.semantic_layer.kpi_chart_result import KpiChartQueryResult
+from queryengine.api.chart.internal.semantic_layer.semantic_layer_graph import SemanticLayerGraph
+from queryengine.api.chart.request import ChartQueryDTO
+from queryengine.api.chart.service import ChartQueryService
+from queryengine.core import constants
+from queryengine.core.dateinterval import DateInterval
+from queryengine.core.tabular_data_result import TabularDataResult, TabularDataResults
+
+
+def _query(app_config_repository, datasource_repository, kpi_repository, warehouse):
+    service = ChartQueryService(app_config_repository, datasource_repository, kpi_repository, warehouse)
+    return service.load_query('app', ChartQueryDTO(
+        page_id='page_id',
+        request_id='request_id',
+        kpi_id='user_history.daily_single',
+        date_interval=DateInterval(date(2022, 1, 10), date(2022, 1, 11)),
+        column_filters=[],
+        group_by_limit=1,
+        column_group_bys=['user_history.up_string'],
+        x_axis_column_id='user_history.date_'
+    ))
+
+
+def _results(values):
+    return TabularDataResults({
+        'x': TabularDataResult(DataFrame({
+            constants.X_AXIS_COLUMN_ALIAS: [
+                datetime(2022, 1, 10).replace(tzinfo=pytz.UTC),
+                datetime(2022, 1, 10).replace(tzinfo=pytz.UTC),
+                datetime(2022, 1, 11).replace(tzinfo=pytz.UTC),
+                datetime(2022, 1, 11).replace(tzinfo=pytz.UTC),
+            ],
+            'g1': ['a', 'b', 'a', 'b'],
+            constants.DATA_COLUMN_ALIAS: values
+        })),
+    })
+
+
+def test_ranking_results_are_reused_without_sort_by(app_config_repository, datasource_repository, kpi_repository,
+                                                    warehouse):
+    query = _query(app_config_repository, datasource_repository, kpi_repository, warehouse)
+    graph = SemanticLayerGraph(query)
+    calls = []
+    get_semantic_layer_result = graph.x_axis_specifics.get_semantic_layer_result
+
+    def counting_get_semantic_layer_result(*args):
+        calls.append(args)
+        return get_semantic_layer_result(*args)
+    graph.x_axis_specifics.get_semantic_layer_result = counting_get_semantic_layer_result
+
+    kpi_result = KpiChartQueryResult.build_from_result(query, _results([0, 1, 2, 3]), None, graph)
+
+    assert len(calls) == 1
+    assert set(kpi_result.result.group_by_values()) == {('b',)}
+    assert kpi_result.result.df[constants.DATA_COLUMN_ALIAS].tolist() == [1, 3]
+    assert kpi_result.single_total.df[constants.DATA_COLUMN_ALIAS].tolist() == [4]
+
+
+def test_identity_is_shared_by_results_with_same_group_by_values(app_config_repository, datasource_repository,
+                                                                 kpi_repository, warehouse):
+    query = _query(app_config_repository, datasource_repository, kpi_repository, warehouse)
+    graph = SemanticLayerGraph(query)
+
+    identity = graph.identity(query.date_interval, _results([0, 1, 2, 3]))
+
+    assert graph.identity(query.date_interval, _results([4, 5, 6, 7])) is identity
+    assert graph.hits == 1
+
+
+def test_shared_nodes_are_not_modified_by_filtering(app_config_repository, datasource_repository, kpi_repository,
+                                                    warehouse):
+    query = _query(app_config_repository, datasource_repository, kpi_repository, warehouse)
+    graph = SemanticLayerGraph(query)
+    results = _results([0, 1, 2, 3])
+
+    KpiChartQueryResult.build_from_result(query, results, None, graph)
+
+    assert graph.rollups(query.kpi, query.date_interval, results).group_by_values() == {('a',), ('b',)}
+    assert set(graph.result(query.kpi, query.date_interval, results).dense().group_by_values()) == {('a',), ('b',)}
@@ -40,10 +40,6 @@ def test_simple_event_aggregation_load_dataset(datasource_repository, kpi_reposi
     ).to_warehouse_query()
     assert query_builder.build(query)['x'].sql == """WITH base AS (
 SELECT *
-FROM `app_raw.login`
-WHERE `app_raw.login`.`date_` BETWEEN DATE '2022-01-01' AND DATE '2023-01-01'
- UNION ALL
-SELECT *
 FROM `app_load.login`
 WHERE `app_load.login`.`date_` > DATE '2023-01-01' AND `app_load.login`.`sandbox_mode` IS NOT TRUE
 )
@@ -75,10 +71,6 @@ def test_simple_event_aggregation_raw_dataset(datasource_repository, kpi_reposit
 SELECT *
 FROM `app_raw.login`
 WHERE `app_raw.login`.`date_` BETWEEN DATE '2022-01-01' AND DATE '2023-01-01'
- UNION ALL
-SELECT *
-FROM `app_load.login`
-WHERE `app_load.login`.`date_` > DATE '2023-01-01' AND `app_load.login`.`sandbox_mode` IS NOT TRUE
 )
 SELECT DATE_TRUNC(`base`.`event_tstamp`, DAY) AS x_axis, SUM(`base`.`params`.`internal_num`) AS value
 FROM `base`
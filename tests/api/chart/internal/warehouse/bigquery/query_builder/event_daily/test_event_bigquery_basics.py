@@ -43,10 +43,6 @@ def test_simple_event_aggregation(datasource_repository, kpi_repository, app_con
 SELECT *
 FROM `app_raw.login`
 WHERE `app_raw.login`.`date_` BETWEEN DATE '2022-01-01' AND DATE '2023-01-01'
- UNION ALL
-SELECT *
-FROM `app_load.login`
-WHERE `app_load.login`.`date_` > DATE '2023-01-01' AND `app_load.login`.`sandbox_mode` IS NOT TRUE
 )
 SELECT DATE_TRUNC(`base`.`event_tstamp`, DAY) AS x_axis, SUM(`base`.`params`.`internal_num`) AS value
 FROM `base`
@@ -81,10 +77,6 @@ def test_single_event_parameter_and_group_by(datasource_repository, kpi_reposito
 SELECT *
 FROM `app_raw.login`
 WHERE `app_raw.login`.`date_` BETWEEN DATE '2022-01-01' AND DATE '2023-01-01'
- UNION ALL
-SELECT *
-FROM `app_load.login`
-WHERE `app_load.login`.`date_` > DATE '2023-01-01' AND `app_load.login`.`sandbox_mode` IS NOT TRUE
 )
 SELECT DATE_TRUNC(`base`.`event_tstamp`, DAY) AS x_axis, `base`.`params`.`internal_num` AS group_by_1, SUM(`base`.`params`.`internal_num`) AS value
 FROM `base`
@@ -127,10 +119,6 @@ def test_multiple_event_parameter_and_group_by(datasource_repository, kpi_reposi
 SELECT *
 FROM `app_raw.login`
 WHERE `app_raw.login`.`date_` BETWEEN DATE '2022-01-01' AND DATE '2023-01-01'
- UNION ALL
-SELECT *
-FROM `app_load.login`
-WHERE `app_load.login`.`date_` > DATE '2023-01-01' AND `app_load.login`.`sandbox_mode` IS NOT TRUE
 )
 SELECT DATE_TRUNC(`base`.`event_tstamp`, DAY) AS x_axis, `base`.`params`.`internal_num` AS group_by_1, `base`.`num` AS group_by_2, SUM(`base`.`params`.`internal_num`) AS value
 FROM `base`
@@ -166,10 +154,6 @@ def test_single_user_parameter_and_group_by(datasource_repository, kpi_repositor
 SELECT *
 FROM `app_raw.login`
 WHERE `app_raw.login`.`date_` BETWEEN DATE '2022-01-01' AND DATE '2023-01-01'
- UNION ALL
-SELECT *
-FROM `app_load.login`
-WHERE `app_load.login`.`date_` > DATE '2023-01-01' AND `app_load.login`.`sandbox_mode` IS NOT TRUE
 )
 SELECT DATE_TRUNC(`base`.`event_tstamp`, DAY) AS x_axis, `app_main.v_user_history_daily`.`up_string` AS group_by_1, SUM(`base`.`params`.`internal_num`) AS value
 FROM `base`
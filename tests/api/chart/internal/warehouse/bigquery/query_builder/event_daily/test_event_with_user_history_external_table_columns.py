@@ -55,10 +55,6 @@ base AS (
 SELECT *
 FROM `app_raw.login`
 WHERE `app_raw.login`.`date_` BETWEEN DATE '2022-01-01' AND DATE '2023-01-01'
- UNION ALL
-SELECT *
-FROM `app_load.login`
-WHERE `app_load.login`.`date_` > DATE '2023-01-01' AND `app_load.login`.`sandbox_mode` IS NOT TRUE
 )
 SELECT DATE_TRUNC(`base`.`event_tstamp`, DAY) AS x_axis, SUM(`base`.`params`.`internal_num`) AS value
 FROM `base`
@@ -97,10 +93,6 @@ base AS (
 SELECT *
 FROM `app_raw.login`
 WHERE `app_raw.login`.`date_` BETWEEN DATE '2022-01-01' AND DATE '2023-01-01'
- UNION ALL
-SELECT *
-FROM `app_load.login`
-WHERE `app_load.login`.`date_` > DATE '2023-01-01' AND `app_load.login`.`sandbox_mode` IS NOT TRUE
 )
 SELECT DATE_TRUNC(`base`.`event_tstamp`, DAY) AS x_axis, COALESCE(`_external_app_raw_purchase_dc7bd85092`.`ext_int_materialized`, 0) AS group_by_1, SUM(`base`.`params`.`internal_num`) AS value
 FROM `base`
@@ -144,10 +136,6 @@ base AS (
 SELECT *
 FROM `app_raw.login`
 WHERE `app_raw.login`.`date_` BETWEEN DATE '2022-01-01' AND DATE '2023-01-01'
- UNION ALL
-SELECT *
-FROM `app_load.login`
-WHERE `app_load.login`.`date_` > DATE '2023-01-01' AND `app_load.login`.`sandbox_mode` IS NOT TRUE
 )
 SELECT DATE_TRUNC(`base`.`event_tstamp`, DAY) AS x_axis, COALESCE(`_external_app_raw_purchase_dc7bd85092`.`ext_int_materialized`, 0) AS group_by_1, `_external_app_raw_purchase`.`ext_int` AS group_by_2, SUM(`base`.`params`.`internal_num`) AS value
 FROM `base`
@@ -0,0 +1,95 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from datetime import datetime
+
+from pandas import DataFrame
+
+from queryengine.api.chart.internal.domain import ChartQuery
+from queryengine.api.chart.internal.warehouse.bigquery.query_builder import query_builder
+from queryengine.core import constants
+from queryengine.core.bigquery.admission import QueryPriority
+from queryengine.core.datasource.datasource import ColumnReference
+from queryengine.core.dateinterval import DatetimeInterval
+from queryengine.core.tabular_data_result import TabularDataResult
+from queryengine.core.timegrain import TimeGrain
+
+
+def _query(datasource_repository, kpi_repository, app_config_repository, kpi_id: str):
+    app = app_config_repository.from_app_id('app')
+    datasource = datasource_repository.load_datasource_by_id(app, 'user_history')
+    return ChartQuery(
+        app=app,
+        page_id="page",
+        request_id="request",
+        datasource=datasource,
+        kpi=kpi_repository.load_by_datasource_id(app, datasource.id)[kpi_id],
+        column_filters=[],
+        column_group_bys=[],
+        time_grain=TimeGrain.day,
+        date_interval=DatetimeInterval(date_from=datetime(2022, 9, 1), date_to=datetime(2022, 9, 5)),
+        compare_interval=None,
+        x_axis_column=ColumnReference(datasource, constants.DATE_PARTITION_COLUMN_NAME)
+    ).to_warehouse_query()
+
+
+def test_metrics_with_same_table_are_fused(datasource_repository, kpi_repository, app_config_repository):
+    query = _query(datasource_repository, kpi_repository, app_config_repository, 'daily_fused')
+    scans = query_builder.build_scans(query)
+
+    assert len(scans) == 1
+    assert scans[0].query.sql == """SELECT TIMESTAMP(`app_main.user_history_daily`.`date_`) AS x_axis, SUM(`app_main.user_history_daily`.`up_int`) AS value_1, SUM(IF(`app_main.user_history_daily`.`up_string` = 'a', `app_main.user_history_daily`.`up_int`, NULL)) AS value_2, COUNTIF(`app_main.user_history_daily`.`up_string` = 'a') AS rows_2, COUNTIF(`app_main.user_history_daily`.`up_int` > 0) AS value_3
+FROM `app_main.user_history_daily`
+WHERE (`app_main.user_history_daily`.`date_` BETWEEN DATE '2022-09-01' AND DATE '2022-09-05')
+GROUP BY x_axis
+ORDER BY x_axis"""
+    assert set(query_builder.build(query).keys()) == {'x', 'y', 'z'}
+
+
+def test_scans_keep_priority_of_query(datasource_repository, kpi_repository, app_config_repository):
+    query = _query(datasource_repository, kpi_repository, app_config_repository, 'daily_fused')
+    query.priority = QueryPriority.background
+
+    assert [scan.query.priority for scan in query_builder.build_scans(query)] == [QueryPriority.background]
+
+
+def test_single_metric_keeps_where_clause(datasource_repository, kpi_repository, app_config_repository):
+    query = _query(datasource_repository, kpi_repository, app_config_repository, 'daily_single_filter')
+    scans = query_builder.build_scans(query)
+
+    assert len(scans) == 1
+    assert "WHERE (`app_main.user_history`.`date_` BETWEEN DATE '2022-09-01' AND DATE '2022-09-05') " \
+           "AND `app_main.user_history`.`up_string` = 'a'" in scans[0].query.sql.replace('\n', ' ')
+
+
+def test_fused_result_is_split_by_metric(datasource_repository, kpi_repository, app_config_repository):
+    query = _query(datasource_repository, kpi_repository, app_config_repository, 'daily_fused')
+    scan = query_builder.build_scans(query)[0]
+    result = TabularDataResult(DataFrame({
+        constants.X_AXIS_COLUMN_ALIAS: [1, 2, 3],
+        'value_1': [10, 20, 30],
+        'value_2': [None, 5, 6],
+        'rows_2': [0, 1, 2],
+        'value_3': [1, 0, 2],
+    }))
+
+    x = scan.metric_result('x', result).df
+    y = scan.metric_result('y', result).df
+    z = scan.metric_result('z', result).df
+
+    assert list(x.columns) == [constants.X_AXIS_COLUMN_ALIAS, constants.DATA_COLUMN_ALIAS]
+    assert x[constants.DATA_COLUMN_ALIAS].tolist() == [10, 20, 30]
+    assert y[constants.X_AXIS_COLUMN_ALIAS].tolist() == [2, 3]
+    assert y[constants.DATA_COLUMN_ALIAS].tolist() == [5, 6]
+    assert z[constants.X_AXIS_COLUMN_ALIAS].tolist() == [1, 3]
@@ -0,0 +1,148 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from datetime import datetime
+
+from pandas import DataFrame
+
+from queryengine.api.chart.internal.domain import ChartQuery
+from queryengine.api.chart.internal.warehouse.bigquery.query_builder import query_planner
+from queryengine.api.chart.internal.x_axis_specifics.cohort_day.specifics import CohortDaySpecifics
+from queryengine.core import constants
+from queryengine.core.bigquery.queryexecutor import _build_labels
+from queryengine.core.datasource.datasource import ColumnReference
+from queryengine.core.dateinterval import DatetimeInterval
+from queryengine.core.tabular_data_result import TabularDataResult
+from queryengine.core.timegrain import TimeGrain
+
+
+def _chart_query(datasource_repository, kpi_repository, app_config_repository, kpi_id: str, x_axis: str,
+                 compare_interval: DatetimeInterval | None, sort_by_kpi_id: str | None = None):
+    app = app_config_repository.from_app_id('app')
+    datasource = datasource_repository.load_datasource_by_id(app, 'user_history')
+    kpis = kpi_repository.load_by_datasource_id(app, datasource.id)
+    return ChartQuery(
+        app=app,
+        page_id="page",
+        request_id="request",
+        datasource=datasource,
+        kpi=kpis[kpi_id],
+        column_filters=[],
+        column_group_bys=[],
+        time_grain=TimeGrain.day,
+        date_interval=DatetimeInterval(date_from=datetime(2022, 9, 1), date_to=datetime(2022, 9, 5)),
+        compare_interval=compare_interval,
+        x_axis_column=ColumnReference(datasource, x_axis),
+        sort_by_datasource=datasource if sort_by_kpi_id else None,
+        sort_by_kpi=kpis[sort_by_kpi_id] if sort_by_kpi_id else None
+    )
+
+
+def test_main_compare_and_sort_by_share_scan(datasource_repository, kpi_repository, app_config_repository):
+    query = _chart_query(datasource_repository, kpi_repository, app_config_repository, 'daily_single_optimized',
+                         constants.DATE_PARTITION_COLUMN_NAME,
+                         DatetimeInterval(date_from=datetime(2022, 8, 27), date_to=datetime(2022, 8, 31)),
+                         'daily_fused')
+
+    planned_metrics = query_planner.plan({
+        'main': query.to_warehouse_query(),
+        'sort_by': query.to_sort_by_warehouse_query(),
+        'compare': query.to_compare_warehouse_query()
+    })
+
+    assert len({id(planned_metric.scan) for planned_metric in planned_metrics}) == 1
+    assert planned_metrics[0].scan.metric_columns['main.x'] == planned_metrics[-1].scan.metric_columns['compare.x']
+    assert [(m.query_name, m.metric_id, m.period) for m in planned_metrics] == [
+        ('main', 'x', 'main'), ('sort_by', 'x', 'main'), ('sort_by', 'y', 'main'), ('sort_by', 'z', 'main'),
+        ('compare', 'x', 'compare')
+    ]
+    assert planned_metrics[0].scan.query.sql == """SELECT TIMESTAMP(`app_main.user_history_daily`.`date_`) AS x_axis, CASE WHEN ((`app_main.user_history_daily`.`date_` BETWEEN DATE '2022-09-01' AND DATE '2022-09-05')) THEN 'main' WHEN ((`app_main.user_history_daily`.`date_` BETWEEN DATE '2022-08-27' AND DATE '2022-08-31')) THEN 'compare' END AS period, SUM(`app_main.user_history_daily`.`up_int`) AS value_1, SUM(IF(`app_main.user_history_daily`.`up_string` = 'a', `app_main.user_history_daily`.`up_int`, NULL)) AS value_2, COUNTIF(`app_main.user_history_daily`.`up_string` = 'a') AS rows_2, COUNTIF(`app_main.user_history_daily`.`up_int` > 0) AS value_3
+FROM `app_main.user_history_daily`
+WHERE (((`app_main.user_history_daily`.`date_` BETWEEN DATE '2022-09-01' AND DATE '2022-09-05')) OR ((`app_main.user_history_daily`.`date_` BETWEEN DATE '2022-08-27' AND DATE '2022-08-31')))
+GROUP BY x_axis, period
+ORDER BY x_axis"""
+
+
+def test_labels_of_fused_scan_fit_bigquery_limits(datasource_repository, kpi_repository, app_config_repository):
+    query = _chart_query(datasource_repository, kpi_repository, app_config_repository, 'daily_single_optimized',
+                         constants.DATE_PARTITION_COLUMN_NAME,
+                         DatetimeInterval(date_from=datetime(2022, 8, 27), date_to=datetime(2022, 8, 31)),
+                         'daily_fused')
+
+    scan_query = query_planner.plan({
+        'main': query.to_warehouse_query(),
+        'sort_by': query.to_sort_by_warehouse_query(),
+        'compare': query.to_compare_warehouse_query()
+    })[0].scan.query
+    labels = _build_labels(scan_query)
+
+    assert len(scan_query.metric_id) > 63
+    assert all(len(value) <= 63 for value in labels.values())
+    assert labels['metric_id'].startswith('user_history_user_history_daily_')
+
+
+def test_overlapping_periods_are_not_merged(datasource_repository, kpi_repository, app_config_repository):
+    query = _chart_query(datasource_repository, kpi_repository, app_config_repository, 'daily_single_optimized',
+                         constants.DATE_PARTITION_COLUMN_NAME,
+                         DatetimeInterval(date_from=datetime(2022, 8, 29), date_to=datetime(2022, 9, 2)))
+
+    planned_metrics = query_planner.plan({
+        'main': query.to_warehouse_query(),
+        'compare': query.to_compare_warehouse_query()
+    })
+
+    assert len({id(planned_metric.scan) for planned_metric in planned_metrics}) == 2
+    assert all(planned_metric.period is None for planned_metric in planned_metrics)
+
+
+def test_cohort_periods_are_told_apart_by_registration_date(datasource_repository, kpi_repository,
+                                                            app_config_repository):
+    query = _chart_query(datasource_repository, kpi_repository, app_config_repository, 'cohort_single_optimized',
+                         constants.COHORT_DAY_COLUMN_NAME,
+                         DatetimeInterval(date_from=datetime(2022, 8, 27), date_to=datetime(2022, 8, 31)))
+    specifics = CohortDaySpecifics()
+
+    planned_metrics = query_planner.plan({
+        'main': specifics._preprocess_warehouse_query(query.to_warehouse_query()),
+        'compare': specifics._preprocess_warehouse_query(query.to_compare_warehouse_query())
+    })
+
+    assert len({id(planned_metric.scan) for planned_metric in planned_metrics}) == 1
+    assert planned_metrics[0].scan.query.sql == """SELECT `app_main.user_history_daily`.`cohort_day` AS x_axis, CASE WHEN ((`app_main.user_history_daily`.`date_` BETWEEN DATE '2022-09-01' AND DATE '2022-09-10') AND `app_main.user_history_daily`.`registration_date` BETWEEN DATE '2022-09-01' AND DATE '2022-09-05') THEN 'main' WHEN ((`app_main.user_history_daily`.`date_` BETWEEN DATE '2022-08-27' AND DATE '2022-09-05') AND `app_main.user_history_daily`.`registration_date` BETWEEN DATE '2022-08-27' AND DATE '2022-08-31') THEN 'compare' END AS period, SUM(`app_main.user_history_daily`.`up_int`) AS value
+FROM `app_main.user_history_daily`
+WHERE (((`app_main.user_history_daily`.`date_` BETWEEN DATE '2022-09-01' AND DATE '2022-09-10') AND `app_main.user_history_daily`.`registration_date` BETWEEN DATE '2022-09-01' AND DATE '2022-09-05') OR ((`app_main.user_history_daily`.`date_` BETWEEN DATE '2022-08-27' AND DATE '2022-09-05') AND `app_main.user_history_daily`.`registration_date` BETWEEN DATE '2022-08-27' AND DATE '2022-08-31'))
+GROUP BY x_axis, period
+ORDER BY x_axis"""
+
+
+def test_merged_result_is_split_by_period(datasource_repository, kpi_repository, app_config_repository):
+    query = _chart_query(datasource_repository, kpi_repository, app_config_repository, 'daily_single_optimized',
+                         constants.DATE_PARTITION_COLUMN_NAME,
+                         DatetimeInterval(date_from=datetime(2022, 8, 27), date_to=datetime(2022, 8, 31)))
+    main, compare = query_planner.plan({
+        'main': query.to_warehouse_query(),
+        'compare': query.to_compare_warehouse_query()
+    })
+    result = TabularDataResult(DataFrame({
+        constants.X_AXIS_COLUMN_ALIAS: [1, 2, 3],
+        constants.PERIOD_COLUMN_ALIAS: ['compare', 'main', 'main'],
+        constants.DATA_COLUMN_ALIAS: [10, 20, 30],
+    }))
+
+    main_df = main.scan.metric_result(main.scan_metric_id, result, main.period).df
+    compare_df = compare.scan.metric_result(compare.scan_metric_id, result, compare.period).df
+
+    assert list(main_df.columns) == [constants.X_AXIS_COLUMN_ALIAS, constants.DATA_COLUMN_ALIAS]
+    assert main_df[constants.DATA_COLUMN_ALIAS].tolist() == [20, 30]
+    assert compare_df[constants.DATA_COLUMN_ALIAS].tolist() == [10]
@@ -0,0 +1,189 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import dataclasses
+import threading
+from datetime import datetime, timedelta
+from typing import Dict
+
+from pandas import DataFrame
+
+from queryengine.api.chart.internal.domain import ChartQuery, WarehouseChartQuery
+from queryengine.api.chart.internal.warehouse.partition_cache import PartitionCachingWarehouse
+from queryengine.api.chart.internal.warehouse.warehouse import Warehouse
+from queryengine.core import constants
+from queryengine.core.bigquery.result_cache import InMemoryResultCache
+from queryengine.core.datasource.datasource import ColumnReference
+from queryengine.core.dateinterval import DatetimeInterval
+from queryengine.core.tabular_data_result import TabularDataResult, TabularDataResults
+from queryengine.core.timegrain import TimeGrain
+from queryengine.core.warehouse import FutureResult
+from tests.api.chart.internal.warehouse.warehouse_mock import TestFutureResult
+
+
+class DailyTestWarehouse(Warehouse):
+    """
+    Returns a row per day, valued by day of the month, except for days without data.
+    """
+    def __init__(self, days_without_data=()):
+        self.days_without_data = set(days_without_data)
+        self.submitted_intervals = []
+
+    async def submit_query(self, query: WarehouseChartQuery) -> FutureResult:
+        self.submitted_intervals.append([(i.date_from.date(), i.date_to.date()) for i in query.date_intervals])
+        days = [i.date_from + timedelta(days=d) for i in query.date_intervals for d in range(i.days())]
+        days = [day for day in days if day.date() not in self.days_without_data]
+        results = TabularDataResults()
+        for metric_id in query.metrics:
+            results.add(metric_id, TabularDataResult(DataFrame({
+                constants.X_AXIS_COLUMN_ALIAS: days,
+                constants.DATA_COLUMN_ALIAS: [float(day.day) for day in days]
+            })))
+        return TestFutureResult(results)
+
+
+class ThreadRecordingResultCache(InMemoryResultCache):
+    def __init__(self):
+        super().__init__(max_bytes=1024 * 1024)
+        self.threads = set()
+
+    def get_many(self, keys):
+        self.threads.add(threading.get_ident())
+        return super().get_many(keys)
+
+    def put(self, key, result):
+        self.threads.add(threading.get_ident())
+        super().put(key, result)
+
+
+def _query(app_config_repository, datasource_repository, kpi_repository, datasource_id, kpi_id, date_from, date_to,
+           time_grain=TimeGrain.day) -> WarehouseChartQuery:
+    app = app_config_repository.from_app_id('app')
+    datasource = datasource_repository.load_datasource_by_id(app, datasource_id)
+    return ChartQuery(
+        app=app,
+        page_id='page',
+        request_id='request',
+        datasource=datasource,
+        kpi=kpi_repository.load_by_datasource_id(app, datasource.id)[kpi_id],
+        time_grain=time_grain,
+        date_interval=DatetimeInterval(date_from, date_to),
+        compare_interval=None,
+        x_axis_column=ColumnReference(datasource, constants.DATE_PARTITION_COLUMN_NAME)
+    ).to_warehouse_query()
+
+
+def _submit(warehouse: Warehouse, queries: Dict[str, WarehouseChartQuery]) -> Dict[str, TabularDataResults]:
+    async def run():
+        futures = await warehouse.submit_queries(queries)
+        return {name: await future.get() for name, future in futures.items()}
+    return asyncio.run(run())
+
+
+def test_only_missing_days_are_queried(app_config_repository, datasource_repository, kpi_repository):
+    backing = DailyTestWarehouse(days_without_data=[datetime(2022, 1, 11).date()])
+    warehouse = PartitionCachingWarehouse(backing, InMemoryResultCache(max_bytes=1024 * 1024))
+
+    def query(date_from, date_to):
+        return _query(app_config_repository, datasource_repository, kpi_repository, 'user_history', 'daily_single',
+                      date_from, date_to)
+
+    _submit(warehouse, {'main': query(datetime(2022, 1, 10), datetime(2022, 1, 12))})
+    results = _submit(warehouse, {'main': query(datetime(2022, 1, 8), datetime(2022, 1, 14))})
+
+    assert backing.submitted_intervals == [
+        [(datetime(2022, 1, 10).date(), datetime(2022, 1, 12).date())],
+        [(datetime(2022, 1, 8).date(), datetime(2022, 1, 9).date()),
+         (datetime(2022, 1, 13).date(), datetime(2022, 1, 14).date())],
+    ]
+    assert list(results['main'].results_map['x'].df[constants.DATA_COLUMN_ALIAS]) == [8.0, 9.0, 10.0, 12.0, 13.0, 14.0]
+
+
+def test_cached_days_are_not_queried(app_config_repository, datasource_repository, kpi_repository):
+    backing = DailyTestWarehouse()
+    warehouse = PartitionCachingWarehouse(backing, InMemoryResultCache(max_bytes=1024 * 1024))
+    query = _query(app_config_repository, datasource_repository, kpi_repository, 'user_history', 'daily_single',
+                   datetime(2022, 1, 10), datetime(2022, 1, 12))
+
+    first = _submit(warehouse, {'main': query})
+    second = _submit(warehouse, {'main': query})
+
+    assert len(backing.submitted_intervals) == 1
+    assert second['main'].results_map['x'] == first['main'].results_map['x']
+
+
+def test_closed_event_partitions_are_not_queried(app_config_repository, datasource_repository, kpi_repository):
+    backing = DailyTestWarehouse()
+    warehouse = PartitionCachingWarehouse(backing, InMemoryResultCache(max_bytes=1024 * 1024))
+    query = _query(app_config_repository, datasource_repository, kpi_repository, 'events_login',
+                   'sum_params.internal_num', datetime(2022, 1, 10), datetime(2022, 1, 12), TimeGrain.min15)
+
+    _submit(warehouse, {'main': query})
+    _submit(warehouse, {'main': query})
+
+    assert len(backing.submitted_intervals) == 1
+
+
+def test_open_event_partitions_are_always_queried(app_config_repository, datasource_repository, kpi_repository):
+    backing = DailyTestWarehouse()
+    warehouse = PartitionCachingWarehouse(backing, InMemoryResultCache(max_bytes=1024 * 1024))
+    today = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    query = _query(app_config_repository, datasource_repository, kpi_repository, 'events_login',
+                   'sum_params.internal_num', today - timedelta(days=6), today, TimeGrain.min15)
+
+    _submit(warehouse, {'main': query})
+    results = _submit(warehouse, {'main': query})
+
+    closed_until = query.datasource.closed_until()
+    assert backing.submitted_intervals[1] == [(closed_until + timedelta(days=1), today.date())]
+    assert len(results['main'].results_map['x'].df) == 7
+
+
+def test_time_grain_of_event_queries_is_part_of_shape(app_config_repository, datasource_repository,
+                                                      kpi_repository):
+    backing = DailyTestWarehouse()
+    warehouse = PartitionCachingWarehouse(backing, InMemoryResultCache(max_bytes=1024 * 1024))
+    for time_grain in [TimeGrain.min15, TimeGrain.hour]:
+        _submit(warehouse, {'main': _query(app_config_repository, datasource_repository, kpi_repository,
+                                           'events_login', 'sum_params.internal_num', datetime(2022, 1, 10),
+                                           datetime(2022, 1, 12), time_grain)})
+
+    assert len(backing.submitted_intervals) == 2
+
+
+def test_days_after_watermark_are_always_queried(app_config_repository, datasource_repository, kpi_repository):
+    backing = DailyTestWarehouse()
+    warehouse = PartitionCachingWarehouse(backing, InMemoryResultCache(max_bytes=1024 * 1024))
+    query = _query(app_config_repository, datasource_repository, kpi_repository, 'user_history', 'daily_single',
+                   datetime(2022, 12, 30), datetime(2022, 12, 31))
+    # chart queries are clamped to data availability, but the watermark may move between building and submitting
+    query = dataclasses.replace(query, date_intervals=[DatetimeInterval(datetime(2022, 12, 30), datetime(2023, 1, 3))])
+
+    _submit(warehouse, {'main': query})
+    results = _submit(warehouse, {'main': query})
+
+    assert backing.submitted_intervals[1] == [(datetime(2023, 1, 2).date(), datetime(2023, 1, 3).date())]
+    assert list(results['main'].results_map['x'].df[constants.DATA_COLUMN_ALIAS]) == [30.0, 31.0, 1.0, 2.0, 3.0]
+
+
+def test_cache_is_not_reached_on_event_loop(app_config_repository, datasource_repository, kpi_repository):
+    cache = ThreadRecordingResultCache()
+    warehouse = PartitionCachingWarehouse(DailyTestWarehouse(), cache)
+    query = _query(app_config_repository, datasource_repository, kpi_repository, 'user_history', 'daily_single',
+                   datetime(2022, 1, 10), datetime(2022, 1, 12))
+
+    _submit(warehouse, {'main': query})
+
+    assert cache.threads and threading.get_ident() not in cache.threads
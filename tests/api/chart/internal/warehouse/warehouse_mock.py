@@ -29,12 +29,12 @@ class TestFutureResult(FutureResult):
     def __init__(self, result):
         self._result = result
 
-    def get(self) -> TabularDataResults:
+    async def get(self) -> TabularDataResults:
         return self._result
 
 
 class MissingDataTestWarehouse(Warehouse):
-    def submit_query(self, query: WarehouseChartQuery) -> FutureResult:
+    async def submit_query(self, query: WarehouseChartQuery) -> FutureResult:
         results = TabularDataResults()
         for metric_id, metric in query.metrics.items():
             results.add(metric_id, TabularDataResult(DataFrame({
@@ -51,12 +51,12 @@ class QueuedDataTestWarehouse(Warehouse):
     def enqueue_data(self, results: TabularDataResults):
         self._data_queue.append(results)
 
-    def submit_query(self, query: WarehouseChartQuery) -> FutureResult:
+    async def submit_query(self, query: WarehouseChartQuery) -> FutureResult:
         return TestFutureResult(self._data_queue.pop(0))
 
 
 class TestWarehouse(Warehouse):
-    def submit_query(self, query: WarehouseChartQuery) -> FutureResult:
+    async def submit_query(self, query: WarehouseChartQuery) -> FutureResult:
         reference_date = datetime(2022, 1, 1).replace(tzinfo=pytz.UTC)
 
         results = TabularDataResults()
@@ -75,5 +75,5 @@ class TestWarehouse(Warehouse):
 
         return TestFutureResult(results)
 
-    def submit_column_values_query(self, query: ColumnValuesQuery) -> FutureResult:
+    async def submit_column_values_query(self, query: ColumnValuesQuery) -> FutureResult:
         pass
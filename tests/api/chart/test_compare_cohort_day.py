@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 from datetime import date
 
 from queryengine.api.chart.request import ChartQueryDTO
@@ -22,7 +23,7 @@ from queryengine.core.dateinterval import DateInterval
 
 def test_cohort_day_compare_in_past_with_same_length_period(app_config_repository, datasource_repository,
                                                             kpi_repository, warehouse):
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository, warehouse).execute(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository, warehouse).execute(
         'app', ChartQueryDTO(
             page_id='page_id',
             request_id='request_id',
@@ -33,7 +34,7 @@ def test_cohort_day_compare_in_past_with_same_length_period(app_config_repositor
             column_filters=[],
             column_group_bys=[],
             x_axis_column_id='user_history.cohort_day'
-        ))
+        )))
 
     assert chart_result.chart_points == [
         CohortChartPointDTO(x_axis_value=0, values=[LinePointDTO(group_by_key=[], value=121.0)]),
@@ -53,7 +54,7 @@ def test_cohort_day_compare_in_past_with_same_length_period(app_config_repositor
 
 def test_cohort_day_compare_in_past_larger_length(app_config_repository, datasource_repository, kpi_repository,
                                                   warehouse):
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository, warehouse).execute(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository, warehouse).execute(
         'app', ChartQueryDTO(
             page_id='page_id',
             request_id='request_id',
@@ -64,7 +65,7 @@ def test_cohort_day_compare_in_past_larger_length(app_config_repository, datasou
             column_filters=[],
             column_group_bys=[],
             x_axis_column_id='user_history.cohort_day'
-        ))
+        )))
 
     assert chart_result.chart_points == [
         CohortChartPointDTO(x_axis_value=0, values=[LinePointDTO(group_by_key=[], value=121.0)]),
@@ -85,7 +86,7 @@ def test_cohort_day_compare_in_past_larger_length(app_config_repository, datasou
 
 def test_cohort_day_compare_in_past_smaller_length(app_config_repository, datasource_repository, kpi_repository,
                                                    warehouse):
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository, warehouse).execute(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository, warehouse).execute(
         'app', ChartQueryDTO(
             page_id='page_id',
             request_id='request_id',
@@ -96,7 +97,7 @@ def test_cohort_day_compare_in_past_smaller_length(app_config_repository, dataso
             column_filters=[],
             column_group_bys=[],
             x_axis_column_id='user_history.cohort_day'
-        ))
+        )))
 
     assert chart_result.chart_points == [
         CohortChartPointDTO(x_axis_value=0, values=[LinePointDTO(group_by_key=[], value=121.0)]),
@@ -116,8 +117,8 @@ def test_cohort_day_compare_in_past_smaller_length(app_config_repository, dataso
 def test_missing_data_inside_bounds(
         app_config_repository, datasource_repository, kpi_repository, missing_data_warehouse,
 ):
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
-                                     missing_data_warehouse).execute('app', ChartQueryDTO(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                                 missing_data_warehouse).execute('app', ChartQueryDTO(
         page_id='page_id',
         request_id='request_id',
         kpi_id='user_history.cohort_single',
@@ -127,7 +128,7 @@ def test_missing_data_inside_bounds(
         column_filters=[],
         column_group_bys=[],
         x_axis_column_id='user_history.cohort_day'
-    ))
+    )))
 
     assert chart_result.chart_points == []
     assert chart_result.compare_period_chart_points == []
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 from datetime import date
 
 import pytest
@@ -173,7 +174,7 @@ def test_compared_result(
         date_interval, compare_interval,
         expected_chart_points, expected_compare_chart_points
 ):
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository, warehouse).execute(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository, warehouse).execute(
         'app', ChartQueryDTO(
             page_id='page_id',
             request_id='request_id',
@@ -183,7 +184,7 @@ def test_compared_result(
             column_filters=[],
             column_group_bys=[],
             x_axis_column_id='user_history.date_'
-        ))
+        )))
 
     assert chart_result.chart_points == expected_chart_points
     assert chart_result.compare_period_chart_points == expected_compare_chart_points
@@ -223,7 +224,7 @@ def test_compared_totals(
         expected_date, expected_compare,
         expected_date_total, expected_compare_total
 ):
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository, warehouse).execute(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository, warehouse).execute(
         'app', ChartQueryDTO(
             page_id='page_id',
             request_id='request_id',
@@ -233,7 +234,7 @@ def test_compared_totals(
             column_filters=[],
             column_group_bys=[],
             x_axis_column_id='user_history.date_'
-        ))
+        )))
 
     assert chart_result.chart_points == expected_date
     assert chart_result.compare_period_chart_points == expected_compare
@@ -310,7 +311,7 @@ def test_missing_data_outside_bounds(
         expected_date, expected_compare,
         expected_date_total, expected_compare_total
 ):
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository, warehouse).execute(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository, warehouse).execute(
         'app', ChartQueryDTO(
             page_id='page_id',
             request_id='request_id',
@@ -320,7 +321,7 @@ def test_missing_data_outside_bounds(
             column_filters=[],
             column_group_bys=[],
             x_axis_column_id='user_history.date_'
-        ))
+        )))
 
     if expected_date is None:
         assert chart_result.chart_points == []
@@ -346,8 +347,8 @@ def test_missing_data_outside_bounds(
 def test_missing_data_inside_bounds(
         app_config_repository, datasource_repository, kpi_repository, missing_data_warehouse,
 ):
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
-                                     missing_data_warehouse).execute('app', ChartQueryDTO(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                                 missing_data_warehouse).execute('app', ChartQueryDTO(
         page_id='page_id',
         request_id='request_id',
         kpi_id='user_history.daily_single',
@@ -356,7 +357,7 @@ def test_missing_data_inside_bounds(
         column_filters=[],
         column_group_bys=[],
         x_axis_column_id='user_history.date_'
-    ))
+    )))
 
     assert chart_result.chart_points == []
     assert chart_result.compare_period_chart_points == []
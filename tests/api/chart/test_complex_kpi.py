@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 from datetime import datetime, date
 
 import pytest
@@ -51,8 +52,8 @@ def test_complex_kpi_returning_different_group_bys_with_date_x_axis(
             }))
         })
     )
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
-                                     queued_data_warehouse).execute('app', ChartQueryDTO(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                                 queued_data_warehouse).execute('app', ChartQueryDTO(
         page_id='page_id',
         request_id='request_id',
         kpi_id='user_history.complex',
@@ -60,7 +61,7 @@ def test_complex_kpi_returning_different_group_bys_with_date_x_axis(
         column_filters=[],
         column_group_bys=['user_history.up_string'],
         x_axis_column_id='user_history.date_'
-    ))
+    )))
 
     assert chart_result.chart_points == [
         DateChartPointDTO(x_axis_value=date(2022, 1, 2), values=[
@@ -86,8 +87,8 @@ def test_complex_kpi_returning_different_group_bys_with_cohort_x_axis(
             }))
         })
     )
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
-                                     queued_data_warehouse).execute('app', ChartQueryDTO(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                                 queued_data_warehouse).execute('app', ChartQueryDTO(
         page_id='page_id',
         request_id='request_id',
         kpi_id='user_history.complex',
@@ -95,7 +96,7 @@ def test_complex_kpi_returning_different_group_bys_with_cohort_x_axis(
         column_filters=[],
         column_group_bys=['user_history.up_string'],
         x_axis_column_id='user_history.cohort_day'
-    ))
+    )))
 
     assert chart_result.chart_points == [
         CohortChartPointDTO(x_axis_value=0, values=[
@@ -113,8 +114,8 @@ def test_complex_kpi_returning_different_group_bys_with_cohort_x_axis(
 def test_missing_data_with_complex_date_kpis(
         app_config_repository, datasource_repository, kpi_repository, missing_data_warehouse, kpi
 ):
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
-                                     missing_data_warehouse).execute('app', ChartQueryDTO(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                                 missing_data_warehouse).execute('app', ChartQueryDTO(
         page_id='page_id',
         request_id='request_id',
         kpi_id=kpi,
@@ -122,7 +123,7 @@ def test_missing_data_with_complex_date_kpis(
         column_filters=[],
         column_group_bys=[],
         x_axis_column_id='user_history.date_'
-    ))
+    )))
 
     assert chart_result.chart_points == []
 
@@ -136,8 +137,8 @@ def test_missing_data_with_complex_date_kpis(
 def test_missing_data_with_complex_cohort_kpis(
         app_config_repository, datasource_repository, kpi_repository, missing_data_warehouse, kpi
 ):
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
-                                     missing_data_warehouse).execute('app', ChartQueryDTO(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                                 missing_data_warehouse).execute('app', ChartQueryDTO(
         page_id='page_id',
         request_id='request_id',
         kpi_id=kpi,
@@ -145,6 +146,6 @@ def test_missing_data_with_complex_cohort_kpis(
         column_filters=[],
         column_group_bys=[],
         x_axis_column_id='user_history.cohort_day'
-    ))
+    )))
 
     assert chart_result.chart_points == []
\ No newline at end of file
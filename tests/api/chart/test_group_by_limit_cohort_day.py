@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 from datetime import date
 
 from pandas import DataFrame
@@ -46,8 +47,8 @@ def test_group_by_returning_correct_data_for_date_x_axis(
             })),
         })
     )
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
-                                     queued_data_warehouse).execute('app', ChartQueryDTO(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                                 queued_data_warehouse).execute('app', ChartQueryDTO(
         page_id='page_id',
         request_id='request_id',
         kpi_id='user_history.cohort_single',
@@ -57,7 +58,7 @@ def test_group_by_returning_correct_data_for_date_x_axis(
         group_by_limit=1,
         column_group_bys=['user_history.up_string'],
         x_axis_column_id='user_history.cohort_day'
-    ))
+    )))
     assert chart_result.chart_points == [
         CohortChartPointDTO(x_axis_value=0, values=[
             LinePointDTO(group_by_key=['b'], value=1),
@@ -101,8 +102,8 @@ def test_group_by_disjoint_data_in_compare(
             })),
         })
     )
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
-                                     queued_data_warehouse).execute('app', ChartQueryDTO(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                                 queued_data_warehouse).execute('app', ChartQueryDTO(
         page_id='page_id',
         request_id='request_id',
         kpi_id='user_history.cohort_single',
@@ -112,7 +113,7 @@ def test_group_by_disjoint_data_in_compare(
         group_by_limit=1,
         column_group_bys=['user_history.up_string'],
         x_axis_column_id='user_history.cohort_day'
-    ))
+    )))
 
     assert chart_result.chart_points == [
         CohortChartPointDTO(x_axis_value=0, values=[
@@ -0,0 +1,105 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import json
+from datetime import date
+
+from queryengine.api.chart.request import ChartQueryDTO
+from queryengine.api.chart.response import ChartDataDTO, LinePointDTO
+from queryengine.api.chart.response_cache import ChartResponseCache
+from queryengine.api.chart.service import ChartQueryService
+from queryengine.core.bigquery.admission import QueryPriority
+from queryengine.core.datasource.datasources import UserHistoryDataSource
+from queryengine.core.dateinterval import DateInterval
+from queryengine.core.shared_store import InMemorySharedStore
+
+
+class CountingCompute:
+    def __init__(self):
+        self.computed_dtos = []
+        self.priorities = []
+
+    async def __call__(self, query_dto: ChartQueryDTO, priority: QueryPriority) -> ChartDataDTO:
+        self.computed_dtos.append(query_dto)
+        self.priorities.append(priority)
+        return ChartDataDTO(
+            chart_points=[],
+            chart_total=[LinePointDTO(group_by_key=[], value=len(self.computed_dtos))],
+            chart_total_overall=float(len(self.computed_dtos)),
+            compare_period_chart_points=None,
+            compare_period_chart_total=None,
+            compare_period_chart_total_overall=None,
+            unit=None
+        )
+
+
+def _dto(request_id: str, kpi_id: str = 'user_history.daily_single', x_axis_column_id: str = 'user_history.date_'):
+    return ChartQueryDTO(
+        page_id=f'page_{request_id}',
+        request_id=request_id,
+        kpi_id=kpi_id,
+        date_interval=DateInterval(date(2022, 1, 10), date(2022, 1, 14)),
+        x_axis_column_id=x_axis_column_id,
+    )
+
+
+def _respond(cache, service, compute, query_dto):
+    async def run():
+        response = await cache.respond('app', query_dto, service.load_query('app', query_dto), compute)
+        # lets background refreshes finish
+        while cache._refresh_tasks:
+            await asyncio.sleep(0)
+        return json.loads(response.body)['chart_total_overall']
+    return asyncio.run(run())
+
+
+def test_cache_ignores_page_and_request(app_config_repository, datasource_repository, kpi_repository, warehouse):
+    service = ChartQueryService(app_config_repository, datasource_repository, kpi_repository, warehouse)
+    cache = ChartResponseCache(InMemorySharedStore(max_bytes=1024 * 1024), ttl_seconds=60)
+    compute = CountingCompute()
+
+    assert _respond(cache, service, compute, _dto('first')) == 1.0
+    assert _respond(cache, service, compute, _dto('second')) == 1.0
+    assert len(compute.computed_dtos) == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_stale_response_is_served_while_refreshing(app_config_repository, datasource_repository, kpi_repository,
+                                                   warehouse, monkeypatch):
+    service = ChartQueryService(app_config_repository, datasource_repository, kpi_repository, warehouse)
+    cache = ChartResponseCache(InMemorySharedStore(max_bytes=1024 * 1024), ttl_seconds=60)
+    compute = CountingCompute()
+    _respond(cache, service, compute, _dto('first'))
+
+    monkeypatch.setattr(UserHistoryDataSource, 'data_watermark', lambda self: '2023-01-02')
+
+    assert _respond(cache, service, compute, _dto('second')) == 1.0
+    assert _respond(cache, service, compute, _dto('third')) == 2.0
+    assert len(compute.computed_dtos) == 2
+    assert compute.computed_dtos[1].request_id.startswith('refresh-')
+    assert compute.priorities == [QueryPriority.interactive, QueryPriority.background]
+    assert cache.stats()['stale_hits'] == 1
+
+
+def test_realtime_charts_are_not_cached(app_config_repository, datasource_repository, kpi_repository, warehouse):
+    service = ChartQueryService(app_config_repository, datasource_repository, kpi_repository, warehouse)
+    cache = ChartResponseCache(InMemorySharedStore(max_bytes=1024 * 1024), ttl_seconds=60)
+    compute = CountingCompute()
+    query_dto = _dto('first', kpi_id='events_login.sum_params.internal_num', x_axis_column_id='events_login.date_')
+
+    _respond(cache, service, compute, query_dto)
+    _respond(cache, service, compute, query_dto)
+
+    assert len(compute.computed_dtos) == 2
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 from datetime import date
 
 from pandas import DataFrame
@@ -48,8 +49,8 @@ def test_group_by_with_sort_by_returning_correct_data_for_cohort_x_axis(
             })),
         })
     )
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
-                                     queued_data_warehouse).execute('app', ChartQueryDTO(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                                 queued_data_warehouse).execute('app', ChartQueryDTO(
         page_id='page_id',
         request_id='request_id',
         kpi_id='user_history.cohort_single',
@@ -59,7 +60,7 @@ def test_group_by_with_sort_by_returning_correct_data_for_cohort_x_axis(
         sort_by_kpi_id='user_history.cohort_single_optimized',
         column_group_bys=['user_history.up_string'],
         x_axis_column_id='user_history.cohort_day'
-    ))
+    )))
 
     assert chart_result.chart_points == [
         CohortChartPointDTO(x_axis_value=0, values=[
@@ -95,8 +96,8 @@ def test_group_by_disjoint_data(
             })),
         })
     )
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
-                                     queued_data_warehouse).execute('app', ChartQueryDTO(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                                 queued_data_warehouse).execute('app', ChartQueryDTO(
         page_id='page_id',
         request_id='request_id',
         kpi_id='user_history.cohort_single',
@@ -106,5 +107,5 @@ def test_group_by_disjoint_data(
         sort_by_kpi_id='user_history.cohort_single_optimized',
         column_group_bys=['user_history.up_string'],
         x_axis_column_id='user_history.cohort_day'
-    ))
+    )))
     assert chart_result.chart_points == []
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 from datetime import date
 
 from pandas import DataFrame
@@ -36,15 +37,15 @@ def test_trim_zeros_on_start(
         })
     )
 
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
-                                     queued_data_warehouse).execute('app', ChartQueryDTO(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                                 queued_data_warehouse).execute('app', ChartQueryDTO(
         page_id='page_id',
         request_id='request_id',
         kpi_id='user_history.cohort_single',
         date_interval=DateInterval(date(2022, 1, 10), date(2022, 1, 14)),
         group_by_limit=2,
         x_axis_column_id='user_history.cohort_day'
-    ))
+    )))
     assert chart_result.chart_points == [
         CohortChartPointDTO(x_axis_value=1, values=[LinePointDTO(group_by_key=[], value=1)]),
         CohortChartPointDTO(x_axis_value=2, values=[LinePointDTO(group_by_key=[], value=2)]),
@@ -66,15 +67,15 @@ def test_trim_zeros_on_end(
         })
     )
 
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
-                                     queued_data_warehouse).execute('app', ChartQueryDTO(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                                 queued_data_warehouse).execute('app', ChartQueryDTO(
         page_id='page_id',
         request_id='request_id',
         kpi_id='user_history.cohort_single',
         date_interval=DateInterval(date(2022, 1, 10), date(2022, 1, 14)),
         group_by_limit=2,
         x_axis_column_id='user_history.cohort_day'
-    ))
+    )))
     assert chart_result.chart_points == [
         CohortChartPointDTO(x_axis_value=0, values=[LinePointDTO(group_by_key=[], value=1)]),
         CohortChartPointDTO(x_axis_value=1, values=[LinePointDTO(group_by_key=[], value=1)]),
@@ -96,15 +97,15 @@ def test_trim_zeros_on_start_and_end(
         })
     )
 
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
-                                     queued_data_warehouse).execute('app', ChartQueryDTO(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                                 queued_data_warehouse).execute('app', ChartQueryDTO(
         page_id='page_id',
         request_id='request_id',
         kpi_id='user_history.cohort_single',
         date_interval=DateInterval(date(2022, 1, 10), date(2022, 1, 15)),
         group_by_limit=2,
         x_axis_column_id='user_history.cohort_day'
-    ))
+    )))
     assert chart_result.chart_points == [
         CohortChartPointDTO(x_axis_value=1, values=[LinePointDTO(group_by_key=[], value=1)]),
         CohortChartPointDTO(x_axis_value=2, values=[LinePointDTO(group_by_key=[], value=2)]),
@@ -125,15 +126,15 @@ def test_trim_zeros_when_zero_is_in_middle(
         })
     )
 
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
-                                     queued_data_warehouse).execute('app', ChartQueryDTO(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                                 queued_data_warehouse).execute('app', ChartQueryDTO(
         page_id='page_id',
         request_id='request_id',
         kpi_id='user_history.cohort_single',
         date_interval=DateInterval(date(2022, 1, 10), date(2022, 1, 16)),
         group_by_limit=2,
         x_axis_column_id='user_history.cohort_day'
-    ))
+    )))
 
     assert chart_result.chart_points == [
         CohortChartPointDTO(x_axis_value=1, values=[LinePointDTO(group_by_key=[], value=1)]),
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import asyncio
 from datetime import datetime, date
 
 import pytz
@@ -43,14 +44,14 @@ def test_trim_zeros_on_start(
         })
     )
 
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
-                                     queued_data_warehouse).execute('app', ChartQueryDTO(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                                 queued_data_warehouse).execute('app', ChartQueryDTO(
         page_id='page_id',
         request_id='request_id',
         kpi_id='user_history.daily_single',
         date_interval=DateInterval(date(2022, 1, 10), date(2022, 1, 14)),
         x_axis_column_id='user_history.date_',
-    ))
+    )))
 
     assert chart_result.chart_points == [
         DateChartPointDTO(x_axis_value=date(2022, 1, 11), values=[LinePointDTO(group_by_key=[], value=1)]),
@@ -80,14 +81,14 @@ def test_trim_zeros_on_end(
         })
     )
 
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
-                                     queued_data_warehouse).execute('app', ChartQueryDTO(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                                 queued_data_warehouse).execute('app', ChartQueryDTO(
         page_id='page_id',
         request_id='request_id',
         kpi_id='user_history.daily_single',
         date_interval=DateInterval(date(2022, 1, 10), date(2022, 1, 14)),
         x_axis_column_id='user_history.date_',
-    ))
+    )))
 
     assert chart_result.chart_points == [
         DateChartPointDTO(x_axis_value=date(2022, 1, 10), values=[LinePointDTO(group_by_key=[], value=1)]),
@@ -118,14 +119,14 @@ def test_trim_zeros_on_start_and_end(
         })
     )
 
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
-                                     queued_data_warehouse).execute('app', ChartQueryDTO(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                                 queued_data_warehouse).execute('app', ChartQueryDTO(
         page_id='page_id',
         request_id='request_id',
         kpi_id='user_history.daily_single',
         date_interval=DateInterval(date(2022, 1, 10), date(2022, 1, 15)),
         x_axis_column_id='user_history.date_',
-    ))
+    )))
 
     assert chart_result.chart_points == [
         DateChartPointDTO(x_axis_value=date(2022, 1, 11), values=[LinePointDTO(group_by_key=[], value=1)]),
@@ -157,14 +158,14 @@ def test_trim_zeros_when_zero_is_in_middle(
         })
     )
 
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
-                                     queued_data_warehouse).execute('app', ChartQueryDTO(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                                 queued_data_warehouse).execute('app', ChartQueryDTO(
         page_id='page_id',
         request_id='request_id',
         kpi_id='user_history.daily_single',
         date_interval=DateInterval(date(2022, 1, 10), date(2022, 1, 16)),
         x_axis_column_id='user_history.date_',
-    ))
+    )))
 
     assert chart_result.chart_points == [
         DateChartPointDTO(x_axis_value=date(2022, 1, 11), values=[LinePointDTO(group_by_key=[], value=1)]),
@@ -197,14 +198,14 @@ def test_trim_zeros_total_avg(
         })
     )
 
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
-                                     queued_data_warehouse).execute('app', ChartQueryDTO(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                                 queued_data_warehouse).execute('app', ChartQueryDTO(
         page_id='page_id',
         request_id='request_id',
         kpi_id='user_history.daily_single_x_avg',
         date_interval=DateInterval(date(2022, 1, 10), date(2022, 1, 16)),
         x_axis_column_id='user_history.date_',
-    ))
+    )))
 
     assert chart_result.chart_points == [
         DateChartPointDTO(x_axis_value=date(2022, 1, 11), values=[LinePointDTO(group_by_key=[], value=1)]),
@@ -254,15 +255,15 @@ def test_trim_zeros_width_compare_period(
         })
     )
 
-    chart_result = ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
-                                     queued_data_warehouse).execute('app', ChartQueryDTO(
+    chart_result = asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository,
+                                                 queued_data_warehouse).execute('app', ChartQueryDTO(
         page_id='page_id',
         request_id='request_id',
         kpi_id='user_history.daily_single',
         date_interval=DateInterval(date(2022, 1, 10), date(2022, 1, 16)),
         compare_date_interval=DateInterval(date(2022, 1, 3), date(2022, 1, 9)),
         x_axis_column_id='user_history.date_',
-    ))
+    )))
 
     assert chart_result.chart_points == [
         DateChartPointDTO(x_axis_value=date(2022, 1, 11), values=[LinePointDTO(group_by_key=[], value=1)]),
@@ -0,0 +1,140 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+import pytest
+
+from queryengine.core.bigquery.admission import AdmissionScheduler, QueryPriority
+from queryengine.core.warehouse import TooManyRequestsException
+
+
+def _scheduler(max_running: int = 1, max_queued_per_app: int = 10, max_wait_seconds: float = 1.0,
+               app_weights=None) -> AdmissionScheduler:
+    return AdmissionScheduler(max_running=max_running, max_queued_per_app=max_queued_per_app,
+                              max_wait_seconds={priority: max_wait_seconds for priority in QueryPriority},
+                              app_weights=app_weights)
+
+
+async def _job(scheduler: AdmissionScheduler, app_id: str, priority: QueryPriority, order: list,
+               release: asyncio.Event):
+    async with scheduler.slot(app_id, priority):
+        order.append(app_id)
+        await release.wait()
+
+
+async def _run_in_order(scheduler: AdmissionScheduler, jobs) -> list:
+    order = []
+    release = asyncio.Event()
+    # first job holds the only slot until all other jobs are queued
+    blocker = asyncio.ensure_future(_job(scheduler, 'blocker', QueryPriority.interactive, order, release))
+    await asyncio.sleep(0)
+    tasks = [asyncio.ensure_future(_job(scheduler, app_id, priority, order, release)) for app_id, priority in jobs]
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(blocker, *tasks)
+    return order[1:]
+
+
+def test_apps_share_slots_fairly():
+    async def run():
+        scheduler = _scheduler(max_running=2)
+        order = []
+        release = asyncio.Event()
+        heavy = [asyncio.ensure_future(_job(scheduler, 'heavy', QueryPriority.interactive, order, release))
+                 for _ in range(5)]
+        await asyncio.sleep(0)
+        light = asyncio.ensure_future(_job(scheduler, 'light', QueryPriority.interactive, order, release))
+        await asyncio.sleep(0)
+        # light app gets the second slot freed, even though heavy app queued first
+        stats = scheduler.stats()
+        release.set()
+        await asyncio.gather(*heavy, light)
+        return order, stats
+
+    order, stats = asyncio.run(run())
+    assert stats['apps'] == {'heavy': {'running': 2, 'queued': 3}, 'light': {'running': 0, 'queued': 1}}
+    assert order[:3] == ['heavy', 'heavy', 'light']
+
+
+def test_higher_priority_is_admitted_first():
+    order = asyncio.run(_run_in_order(_scheduler(), [
+        ('background', QueryPriority.background),
+        ('column_values', QueryPriority.column_values),
+        ('interactive', QueryPriority.interactive),
+    ]))
+    assert order == ['interactive', 'column_values', 'background']
+
+
+def test_app_weights():
+    async def run():
+        scheduler = _scheduler(max_running=3, app_weights={'a': 2.0})
+        order = []
+        release_blockers = asyncio.Event()
+        release = asyncio.Event()
+        blockers = [asyncio.ensure_future(_job(scheduler, 'blocker', QueryPriority.interactive, order,
+                                               release_blockers)) for _ in range(3)]
+        await asyncio.sleep(0)
+        tasks = [asyncio.ensure_future(_job(scheduler, app_id, QueryPriority.interactive, order, release))
+                 for app_id in ['a', 'a', 'a', 'b', 'b', 'b']]
+        await asyncio.sleep(0)
+        release_blockers.set()
+        await asyncio.gather(*blockers)
+        stats = scheduler.stats()
+        release.set()
+        await asyncio.gather(*tasks)
+        return stats
+
+    stats = asyncio.run(run())
+    assert stats['apps'] == {'a': {'running': 2, 'queued': 1}, 'b': {'running': 1, 'queued': 2}}
+
+
+def test_full_queue_is_rejected():
+    async def run():
+        scheduler = _scheduler(max_running=1, max_queued_per_app=1)
+        release = asyncio.Event()
+        running = asyncio.ensure_future(_job(scheduler, 'app', QueryPriority.interactive, [], release))
+        queued = asyncio.ensure_future(_job(scheduler, 'app', QueryPriority.interactive, [], release))
+        await asyncio.sleep(0)
+        with pytest.raises(TooManyRequestsException):
+            await _job(scheduler, 'app', QueryPriority.interactive, [], release)
+        # other apps have their own queue
+        other = asyncio.ensure_future(_job(scheduler, 'other', QueryPriority.interactive, [], release))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(running, queued, other)
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+    assert stats['rejected'] == 1
+    assert stats['admitted'] == 3
+    assert stats['running'] == 0
+
+
+def test_wait_deadline():
+    async def run():
+        scheduler = _scheduler(max_running=1, max_wait_seconds=0.01)
+        release = asyncio.Event()
+        running = asyncio.ensure_future(_job(scheduler, 'app', QueryPriority.interactive, [], release))
+        await asyncio.sleep(0)
+        with pytest.raises(TooManyRequestsException):
+            await _job(scheduler, 'app', QueryPriority.interactive, [], release)
+        release.set()
+        await running
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+    assert stats['timed_out'] == 1
+    assert stats['queued'] == 0
+    assert stats['running'] == 0
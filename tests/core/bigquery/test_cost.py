@@ -0,0 +1,102 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+import pytest
+from pandas import DataFrame
+
+from queryengine.core import constants
+from queryengine.core.bigquery.cost import BytesBudget, BytesBudgetBigQueryExecutor, CachingCostEstimator, \
+    CostEstimator
+from queryengine.core.bigquery.queryexecutor import BigQueryExecutor, BigQueryQuery, CachingBigQueryExecutor
+from queryengine.core.bigquery.result_cache import InMemoryResultCache
+from queryengine.core.tabular_data_result import TabularDataResult
+from queryengine.core.warehouse import TooManyBytesException
+
+
+class FakeCostEstimator(CostEstimator):
+    def __init__(self, bytes_by_sql):
+        self.bytes_by_sql = bytes_by_sql
+        self.estimated_sqls = []
+
+    async def estimate_bytes(self, query: BigQueryQuery) -> int:
+        self.estimated_sqls.append(query.sql)
+        return self.bytes_by_sql[query.sql]
+
+
+class CountingBigQueryExecutor(BigQueryExecutor):
+    def __init__(self):
+        self.executed_sqls = []
+
+    async def execute(self, query: BigQueryQuery) -> TabularDataResult:
+        self.executed_sqls.append(query.sql)
+        return TabularDataResult(DataFrame({constants.X_AXIS_COLUMN_ALIAS: [0], constants.DATA_COLUMN_ALIAS: [1.0]}))
+
+
+def _query(sql: str, app_id: str = 'app', request_id: str = 'request',
+           data_watermark: str | None = 'user_history=2022-01-01'):
+    return BigQueryQuery('page', request_id, 'metric', sql, app_id, data_watermark)
+
+
+def test_estimates_are_cached_per_fingerprint():
+    backing = FakeCostEstimator({'SELECT 1': 100})
+    estimator = CachingCostEstimator(backing)
+
+    async def run():
+        return [await estimator.estimate_bytes(_query('SELECT 1')),
+                await estimator.estimate_bytes(_query('SELECT  1'))]
+
+    assert asyncio.run(run()) == [100, 100]
+    assert backing.estimated_sqls == ['SELECT 1']
+
+
+def test_budget_sums_queries_of_request():
+    estimator = FakeCostEstimator({'SELECT 1': 100, 'SELECT 2': 50})
+    budget = BytesBudget(estimator, max_bytes=150)
+
+    async def run():
+        return [await budget.charge(_query('SELECT 1')), await budget.charge(_query('SELECT 2')),
+                await budget.charge(_query('SELECT 2', request_id='other_request'))]
+
+    assert asyncio.run(run()) == [100, 50, 50]
+    with pytest.raises(TooManyBytesException) as e:
+        asyncio.run(budget.charge(_query('SELECT 2')))
+    assert e.value.estimated_bytes == 200
+
+
+def test_app_budget_overrides_default():
+    estimator = FakeCostEstimator({'SELECT 1': 100})
+    budget = BytesBudget(estimator, max_bytes=None, app_max_bytes={'small_app': 10})
+
+    assert asyncio.run(budget.charge(_query('SELECT 1', 'other_app'))) == 100
+    with pytest.raises(TooManyBytesException) as e:
+        asyncio.run(budget.charge(_query('SELECT 1', 'small_app')))
+    assert e.value.max_bytes == 10
+
+
+def test_cached_results_are_served_without_budget():
+    backing_executor = CountingBigQueryExecutor()
+    estimator = FakeCostEstimator({'SELECT 1': 100})
+    cache = InMemoryResultCache(max_bytes=1024 * 1024)
+    asyncio.run(CachingBigQueryExecutor(backing_executor, cache).execute(_query('SELECT 1')))
+    executor = CachingBigQueryExecutor(
+        BytesBudgetBigQueryExecutor(backing_executor, BytesBudget(estimator, max_bytes=10)), cache)
+
+    asyncio.run(executor.execute(_query('SELECT 1')))
+
+    assert estimator.estimated_sqls == []
+    with pytest.raises(TooManyBytesException):
+        asyncio.run(executor.execute(_query('SELECT 1', data_watermark='user_history=2022-01-02')))
+    assert len(backing_executor.executed_sqls) == 1
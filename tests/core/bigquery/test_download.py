@@ -0,0 +1,80 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+
+import pandas as pd
+import pyarrow
+
+from queryengine.core.bigquery.download import ArrowResultDownloader, arrow_to_dataframe, compact_dtypes
+
+
+class ArrowRowIterator:
+    def __init__(self, table: pyarrow.Table):
+        self.table = table
+        self.total_rows = table.num_rows
+        self.to_arrow_kwargs = None
+
+    def to_arrow(self, **kwargs) -> pyarrow.Table:
+        self.to_arrow_kwargs = kwargs
+        return self.table
+
+
+def _table(rows: int) -> pyarrow.Table:
+    return pyarrow.table({
+        'x_axis': pyarrow.array([datetime.date(2022, 1, 1) + datetime.timedelta(days=i) for i in range(rows)]),
+        'group_by_0': pyarrow.array([f'country_{i % 3}' for i in range(rows)]),
+        'value': pyarrow.array([float(i) for i in range(rows)]),
+        'users': pyarrow.array([i if i % 2 else None for i in range(rows)], type=pyarrow.int64()),
+        'paying': pyarrow.array([i % 2 == 0 for i in range(rows)]),
+    })
+
+
+def test_arrow_to_dataframe_dtypes():
+    df = arrow_to_dataframe(_table(4))
+    assert str(df['x_axis'].dtype) == 'dbdate'
+    assert str(df['group_by_0'].dtype) == 'category'
+    assert df['group_by_0'].tolist() == ['country_0', 'country_1', 'country_2', 'country_0']
+    assert df['value'].dtype == 'float64'
+    assert str(df['users'].dtype) == 'Int64'
+    assert str(df['paying'].dtype) == 'boolean'
+    assert df['users'].isna().tolist() == [True, False, True, False]
+    assert df['x_axis'].iloc[1] == datetime.date(2022, 1, 2)
+
+
+def test_compact_dtypes():
+    df = compact_dtypes(pd.DataFrame({
+        'x_axis': [1, 2, 3],
+        'group_by_0': ['a', None, 'a'],
+        'group_by_1': pd.array([1, None, 300], dtype='Int64'),
+        'value': [1, 2, 3],
+        'rows_1': [1, 2, 3],
+    }))
+    assert df['x_axis'].dtype == 'int64'
+    assert str(df['group_by_0'].dtype) == 'category'
+    assert df['group_by_0'].isna().tolist() == [False, True, False]
+    assert str(df['group_by_1'].dtype) == 'Int16'
+    assert df['value'].dtype == 'int64'
+    assert df['rows_1'].dtype == 'int64'
+
+
+def test_small_result_does_not_use_storage_api():
+    downloader = ArrowResultDownloader(small_result_rows=10)
+    downloader.bqstorage_client = object()
+    small = ArrowRowIterator(_table(10))
+    large = ArrowRowIterator(_table(11))
+    assert len(downloader.download(small)) == 10
+    assert len(downloader.download(large)) == 11
+    assert small.to_arrow_kwargs == {'create_bqstorage_client': False}
+    assert large.to_arrow_kwargs['bqstorage_client'] is downloader.bqstorage_client
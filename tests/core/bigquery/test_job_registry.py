@@ -0,0 +1,93 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from queryengine.core.bigquery.job_registry import JobRegistry
+from queryengine.core.bigquery.queryexecutor import BigQueryQuery, _insert_job
+from queryengine.core.warehouse import QueryCancelledException
+
+
+class FakeQueryJob:
+    def __init__(self, sql: str):
+        self.query = sql
+
+
+class FakeClient:
+    def __init__(self):
+        self.inserted_job_ids = []
+        self.cancelled_job_ids = []
+        self.on_insert = None
+
+    def query(self, sql, job_config=None, job_id=None):
+        self.inserted_job_ids.append(job_id)
+        if self.on_insert:
+            self.on_insert(job_id)
+        return FakeQueryJob(sql)
+
+    def cancel_job(self, job_id=None):
+        self.cancelled_job_ids.append(job_id)
+
+
+def _query(request_id: str = 'r1'):
+    return BigQueryQuery('page_' + request_id, request_id, 'metric', 'SELECT 1', 'app')
+
+
+def _register(registry: JobRegistry, job_id: str, query: BigQueryQuery):
+    registry.register(job_id, query.app_id, query.page_id, query.request_id, query.metric_id)
+
+
+def test_cancel_after_insert_requires_job_cancel():
+    registry = JobRegistry()
+    _register(registry, 'job1', _query())
+    assert registry.mark_inserted('job1')
+    assert registry.cancel('job1')
+
+
+def test_cancel_during_insert_cancels_inserted_job():
+    registry = JobRegistry()
+    client = FakeClient()
+    query = _query()
+    _register(registry, 'job1', query)
+    client.on_insert = lambda job_id: registry.cancel(job_id)
+
+    with pytest.raises(QueryCancelledException):
+        _insert_job(client, registry, 'job1', query)
+    assert client.cancelled_job_ids == ['job1']
+
+
+def test_unregistered_job_is_cancelled_on_insert():
+    registry = JobRegistry()
+    client = FakeClient()
+    query = _query()
+    _register(registry, 'job1', query)
+    client.on_insert = lambda job_id: registry.unregister(job_id)
+
+    with pytest.raises(QueryCancelledException):
+        _insert_job(client, registry, 'job1', query)
+    assert client.cancelled_job_ids == ['job1']
+    assert registry.jobs() == []
+
+
+def test_stats_group_running_jobs():
+    registry = JobRegistry()
+    _register(registry, 'job1', _query('r1'))
+    _register(registry, 'job2', _query('r2'))
+    registry.mark_inserted('job1')
+
+    stats = registry.stats()
+    assert stats['running'] == 2
+    assert [job['job_id'] for job in stats['by_app']['app']] == ['job1', 'job2']
+    assert [job['job_id'] for job in stats['by_request']['r2']] == ['job2']
+    assert stats['by_page']['page_r1'][0]['inserted']
@@ -0,0 +1,60 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from datetime import datetime, timezone
+
+from pandas import DataFrame
+
+from queryengine.core.bigquery.job_statistics import job_statistics, record_job_statistics
+
+
+class FakeQueryJob:
+    job_id = 'job1'
+    total_bytes_processed = 1000
+    total_bytes_billed = 10485760
+    slot_millis = 250
+    cache_hit = False
+    started = datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+    ended = None
+
+
+class RecordingSpan:
+    def __init__(self):
+        self.attributes = {}
+
+    def set_attributes(self, attributes):
+        self.attributes.update(attributes)
+
+
+def test_statistics_have_no_missing_values():
+    statistics = job_statistics(FakeQueryJob(), 2, DataFrame({'value': [1.0, 2.0]}), 0.5)
+
+    assert statistics['bytes_billed'] == 10485760
+    assert statistics['slot_millis'] == 250
+    assert statistics['rows'] == 2
+    assert statistics['df_memory_bytes'] > 0
+    assert statistics['job_started'] == '2024-01-01T12:00:00+00:00'
+    assert statistics['job_ended'] == ''
+    assert None not in statistics.values()
+
+
+def test_statistics_are_tagged_with_labels():
+    span = RecordingSpan()
+    statistics = job_statistics(FakeQueryJob(), 0, None, 0.0)
+    record_job_statistics(span, {'app_id': 'app', 'metric_id': 'kpi_dau'}, statistics)
+
+    assert span.attributes['app_id'] == 'app'
+    assert span.attributes['metric_id'] == 'kpi_dau'
+    assert span.attributes['bytes_processed'] == 1000
+    assert span.attributes['df_memory_bytes'] == 0
@@ -0,0 +1,50 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from google.cloud.bigquery import SchemaField
+
+from queryengine.core.bigquery.memory_budget import MemoryBudget, estimate_result_bytes
+from queryengine.core.warehouse import TooLargeResultException, TooManyRequestsException
+
+
+def test_estimate_depends_on_schema():
+    narrow = [SchemaField('x_axis', 'TIMESTAMP'), SchemaField('value', 'FLOAT')]
+    wide = narrow + [SchemaField(f'group_by_{i}', 'STRING') for i in range(4)]
+
+    assert estimate_result_bytes(1000, narrow) == 16000
+    assert estimate_result_bytes(1000, wide) == 144000
+    assert estimate_result_bytes(None, wide) == 0
+
+
+def test_results_of_request_are_summed():
+    budget = MemoryBudget(max_request_bytes=100, max_process_bytes=1000)
+
+    with budget.reserve('request', 60):
+        pass
+    with pytest.raises(TooLargeResultException):
+        budget.reserve('request', 50)
+    with budget.reserve('other_request', 50):
+        assert budget.reserved_bytes() == 50
+    assert budget.reserved_bytes() == 0
+
+
+def test_process_budget_is_released_after_download():
+    budget = MemoryBudget(max_request_bytes=100, max_process_bytes=150)
+
+    with budget.reserve('request_1', 100):
+        with pytest.raises(TooManyRequestsException):
+            budget.reserve('request_2', 100)
+    with budget.reserve('request_2', 100):
+        assert budget.reserved_bytes() == 100
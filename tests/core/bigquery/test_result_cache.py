@@ -0,0 +1,230 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import os
+import threading
+
+import pandas as pd
+from pandas import DataFrame
+
+from queryengine.core import constants
+from queryengine.core.bigquery.queryexecutor import BigQueryExecutor, BigQueryQuery, CachingBigQueryExecutor
+from queryengine.core.bigquery.result_cache import DiskResultCache, InMemoryResultCache, SharedResultCache, \
+    TieredResultCache, result_size_bytes
+from queryengine.core.shared_store import SharedStore, SqliteSharedStore
+from queryengine.core.tabular_data_result import TabularDataResult
+
+
+class CountingSharedStore(SharedStore):
+    def __init__(self, backing_store: SharedStore):
+        self.backing_store = backing_store
+        self.get_calls = []
+        self.set_calls = []
+
+    def get_many(self, keys):
+        self.get_calls.append(keys)
+        return self.backing_store.get_many(keys)
+
+    def set_many(self, values, ttl_seconds):
+        self.set_calls.append(sorted(values))
+        self.backing_store.set_many(values, ttl_seconds)
+
+
+class CountingBigQueryExecutor(BigQueryExecutor):
+    def __init__(self):
+        self.executed_sqls = []
+
+    async def execute(self, query: BigQueryQuery) -> TabularDataResult:
+        self.executed_sqls.append(query.sql)
+        return TabularDataResult(DataFrame({
+            constants.X_AXIS_COLUMN_ALIAS: [0, 1, 2],
+            constants.DATA_COLUMN_ALIAS: [1.0, 2.0, 3.0]
+        }))
+
+
+class ThreadRecordingDiskResultCache(DiskResultCache):
+    def __init__(self, directory: str):
+        super().__init__(directory, max_bytes=1024 * 1024)
+        self.threads = set()
+
+    def get(self, key: str):
+        self.threads.add(threading.get_ident())
+        return super().get(key)
+
+    def put(self, key: str, result: TabularDataResult):
+        self.threads.add(threading.get_ident())
+        super().put(key, result)
+
+
+def _query(sql: str, data_watermark: str | None = 'user_history=2022-01-01'):
+    return BigQueryQuery('page', 'request', 'metric', sql, 'app', data_watermark)
+
+
+def _result(values):
+    return TabularDataResult(DataFrame({
+        constants.X_AXIS_COLUMN_ALIAS: list(range(len(values))),
+        constants.DATA_COLUMN_ALIAS: values
+    }))
+
+
+def test_fingerprint_ignores_whitespace():
+    assert _query('SELECT 1\nFROM  t').fingerprint() == _query('SELECT 1 FROM t ').fingerprint()
+    assert _query('SELECT 1 FROM t').fingerprint() != _query('SELECT 2 FROM t').fingerprint()
+
+
+def test_cache_key_includes_watermark():
+    assert _query('SELECT 1', 'user_history=2022-01-01').cache_key() != \
+           _query('SELECT 1', 'user_history=2022-01-02').cache_key()
+    assert _query('SELECT 1', None).cache_key() is None
+
+
+def test_cache_returns_copies():
+    cache = InMemoryResultCache(max_bytes=1024 * 1024)
+    cache.put('key', _result([1.0, 2.0]))
+
+    cached = cache.get('key')
+    cached.df[constants.DATA_COLUMN_ALIAS] = [0.0, 0.0]
+
+    assert cache.get('key') == _result([1.0, 2.0])
+    assert cache.get('missing') is None
+    assert cache.stats()['hits'] == 2
+    assert cache.stats()['misses'] == 1
+
+
+def test_cache_evicts_least_recently_used_by_size():
+    entry_size = result_size_bytes(_result([1.0, 2.0]))
+    cache = InMemoryResultCache(max_bytes=entry_size * 2)
+    cache.put('a', _result([1.0, 2.0]))
+    cache.put('b', _result([3.0, 4.0]))
+    cache.get('a')
+    cache.put('c', _result([5.0, 6.0]))
+
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+    assert cache.get('c') is not None
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['size_bytes'] == entry_size * 2
+
+
+def test_caching_executor_skips_backing_executor_on_hit():
+    backing_executor = CountingBigQueryExecutor()
+    executor = CachingBigQueryExecutor(backing_executor, InMemoryResultCache(max_bytes=1024 * 1024))
+
+    async def run():
+        first = await executor.execute(_query('SELECT 1'))
+        second = await executor.execute(_query(' SELECT 1 '))
+        await executor.execute(_query('SELECT 1', 'user_history=2022-01-02'))
+        await executor.execute(_query('SELECT 1', None))
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first == second
+    assert len(backing_executor.executed_sqls) == 3
+
+
+def test_caching_executor_reaches_disk_cache_off_event_loop(tmp_path):
+    backing_executor = CountingBigQueryExecutor()
+    cache = ThreadRecordingDiskResultCache(str(tmp_path))
+    executor = CachingBigQueryExecutor(backing_executor, cache)
+
+    async def run():
+        return [await executor.execute(_query('SELECT 1')), await executor.execute(_query('SELECT 1'))]
+
+    first, second = asyncio.run(run())
+
+    assert first == second
+    assert len(backing_executor.executed_sqls) == 1
+    assert cache.threads and threading.get_ident() not in cache.threads
+
+
+def test_disk_cache_survives_restart(tmp_path):
+    result = TabularDataResult(DataFrame({
+        constants.X_AXIS_COLUMN_ALIAS: pd.to_datetime(['2022-01-01', '2022-01-02']).tz_localize('UTC'),
+        'group_by_1': ['a', None],
+        constants.DATA_COLUMN_ALIAS: pd.array([1, None], dtype='Int64')
+    }))
+    DiskResultCache(str(tmp_path), max_bytes=1024 * 1024).put('key', result)
+
+    cache = DiskResultCache(str(tmp_path), max_bytes=1024 * 1024)
+
+    assert cache.get('key') == result
+    assert cache.get('missing') is None
+    assert cache.stats()['entries'] == 1
+
+
+def test_disk_cache_evicts_least_recently_used_by_size(tmp_path):
+    probe = DiskResultCache(str(tmp_path / 'probe'), max_bytes=1024 * 1024)
+    probe.put('a', _result([1.0, 2.0]))
+    entry_size = probe.stats()['size_bytes']
+
+    cache = DiskResultCache(str(tmp_path / 'cache'), max_bytes=entry_size * 2)
+    cache.put('a', _result([1.0, 2.0]))
+    cache.put('b', _result([3.0, 4.0]))
+    cache.get('a')
+    cache.put('c', _result([5.0, 6.0]))
+
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+    assert cache.get('c') is not None
+    assert cache.stats()['evictions'] == 1
+    assert len(os.listdir(tmp_path / 'cache')) == 2
+
+
+def test_tiered_cache_promotes_disk_hits_to_memory(tmp_path):
+    DiskResultCache(str(tmp_path), max_bytes=1024 * 1024).put('key', _result([1.0, 2.0]))
+    memory_cache = InMemoryResultCache(max_bytes=1024 * 1024)
+    cache = TieredResultCache({'memory': memory_cache,
+                               'disk': DiskResultCache(str(tmp_path), max_bytes=1024 * 1024)})
+
+    assert cache.get('key') == _result([1.0, 2.0])
+    assert memory_cache.get('key') == _result([1.0, 2.0])
+    assert cache.stats()['memory_misses'] == 1
+    assert cache.stats()['disk_hits'] == 1
+
+
+def test_shared_cache_batches_writes_and_reads(tmp_path):
+    store = CountingSharedStore(SqliteSharedStore(str(tmp_path / 'cache.db')))
+    cache = SharedResultCache(store, ttl_seconds=60, batch_size=100, flush_interval_seconds=3600)
+    cache.put('a', _result([1.0, 2.0]))
+    cache.put('b', _result([3.0, 4.0]))
+
+    assert cache.get('a') == _result([1.0, 2.0])
+    assert store.set_calls == []
+
+    cache.flush()
+    other_instance = SharedResultCache(store, ttl_seconds=60, flush_interval_seconds=3600)
+    results = other_instance.get_many(['a', 'b', 'c', 'a'])
+
+    assert store.set_calls == [['a', 'b']]
+    assert store.get_calls == [['a', 'b', 'c']]
+    assert results == {'a': _result([1.0, 2.0]), 'b': _result([3.0, 4.0])}
+    assert other_instance.stats()['misses'] == 1
+
+
+def test_shared_cache_treats_store_errors_as_misses():
+    class FailingSharedStore(SharedStore):
+        def get_many(self, keys):
+            raise ConnectionError('store is down')
+
+        def set_many(self, values, ttl_seconds):
+            raise ConnectionError('store is down')
+
+    cache = SharedResultCache(FailingSharedStore(), ttl_seconds=60, flush_interval_seconds=3600)
+    cache.put('a', _result([1.0]))
+    cache.flush()
+
+    assert cache.get('a') is None
+    assert cache.stats()['errors'] == 2
@@ -0,0 +1,106 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+import pytest
+from pandas import DataFrame
+
+from queryengine.core import constants
+from queryengine.core.bigquery.queryexecutor import BigQueryExecutor, BigQueryQuery, SingleFlightBigQueryExecutor, \
+    CancellableBigQueryExecutor
+from queryengine.core.tabular_data_result import TabularDataResult
+from queryengine.core.warehouse import QueryCancelledException
+
+
+class SlowBigQueryExecutor(BigQueryExecutor):
+    def __init__(self):
+        self.executed_sqls = []
+        self.cancelled_sqls = []
+        self.release = None
+
+    async def execute(self, query: BigQueryQuery) -> TabularDataResult:
+        self.executed_sqls.append(query.sql)
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled_sqls.append(query.sql)
+            raise
+        return TabularDataResult(DataFrame({
+            constants.X_AXIS_COLUMN_ALIAS: [0, 1],
+            constants.DATA_COLUMN_ALIAS: [1.0, 2.0]
+        }))
+
+
+def _query(request_id: str, sql: str = 'SELECT 1'):
+    return BigQueryQuery('page_' + request_id, request_id, 'metric', sql, 'app')
+
+
+def test_identical_queries_share_job():
+    async def run():
+        backing = SlowBigQueryExecutor()
+        backing.release = asyncio.Event()
+        executor = SingleFlightBigQueryExecutor(backing)
+        first = executor.submit(_query('r1'))
+        second = executor.submit(_query('r2', 'SELECT  1'))
+        other = executor.submit(_query('r3', 'SELECT 2'))
+        await asyncio.sleep(0)
+        backing.release.set()
+        results = await asyncio.gather(first, second, other)
+        return backing, results
+
+    backing, results = asyncio.run(run())
+    assert backing.executed_sqls == ['SELECT 1', 'SELECT 2']
+    assert results[0].df is not results[1].df
+    assert results[0].df.equals(results[1].df)
+
+
+def test_cancelling_one_caller_keeps_shared_job():
+    async def run():
+        backing = SlowBigQueryExecutor()
+        backing.release = asyncio.Event()
+        executor = CancellableBigQueryExecutor(SingleFlightBigQueryExecutor(backing))
+        first = executor.submit(_query('r1'))
+        second = executor.submit(_query('r2'))
+        await asyncio.sleep(0)
+        executor.cancel_by_request_id('r1')
+        await asyncio.sleep(0)
+        backing.release.set()
+        with pytest.raises(QueryCancelledException):
+            await first
+        return backing, await second
+
+    backing, result = asyncio.run(run())
+    assert backing.cancelled_sqls == []
+    assert len(result.df) == 2
+
+
+def test_cancelling_all_callers_cancels_job():
+    async def run():
+        backing = SlowBigQueryExecutor()
+        backing.release = asyncio.Event()
+        executor = CancellableBigQueryExecutor(SingleFlightBigQueryExecutor(backing))
+        first = executor.submit(_query('r1'))
+        second = executor.submit(_query('r2'))
+        await asyncio.sleep(0)
+        executor.cancel_by_page_id('page_r1')
+        executor.cancel_by_page_id('page_r2')
+        await asyncio.gather(first, second, return_exceptions=True)
+        await asyncio.sleep(0)
+        with pytest.raises(QueryCancelledException):
+            await executor.execute(_query('r1'))
+        return backing
+
+    backing = asyncio.run(run())
+    assert backing.cancelled_sqls == ['SELECT 1']
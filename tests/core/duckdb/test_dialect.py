@@ -0,0 +1,36 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from queryengine.core.duckdb.dialect import to_duckdb
+
+
+def test_backticked_table_becomes_single_identifier():
+    assert to_duckdb("SELECT `app_main.user_history`.`date_` FROM `app_main.user_history`") == \
+           'SELECT "app_main.user_history"."date_" FROM "app_main.user_history"'
+
+
+def test_timestamp_functions():
+    assert to_duckdb('SELECT TIMESTAMP(`t`.`date_`), DATE_TRUNC(`t`.`ts`, HOUR)') == \
+           "SELECT CAST(\"t\".\"date_\" AS TIMESTAMPTZ), date_trunc('hour', \"t\".\"ts\")"
+
+
+def test_nested_functions_and_casts():
+    sql = 'TIMESTAMP_ADD(TIMESTAMP_TRUNC(ts, HOUR), INTERVAL CAST(EXTRACT(MINUTE FROM ts) / 15 AS INT64)*15 MINUTE)'
+    assert to_duckdb(sql) == "(CAST(date_trunc('hour', ts) AS TIMESTAMPTZ) + " \
+                             "(CAST(EXTRACT(MINUTE FROM ts) / 15 AS BIGINT)*15) * INTERVAL 1 MINUTE)"
+
+
+def test_literals_are_kept():
+    sql = "SELECT x FROM t WHERE ts > TIMESTAMP '2022-01-01 00:00:00' AND s = 'TIMESTAMP(x)'"
+    assert to_duckdb(sql) == sql
@@ -0,0 +1,67 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from datetime import date
+
+import pytest
+
+from queryengine.api.chart.internal.warehouse.bigquery.bigquery_warehouse import BigQueryWarehouse
+from queryengine.api.chart.request import ChartQueryDTO
+from queryengine.api.chart.service import ChartQueryService
+from queryengine.core import constants
+from queryengine.core.bigquery.memory_budget import MemoryBudget
+from queryengine.core.dateinterval import DateInterval
+from queryengine.core.duckdb import synthetic_data
+from queryengine.core.duckdb.executor import DuckDbExecutor, connect
+from queryengine.core.timegrain import TimeGrain
+
+pytest.importorskip('duckdb')
+
+
+@pytest.fixture(scope='module')
+def duckdb_warehouse(app_config_repository, datasource_repository, kpi_repository):
+    connection = connect()
+    app = app_config_repository.from_app_id('app')
+    synthetic_data.generate(connection, synthetic_data.synthetic_tables(app, datasource_repository, kpi_repository),
+                            date_from=date(2022, 1, 1), date_to=date(2022, 2, 1), users=50, events_per_user=2)
+    return BigQueryWarehouse(DuckDbExecutor(connection, threads=2, memory_budget=MemoryBudget(
+        max_request_bytes=constants.RESULT_MAX_REQUEST_BYTES, max_process_bytes=constants.RESULT_MAX_PROCESS_BYTES)))
+
+
+def _execute(app_config_repository, datasource_repository, kpi_repository, warehouse, **kwargs):
+    return asyncio.run(ChartQueryService(app_config_repository, datasource_repository, kpi_repository, warehouse)
+                       .execute('app', ChartQueryDTO(page_id='page', request_id='request', **kwargs)))
+
+
+@pytest.mark.parametrize("kpi_id,x_axis_column_id,column_group_bys,time_grain", [
+    ('user_history.daily_single', 'user_history.date_', [], TimeGrain.day),
+    ('user_history.daily_fused', 'user_history.date_', ['user_history.up_string'], TimeGrain.day),
+    ('user_history.cohort_single', 'user_history.cohort_day', [], TimeGrain.day),
+    ('user_history.daily_external', 'user_history.date_', [], TimeGrain.day),
+    ('events_login.sum_params.internal_num', 'events_login.date_', ['user_history.up_string'], TimeGrain.day),
+    ('events_login.sum_params.internal_num', 'events_login.date_', [], TimeGrain.min15),
+])
+def test_generated_sql_runs_on_duckdb(app_config_repository, datasource_repository, kpi_repository, duckdb_warehouse,
+                                      kpi_id, x_axis_column_id, column_group_bys, time_grain):
+    chart_result = _execute(app_config_repository, datasource_repository, kpi_repository, duckdb_warehouse,
+                            kpi_id=kpi_id,
+                            date_interval=DateInterval(date(2022, 1, 10), date(2022, 1, 12)),
+                            compare_date_interval=DateInterval(date(2022, 1, 1), date(2022, 1, 3)),
+                            x_axis_column_id=x_axis_column_id,
+                            column_group_bys=column_group_bys,
+                            time_grain=time_grain)
+
+    assert chart_result.chart_points
+    assert chart_result.compare_period_chart_points
@@ -39,6 +39,14 @@ class TestKpiRepository(InMemoryKpiRepository):
                                            'x': WarehouseMetric("SUM({up_int})", "{up_string} = 'a'", 'user_history')},
                                        x_axis={'cohort_day': Rollup('SUM', 'SUM')}),
 
+            'daily_fused': Kpi('daily_fused', formula="x + y + z",
+                               metrics={
+                                   'x': WarehouseMetric("SUM({up_int})", None, 'user_history_daily'),
+                                   'y': WarehouseMetric("SUM({up_int})", "{up_string} = 'a'", 'user_history_daily'),
+                                   'z': WarehouseMetric("COUNT(*)", "{up_int} > 0", 'user_history_daily'),
+                               },
+                               x_axis={'date_': Rollup('SUM', 'SUM')}),
+
             'cohort_single': Kpi('cohort_single', formula="x",
                                  metrics={'x': WarehouseMetric("SUM({up_int})", None, 'user_history')},
                                  x_axis={'cohort_day': Rollup('SUM', 'SUM')}),
@@ -42,3 +42,23 @@ def test_filter_removes_dates():
         constants.DATA_COLUMN_ALIAS: [0, 0]
     })
     assert_frame_equal(table_result.df, expected_df, check_like=True)
+
+
+def test_trim_zeros_per_group():
+    result = TabularDataResult(DataFrame({
+        constants.X_AXIS_COLUMN_ALIAS: [0, 0, 1, 1, 2, 2, 3, 3],
+        'group_by_1': ['a', None, 'a', None, 'a', None, 'a', None],
+        constants.DATA_COLUMN_ALIAS: [0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 2.0, 0.0]
+    }))
+
+    assert result.trim_zeros() == TabularDataResult(result.df.iloc[[2, 4, 6]])
+
+
+def test_filter_by_group_by_values_orders_by_listed_values():
+    result = TabularDataResult(DataFrame({
+        constants.X_AXIS_COLUMN_ALIAS: [0, 0, 0, 1, 1, 1],
+        'group_by_1': ['a', None, 'c', 'a', None, 'c'],
+        constants.DATA_COLUMN_ALIAS: [1.0, 2.0, 3.0, 4.0, 5.0, 6.0]
+    }))
+
+    assert result.filter_by_group_by_values([(None,), ('a',)]) == TabularDataResult(result.df.iloc[[1, 0, 4, 3]])
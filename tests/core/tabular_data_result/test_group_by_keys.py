@@ -0,0 +1,84 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+from pandas import DataFrame
+
+from queryengine.core import constants
+from queryengine.core.tabular_data_result import GroupByKeys, TabularDataResult, TabularDataResults
+
+
+def _result(g1, g2):
+    return TabularDataResult(DataFrame({
+        constants.X_AXIS_COLUMN_ALIAS: list(range(len(g1))),
+        'g1': g1,
+        'g2': g2,
+        constants.DATA_COLUMN_ALIAS: [1] * len(g1),
+    }))
+
+
+def test_group_by_values_are_encoded_once_across_results():
+    group_by_keys = GroupByKeys()
+    first = _result(['a', 'b', 'a'], [1, 2, 1])
+    second = _result(['b', 'c'], [2, 3])
+
+    first_codes = group_by_keys.encode(first)
+    second_codes = group_by_keys.encode(second)
+
+    assert len(group_by_keys) == 3
+    assert first_codes.tolist() == [0, 1, 0]
+    assert second_codes.tolist() == [1, 2]
+    assert group_by_keys.decode(second_codes) == [('b', 2), ('c', 3)]
+    assert group_by_keys.encode(first).tolist() == first_codes.tolist()
+
+
+def test_missing_values_share_a_code():
+    group_by_keys = GroupByKeys()
+
+    codes = group_by_keys.encode(_result(['a', None, np.nan], [1, 1, 1]))
+
+    assert codes.tolist() == [0, 1, 1]
+
+
+def test_codes_are_sorted_by_values_with_missing_values_last():
+    group_by_keys = GroupByKeys()
+    codes = group_by_keys.codes([('b', 1), (None, 2), ('a', 2), ('a', None), ('a', 1)])
+
+    assert group_by_keys.decode(group_by_keys.sort(codes)) == [('a', 1), ('a', 2), ('b', 1), ('a', None), (None, 2)]
+
+    codes = np.append(codes, group_by_keys.codes([('0', 3)]))
+    assert group_by_keys.decode(group_by_keys.sort(codes))[:2] == [('0', 3), ('a', 1)]
+
+
+def test_filter_by_group_by_codes():
+    group_by_keys = GroupByKeys()
+    listed = group_by_keys.encode(_result(['c', 'a', 'c'], [3, 1, 3]))
+
+    result = _result(['a', 'b', 'c'], [1, 2, 3]).filter_by_group_by_codes(listed, group_by_keys)
+
+    assert result.group_by_values() == [('a', 1), ('c', 3)]
+
+
+def test_group_by_values_of_results():
+    group_by_keys = GroupByKeys()
+    results = TabularDataResults({
+        'x': _result(['a', 'b', 'a'], [1, 2, 1]),
+        'y': _result(['b', 'c'], [2, 3]),
+        'z': TabularDataResult(DataFrame(columns=[constants.X_AXIS_COLUMN_ALIAS, 'g1', 'g2',
+                                                  constants.DATA_COLUMN_ALIAS])),
+    })
+
+    assert results.group_by_codes(group_by_keys).tolist() == [0, 1, 2]
+    assert results.group_by_values(group_by_keys) == {('a', 1), ('b', 2), ('c', 3)}
+    assert results.group_by_columns_distinct_values_count() == 6
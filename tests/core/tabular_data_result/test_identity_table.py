@@ -0,0 +1,108 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from datetime import datetime
+
+import numpy as np
+import pytz
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
+
+from queryengine.core import constants
+from queryengine.core.dateinterval import DatetimeInterval
+from queryengine.core.tabular_data_result import IdentityTable, SparseTabularDataResult, TabularDataResult
+from queryengine.core.timegrain import TimeGrain
+
+DATE_INTERVAL = DatetimeInterval(date_from=datetime(2023, 1, 1), date_to=datetime(2023, 1, 5))
+
+
+def _identity():
+    return IdentityTable.from_date_interval(DATE_INTERVAL, TimeGrain.day, group_by_columns=['g1'],
+                                            group_by_values=[('a',), ('b',), ('c',)])
+
+
+def _result():
+    return TabularDataResult(DataFrame({
+        constants.X_AXIS_COLUMN_ALIAS: [
+            datetime(2023, 1, 4).replace(tzinfo=pytz.UTC),
+            datetime(2023, 1, 2).replace(tzinfo=pytz.UTC),
+            datetime(2023, 1, 3).replace(tzinfo=pytz.UTC),
+            datetime(2023, 1, 2).replace(tzinfo=pytz.UTC),
+            datetime(2023, 1, 9).replace(tzinfo=pytz.UTC),
+        ],
+        'g1': ['a', 'a', 'b', 'c', 'a'],
+        constants.DATA_COLUMN_ALIAS: [3, 1, 2, 0, 5]
+    }))
+
+
+def _assert_result_equal(result: TabularDataResult, expected: TabularDataResult):
+    assert_frame_equal(result.df.reset_index(drop=True), expected.df.reset_index(drop=True))
+
+
+def test_identity_table_materializes_cartesian_product():
+    _assert_result_equal(_identity().to_result(), TabularDataResult.from_date_interval(
+        DATE_INTERVAL, TimeGrain.day, group_by_columns=['g1'], group_by_values=[('a',), ('b',), ('c',)]))
+
+
+def test_rollup_maps_domains():
+    identity = _identity().rollup(x_axis_mapper=lambda dt: 0, group_by_columns_mapper=lambda x: 0)
+
+    assert len(identity) == 1
+    _assert_result_equal(identity.to_result(), TabularDataResult(DataFrame({
+        constants.X_AXIS_COLUMN_ALIAS: [0],
+        'g1': [0],
+        constants.DATA_COLUMN_ALIAS: [0],
+    })))
+
+
+def test_merged_values_keep_only_rows_with_values():
+    merged = _identity().merge_values(_result())
+
+    assert merged.positions.tolist() == [3, 5, 7, 9]
+    _assert_result_equal(merged.dense(), _identity().to_result().merge_values(_result()))
+
+
+def test_trim_zeros_materializes_only_rows_between_non_zero_values():
+    merged = _identity().merge_values(_result())
+
+    _assert_result_equal(merged.trim_zeros(), _identity().to_result().merge_values(_result()).trim_zeros())
+    assert len(merged.trim_zeros().df) == 4
+
+
+def test_filter_by_group_by_values():
+    merged = _identity().merge_values(_result()).filter_by_group_by_values([('b',), ('a',)])
+
+    _assert_result_equal(merged.dense(), _identity().to_result().merge_values(_result())
+                         .filter_by_group_by_values([('b',), ('a',)]))
+    _assert_result_equal(merged.trim_zeros(), _identity().to_result().merge_values(_result())
+                         .filter_by_group_by_values([('b',), ('a',)]).trim_zeros())
+
+
+def test_total_sums_values_of_all_groups():
+    total = _identity().merge_values(_result()).total()
+
+    assert total.group_by_values() == [('a',), ('b',), ('c',)]
+    assert total.df[constants.DATA_COLUMN_ALIAS].tolist() == [4, 2, 0]
+
+
+def test_missing_values_are_kept_like_in_materialized_rows():
+    identity = _identity()
+    sparse = SparseTabularDataResult(identity, np.array([3, 4, 7]), np.array([np.nan, 1.0, np.nan]),
+                                     identity.columns())
+    values = np.zeros(len(identity))
+    values[[3, 4, 7]] = [np.nan, 1.0, np.nan]
+    dense = TabularDataResult(identity.to_result().df.assign(**{constants.DATA_COLUMN_ALIAS: values}))
+
+    _assert_result_equal(sparse.dense(), dense)
+    _assert_result_equal(sparse.trim_zeros(), dense.trim_zeros())
@@ -12,7 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import numpy as np
+import pandas as pd
 from pandas import DataFrame
+from pandas.testing import assert_frame_equal
 
 from queryengine.core import constants
 from queryengine.core.tabular_data_result import TabularDataResult
@@ -32,3 +35,47 @@ def test_addition():
         constants.X_AXIS_COLUMN_ALIAS: [0, 1, 2, 3],
         constants.DATA_COLUMN_ALIAS: [0, 2, 4, 6]
     }))
+
+
+def _grouped_result(x_axis, group_by, values):
+    return TabularDataResult(DataFrame({
+        constants.X_AXIS_COLUMN_ALIAS: x_axis,
+        'group_by_1': group_by,
+        constants.DATA_COLUMN_ALIAS: values
+    }))
+
+
+def test_operations_align_rows_by_key():
+    numerator = _grouped_result([0, 0, 1, 1, 2], ['a', None, 'a', None, 'a'], [1.0, 2.0, 3.0, 4.0, 5.0])
+    denominator = _grouped_result([1, 1, 0, 0], [None, 'a', None, 'a'], [0.0, 2.0, 4.0, 8.0])
+
+    assert_frame_equal((numerator / denominator).df, _grouped_result(
+        [0, 0, 1, 1], ['a', None, 'a', None], [0.125, 0.5, 1.5, 0.0]).df)
+    assert_frame_equal((numerator - denominator).df, _grouped_result(
+        [0, 0, 1, 1], ['a', None, 'a', None], [-7.0, -2.0, 1.0, 4.0]).df)
+
+
+def test_missing_group_by_values_match_only_missing_values():
+    left = _grouped_result([0, 0, 0], ['a', None, 'c'], [1.0, 2.0, 3.0])
+    right = _grouped_result([0, 0], [None, 'b'], [10.0, 20.0])
+
+    assert_frame_equal((left + right).df, _grouped_result([0], [None], [12.0]).df)
+
+
+def test_division_by_zero_is_zero():
+    values = TabularDataResult(DataFrame({
+        constants.X_AXIS_COLUMN_ALIAS: [0, 1, 2],
+        constants.DATA_COLUMN_ALIAS: pd.array([1, 0, None], dtype='Int64')
+    }))
+
+    assert (values / values).df[constants.DATA_COLUMN_ALIAS].tolist()[:2] == [1.0, 0.0]
+    assert np.isnan((values / values).df[constants.DATA_COLUMN_ALIAS][2])
+    assert (values / 0).df[constants.DATA_COLUMN_ALIAS].tolist() == [0.0, 0.0, 0.0]
+    assert (2 / values).df[constants.DATA_COLUMN_ALIAS].tolist()[:2] == [2.0, 0.0]
+
+
+def test_operations_with_duplicate_keys_fall_back_to_merge():
+    left = _grouped_result([0, 1], ['a', 'a'], [1.0, 2.0])
+    right = _grouped_result([0, 0, 1], ['a', 'a', 'a'], [10.0, 20.0, 30.0])
+
+    assert_frame_equal((left + right).df, _grouped_result([0, 0, 1], ['a', 'a', 'a'], [11.0, 21.0, 32.0]).df)
@@ -0,0 +1,42 @@
+# Copyright (c) 2024 AlgebraAI All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+import pytest
+
+from queryengine.core import shared_store
+from queryengine.core.shared_store import SqliteSharedStore
+
+
+def test_sqlite_store_is_shared_between_connections(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    SqliteSharedStore(path).set_many({'a': b'1', 'b': b'2'}, ttl_seconds=60)
+
+    assert SqliteSharedStore(path).get_many(['a', 'b', 'c']) == {'a': b'1', 'b': b'2'}
+    assert SqliteSharedStore(path).get_many([]) == {}
+
+
+def test_sqlite_store_expires_values(tmp_path):
+    store = SqliteSharedStore(str(tmp_path / 'cache.db'))
+    store.set_many({'a': b'1'}, ttl_seconds=-1)
+    store.set_many({'b': b'2'}, ttl_seconds=60)
+
+    assert store.get_many(['a', 'b']) == {'b': b'2'}
+
+
+def test_store_from_url(tmp_path):
+    assert isinstance(shared_store.from_url(f'sqlite://{tmp_path}/cache.db'), SqliteSharedStore)
+    with pytest.raises(ValueError):
+        shared_store.from_url('memcached://localhost')
@@ -14,12 +14,14 @@
 
 from datetime import datetime
 
+import numpy as np
 import pytest
+import pytz
 
+from queryengine.core.dateinterval import DatetimeInterval
 from queryengine.core.timegrain import TimeGrain
 
-
-@pytest.mark.parametrize("dt,grain,expected_dt", [
+truncate_datetime_cases = [
     # min15
     (datetime(2022, 3, 10, 3, 0, 0), TimeGrain.min15, datetime(2022, 3, 10, 3, 0, 0)),
     (datetime(2022, 3, 10, 3, 0, 5), TimeGrain.min15, datetime(2022, 3, 10, 3, 0, 0)),
@@ -54,12 +56,9 @@ from queryengine.core.timegrain import TimeGrain
     (datetime(2022, 3, 10, 3, 0, 0), TimeGrain.year, datetime(2022, 1, 1, 0, 0, 0)),
     (datetime(2022, 3, 11, 3, 0, 5), TimeGrain.year, datetime(2022, 1, 1, 0, 0, 0)),
     (datetime(2022, 5, 11, 3, 0, 5), TimeGrain.year, datetime(2022, 1, 1, 0, 0, 0)),
-])
-def test_truncate_datetime(dt: datetime, grain: TimeGrain, expected_dt: datetime):
-    assert grain.truncate_datetime(dt) == expected_dt
+]
 
-
-@pytest.mark.parametrize("dt,grain,expected_dt", [
+next_datetime_cases = [
     # min15
     (datetime(2022, 3, 10, 3, 0, 0), TimeGrain.min15, datetime(2022, 3, 10, 3, 15, 0)),
     (datetime(2022, 3, 10, 3, 45, 0), TimeGrain.min15, datetime(2022, 3, 10, 4, 0, 0)),
@@ -77,6 +76,7 @@ def test_truncate_datetime(dt: datetime, grain: TimeGrain, expected_dt: datetime
 
     # month
     (datetime(2022, 12, 1, 0, 0, 0), TimeGrain.month, datetime(2023, 1, 1, 0, 0, 0)),
+    (datetime(2022, 1, 31, 5, 0, 0), TimeGrain.month, datetime(2022, 2, 28, 5, 0, 0)),
 
     # quarter
     (datetime(2022, 4, 1, 0, 0, 0), TimeGrain.quarter, datetime(2022, 7, 1, 0, 0, 0)),
@@ -84,6 +84,47 @@ def test_truncate_datetime(dt: datetime, grain: TimeGrain, expected_dt: datetime
 
     # year
     (datetime(2022, 1, 1, 0, 0, 0), TimeGrain.year, datetime(2023, 1, 1, 0, 0, 0)),
+]
+
+
+@pytest.mark.parametrize("dt,grain,expected_dt", truncate_datetime_cases + [
+    (datetime(2022, 3, 10, 3, 53, 0), TimeGrain.min15, datetime(2022, 3, 10, 4, 0, 0)),
 ])
+def test_truncate_datetime(dt: datetime, grain: TimeGrain, expected_dt: datetime):
+    assert grain.truncate_datetime(dt) == expected_dt
+
+
+@pytest.mark.parametrize("dt,grain,expected_dt", next_datetime_cases)
 def test_next_datetime(dt: datetime, grain: TimeGrain, expected_dt: datetime):
     assert grain.next_datetime(dt) == expected_dt
+
+
+@pytest.mark.parametrize("grain", list(TimeGrain))
+def test_truncate_datetimes(grain: TimeGrain):
+    cases = [case for case in truncate_datetime_cases if case[1] == grain]
+    values = np.array([dt for dt, _, _ in cases], dtype='datetime64[ns]')
+    expected = np.array([expected_dt for _, _, expected_dt in cases], dtype='datetime64[ns]')
+    assert (grain.truncate_datetimes(values) == expected).all()
+
+
+@pytest.mark.parametrize("grain", list(TimeGrain))
+def test_next_datetimes(grain: TimeGrain):
+    cases = [case for case in next_datetime_cases if case[1] == grain]
+    values = np.array([dt for dt, _, _ in cases], dtype='datetime64[ns]')
+    expected = np.array([expected_dt for _, _, expected_dt in cases], dtype='datetime64[ns]')
+    assert (grain.next_datetimes(values) == expected).all()
+
+
+@pytest.mark.parametrize("date_interval,grain,expected_dts", [
+    (DatetimeInterval(datetime(2022, 3, 10, 3, 20), datetime(2022, 3, 10, 4, 0)), TimeGrain.min15,
+     [datetime(2022, 3, 10, 3, 15), datetime(2022, 3, 10, 3, 30), datetime(2022, 3, 10, 3, 45),
+      datetime(2022, 3, 10, 4, 0)]),
+    (DatetimeInterval(datetime(2022, 3, 10), datetime(2022, 3, 21)), TimeGrain.week,
+     [datetime(2022, 3, 7), datetime(2022, 3, 14), datetime(2022, 3, 21)]),
+    (DatetimeInterval(datetime(2022, 1, 31), datetime(2022, 3, 1)), TimeGrain.month,
+     [datetime(2022, 1, 1), datetime(2022, 2, 1), datetime(2022, 3, 1)]),
+    (DatetimeInterval(datetime(2022, 5, 10), datetime(2022, 10, 1)), TimeGrain.quarter,
+     [datetime(2022, 4, 1), datetime(2022, 7, 1), datetime(2022, 10, 1)]),
+])
+def test_generate_all_dates(date_interval: DatetimeInterval, grain: TimeGrain, expected_dts):
+    assert date_interval.generate_all_dates(grain) == [dt.replace(tzinfo=pytz.UTC) for dt in expected_dts]